@@ -0,0 +1,62 @@
+from typing import Any, Dict, List
+import logging
+
+from app.rule_engine import Node, NodeType, Operator, ComparisonOperator, create_rule
+
+logger = logging.getLogger(__name__)
+
+# Bump when the encoding changes; documents with another version are re-parsed
+AST_FORMAT_VERSION = 1
+
+# Postfix encoding of a Node tree, stored next to rule_string:
+#   {"format": 1, "postfix": [["age", ">", 30], ["department", "=", "Sales"], "AND"]}
+# Comparisons are [field, operator, value] lists and AND/OR are plain strings, so
+# decoding is a single pass with a stack and no tokenizing or parsing.
+
+def serialize_ast(node: Node) -> Dict[str, Any]:
+    postfix: List[Any] = []
+    stack = [(node, False)]
+    while stack:
+        current, children_done = stack.pop()
+        if current.type == NodeType.COMPARISON:
+            postfix.append([current.field, current.operator.value, current.value])
+        elif current.type == NodeType.OPERATOR:
+            if children_done:
+                postfix.append(current.operator.value)
+            else:
+                stack.append((current, True))
+                stack.append((current.right, False))
+                stack.append((current.left, False))
+        else:
+            raise ValueError(f"Invalid node type: {current.type}")
+    return {"format": AST_FORMAT_VERSION, "postfix": postfix}
+
+def deserialize_ast(encoded: Dict[str, Any]) -> Node:
+    if encoded.get("format") != AST_FORMAT_VERSION:
+        raise ValueError(f"Unsupported AST format: {encoded.get('format')}")
+    stack: List[Node] = []
+    try:
+        for item in encoded["postfix"]:
+            if isinstance(item, str):
+                right = stack.pop()
+                left = stack.pop()
+                stack.append(Node(type=NodeType.OPERATOR, operator=Operator(item), left=left, right=right))
+            else:
+                field, operator, value = item
+                stack.append(Node(type=NodeType.COMPARISON, field=field, operator=ComparisonOperator(operator), value=value))
+    except (IndexError, KeyError, TypeError, ValueError):
+        raise ValueError("Malformed serialized AST")
+    if len(stack) != 1:
+        raise ValueError("Malformed serialized AST")
+    return stack[0]
+
+def ast_from_document(rule_doc: Dict[str, Any]) -> Node:
+    # Uses the stored AST when it is in the current format, otherwise parses
+    # rule_string (documents written before ASTs were persisted)
+    encoded = rule_doc.get("ast")
+    if isinstance(encoded, dict) and encoded.get("format") == AST_FORMAT_VERSION:
+        try:
+            return deserialize_ast(encoded)
+        except ValueError as ve:
+            logger.warning(f"Re-parsing rule {rule_doc.get('_id')}: {str(ve)}")
+    return create_rule(rule_doc["rule_string"])
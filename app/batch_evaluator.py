@@ -0,0 +1,141 @@
+from typing import Any, Dict, Iterable, Mapping, Optional
+import numpy as np
+
+from app.rule_engine import Node, NodeType, Operator, ComparisonOperator, COMPARATORS
+
+NUMERIC_KINDS = "biuf"
+
+class Column:
+    # A single attribute column. Numeric data stays a numpy array; all-string data
+    # is dictionary encoded into sorted unique values plus integer codes, so
+    # comparisons run over the (small) dictionary and are gathered by code.
+    def __init__(self, name: str, values: Any, missing: Optional[np.ndarray] = None):
+        self.name = name
+        self.missing = missing if missing is not None and missing.any() else None
+        self.values: Optional[np.ndarray] = None
+        self.dictionary: Optional[np.ndarray] = None
+        self.codes: Optional[np.ndarray] = None
+        self.objects: Optional[np.ndarray] = None
+
+        array = _to_numpy(values)
+        if array.dtype.kind in NUMERIC_KINDS:
+            self.values = array
+        elif array.dtype.kind in "US" or all(isinstance(v, str) for v in array):
+            self.dictionary, self.codes = np.unique(array.astype(str), return_inverse=True)
+        else:
+            # Mixed types: compare element by element with Python semantics
+            self.objects = array
+
+    def __len__(self) -> int:
+        for array in (self.values, self.codes, self.objects):
+            if array is not None:
+                return len(array)
+        return 0
+
+    def compare(self, operator: ComparisonOperator, value: Any) -> np.ndarray:
+        compare = COMPARATORS[operator]
+        if self.objects is not None:
+            return np.fromiter((compare(v, value) for v in self.objects), dtype=bool, count=len(self.objects))
+        if self.values is not None:
+            if isinstance(value, (int, float)):
+                return compare(self.values, value)
+            return self._mismatched(operator, value)
+        if isinstance(value, str):
+            return compare(self.dictionary, value)[self.codes]
+        return self._mismatched(operator, value)
+
+    def _mismatched(self, operator: ComparisonOperator, value: Any) -> np.ndarray:
+        # Same outcome as comparing a str with a number in Python
+        if operator == ComparisonOperator.EQ:
+            return np.zeros(len(self), dtype=bool)
+        if operator == ComparisonOperator.NEQ:
+            return np.ones(len(self), dtype=bool)
+        raise TypeError(f"'{operator.value}' not supported between column {self.name} and {type(value).__name__}")
+
+class ColumnarBatch:
+    def __init__(self, columns: Mapping[str, Any], fields: Optional[Iterable[str]] = None):
+        if hasattr(columns, "column_names"):
+            # Arrow-like tables
+            columns = {name: columns.column(name) for name in columns.column_names}
+        # Only the attributes a rule references need to be converted
+        wanted = set(fields) if fields is not None else None
+        self.columns: Dict[str, Column] = {}
+        self.length = 0
+        for index, (name, values) in enumerate(columns.items()):
+            if wanted is None or name in wanted:
+                values = values if isinstance(values, Column) else Column(name, values)
+                self.columns[name] = values
+            if index == 0:
+                self.length = len(values)
+            elif len(values) != self.length:
+                raise ValueError(f"Column {name} has {len(values)} rows, expected {self.length}")
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], fields: Optional[Iterable[str]] = None) -> "ColumnarBatch":
+        records = list(records)
+        if fields is None:
+            fields = {field for record in records for field in record}
+        columns = {}
+        for field in fields:
+            present = np.fromiter((field in record for record in records), dtype=bool, count=len(records))
+            if present.all():
+                columns[field] = Column(field, [record[field] for record in records])
+                continue
+            values = [record.get(field) for record in records]
+            sample = next((v for v in values if v is not None), 0)
+            filler = "" if isinstance(sample, str) else 0
+            columns[field] = Column(field, [filler if not p else v for p, v in zip(present, values)], missing=~present)
+        batch = cls(columns)
+        batch.length = len(records)
+        return batch
+
+class BatchRuleEvaluator:
+    # Evaluates a rule for every row at once. Each node only looks at rows that are
+    # still undecided, which preserves the short-circuit behaviour of RuleEvaluator:
+    # a missing field only raises if some record actually reaches that comparison.
+    def evaluate(self, node: Node, batch: ColumnarBatch) -> np.ndarray:
+        if batch.length == 0:
+            return np.zeros(0, dtype=bool)
+        return self._evaluate(node, batch, np.ones(batch.length, dtype=bool))
+
+    def _evaluate(self, node: Node, batch: ColumnarBatch, active: np.ndarray) -> np.ndarray:
+        if node.type == NodeType.OPERATOR:
+            left = self._evaluate(node.left, batch, active)
+            if node.operator == Operator.AND:
+                pending = active & left
+                if not pending.any():
+                    return left
+                return left & self._evaluate(node.right, batch, pending)
+            pending = active & ~left
+            if not pending.any():
+                return left
+            return left | self._evaluate(node.right, batch, pending)
+
+        if node.type == NodeType.COMPARISON and node.operator in COMPARATORS:
+            column = batch.columns.get(node.field)
+            if column is None or (column.missing is not None and (active & column.missing).any()):
+                raise ValueError(f"Field {node.field} not found in data")
+            return column.compare(node.operator, node.value)
+
+        if node.type == NodeType.LITERAL:
+            return np.full(batch.length, bool(node.value))
+
+        raise ValueError(f"Invalid node type: {node.type}")
+
+def evaluate_batch(node: Node, columns: Any) -> np.ndarray:
+    batch = columns if isinstance(columns, ColumnarBatch) else ColumnarBatch(columns)
+    return BatchRuleEvaluator().evaluate(node, batch)
+
+def _to_numpy(values: Any) -> np.ndarray:
+    if isinstance(values, np.ndarray):
+        return values
+    if hasattr(values, "to_numpy"):
+        try:
+            return values.to_numpy(zero_copy_only=False)
+        except TypeError:
+            return values.to_numpy()
+    array = np.asarray(values)
+    if array.dtype.kind in "US" and not all(isinstance(v, str) for v in values):
+        # numpy would silently turn numbers into strings here
+        array = np.array(values, dtype=object)
+    return array
@@ -1,18 +1,146 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 from pymongo import MongoClient
 from dotenv import load_dotenv
+import asyncio
 import os
 
+from .memory_db import InMemoryClient
+
 # Load environment variables
 load_dotenv()
 
 # Get MongoDB connection string from environment variable
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 
-# Create MongoDB client
-client = MongoClient(MONGODB_URL)
+# Connection pool and executor sizing
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "32"))
+
+# Create MongoDB client; "memory://" selects the in-process stand-in
+if MONGODB_URL.startswith("memory://"):
+    client = InMemoryClient()
+else:
+    client = MongoClient(MONGODB_URL, maxPoolSize=MONGODB_MAX_POOL_SIZE, minPoolSize=MONGODB_MIN_POOL_SIZE)
 
 # Get database
 db = client.rule_engine
 
 # Get collections
-rules_collection = db.rules
\ No newline at end of file
+rules_collection = db.rules
+evaluations_collection = db.evaluations
+
+class AsyncChangeStream:
+    # try_next() waits on the server for up to max_await_time_ms, so it runs on
+    # the executor like every other blocking call
+    def __init__(self, stream: Any, run: Callable):
+        self._stream = stream
+        self._run = run
+
+    @property
+    def alive(self) -> bool:
+        return self._stream.alive
+
+    @property
+    def resume_token(self) -> Optional[Dict[str, Any]]:
+        return self._stream.resume_token
+
+    async def try_next(self) -> Optional[Dict[str, Any]]:
+        return await self._run(self._stream.try_next)
+
+    async def close(self):
+        await self._run(self._stream.close)
+
+class AsyncCollection:
+    # Runs blocking pymongo calls on a bounded thread pool so async routes never
+    # block the event loop. The pool should not exceed the client's maxPoolSize.
+    def __init__(self, collection: Any, executor: ThreadPoolExecutor):
+        self.collection = collection
+        self._executor = executor
+
+    async def _run(self, function: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(function, *args, **kwargs))
+
+    async def find_one(self, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        return await self._run(self.collection.find_one, *args, **kwargs)
+
+    async def find_list(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Any] = None,
+                        sort: Optional[List] = None, limit: int = 0) -> List[Dict[str, Any]]:
+        def run():
+            cursor = self.collection.find(filter, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        return await self._run(run)
+
+    async def find_batches(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Any] = None,
+                           batch_size: int = 500, sort: Optional[List] = None, hint: Optional[Any] = None,
+                           limit: int = 0) -> AsyncIterator[List[Dict[str, Any]]]:
+        cursor = self.collection.find(filter, projection).batch_size(batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        if hint:
+            cursor = cursor.hint(hint)
+        if limit:
+            cursor = cursor.limit(limit)
+        iterator = iter(cursor)
+
+        def next_batch() -> List[Dict[str, Any]]:
+            batch = []
+            for document in iterator:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    break
+            return batch
+
+        try:
+            while True:
+                batch = await self._run(next_batch)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            cursor.close()
+
+    async def insert_one(self, *args, **kwargs) -> Any:
+        return await self._run(self.collection.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs) -> Any:
+        return await self._run(self.collection.insert_many, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs) -> Any:
+        return await self._run(self.collection.update_one, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        return await self._run(self.collection.find_one_and_update, *args, **kwargs)
+
+    async def delete_one(self, *args, **kwargs) -> Any:
+        return await self._run(self.collection.delete_one, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs) -> int:
+        return await self._run(self.collection.count_documents, *args, **kwargs)
+
+    async def create_index(self, *args, **kwargs) -> str:
+        return await self._run(self.collection.create_index, *args, **kwargs)
+
+    async def watch(self, *args, **kwargs) -> AsyncChangeStream:
+        return AsyncChangeStream(await self._run(self.collection.watch, *args, **kwargs), self._run)
+
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+
+async_rules_collection = AsyncCollection(rules_collection, db_executor)
+async_evaluations_collection = AsyncCollection(evaluations_collection, db_executor)
+
+_async_collections: Dict[str, AsyncCollection] = {}
+
+def get_async_collection(name: str) -> AsyncCollection:
+    # Any collection of the rule_engine database, e.g. the records rules are run against
+    collection = _async_collections.get(name)
+    if collection is None:
+        collection = _async_collections[name] = AsyncCollection(db[name], db_executor)
+    return collection
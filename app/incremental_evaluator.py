@@ -0,0 +1,310 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.rule_engine import COMPARATORS, Node, NodeType, Operator
+
+# Node values, one byte per node and record key
+FALSE, TRUE, ERROR = 0, 1, 2
+
+@dataclass
+class SessionResult:
+    matched: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    # Rules whose outcome differs from the previous evaluation of this key;
+    # None for rules that now fail with an error
+    changed: Dict[str, Optional[bool]] = field(default_factory=dict)
+    evaluated_nodes: int = 0
+
+class IncrementalNetwork:
+    # A rule set flattened into one array of node values. The first entries
+    # are the distinct comparisons (and constants), shared between rules like
+    # RuleNetwork slots; operators follow, children before parents, so a full
+    # evaluation is a single forward pass. Every node knows its parents, and
+    # every field the comparisons reading it, so a change to a few fields only
+    # recomputes the paths from their comparisons towards the roots.
+    def __init__(self, rules: Dict[str, Node]):
+        self._slot_keys: Dict[Tuple[Optional[str], Any, Any], int] = {}
+        # (field, compare, value) per slot; field is None for constants
+        self.slots: List[Tuple[Optional[str], Optional[Callable[[Any, Any], bool]], Any]] = []
+        self.by_field: Dict[str, List[int]] = {}
+        # (left, right, is_and) per operator, at index len(slots) + position
+        self.operators: List[Tuple[int, int, bool]] = []
+        self.parents: List[List[int]] = []
+        self.roots: Dict[str, int] = {}
+        self.rules_at: Dict[int, List[str]] = {}
+
+        for node in (node for root in rules.values() for node in _nodes(root)):
+            if node.type != NodeType.OPERATOR:
+                self._slot(node)
+        base = len(self.slots)
+        self.parents = [[] for _ in self.slots]
+        for rule_id, root in rules.items():
+            index = self._compile(root, base)
+            self.roots[rule_id] = index
+            self.rules_at.setdefault(index, []).append(rule_id)
+
+    def __len__(self) -> int:
+        return len(self.slots) + len(self.operators)
+
+    def _slot(self, node: Node) -> int:
+        if node.type == NodeType.COMPARISON and node.operator in COMPARATORS:
+            key = (node.field, node.operator, node.value)
+            spec = (node.field, COMPARATORS[node.operator], node.value)
+        elif node.type == NodeType.LITERAL:
+            key = spec = (None, None, bool(node.value))
+        else:
+            raise ValueError(f"Invalid node type: {node.type}")
+        slot = self._slot_keys.get(key)
+        if slot is None:
+            slot = self._slot_keys[key] = len(self.slots)
+            self.slots.append(spec)
+            if spec[0] is not None:
+                self.by_field.setdefault(spec[0], []).append(slot)
+        return slot
+
+    def _compile(self, root: Node, base: int) -> int:
+        # Post-order without recursion; returns the root's index
+        stack: List[Tuple[Node, bool]] = [(root, False)]
+        indices: List[int] = []
+        while stack:
+            node, expanded = stack.pop()
+            if node.type != NodeType.OPERATOR:
+                indices.append(self._slot(node))
+            elif not expanded:
+                stack += [(node, True), (node.right, False), (node.left, False)]
+            else:
+                right, left = indices.pop(), indices.pop()
+                index = base + len(self.operators)
+                self.operators.append((left, right, node.operator == Operator.AND))
+                self.parents.append([])
+                self.parents[left].append(index)
+                self.parents[right].append(index)
+                indices.append(index)
+        return indices.pop()
+
+    def _compare(self, slot: int, record: Dict[str, Any], errors: Dict[int, str]) -> int:
+        name, compare, value = self.slots[slot]
+        if name is None:
+            return TRUE if value else FALSE
+        if errors:
+            errors.pop(slot, None)
+        if name not in record:
+            errors[slot] = f"Field {name} not found in data"
+            return ERROR
+        try:
+            return TRUE if compare(record[name], value) else FALSE
+        except TypeError as e:
+            errors[slot] = str(e)
+            return ERROR
+
+    def _combine(self, index: int, values: bytearray) -> int:
+        # Same outcome as short-circuit evaluation: the left operand decides
+        # unless it is True (AND) or False (OR); an error on the left wins
+        left, right, is_and = self.operators[index - len(self.slots)]
+        value = values[left]
+        if value == (TRUE if is_and else FALSE):
+            return values[right]
+        return value
+
+    def evaluate(self, record: Dict[str, Any], errors: Dict[int, str]) -> bytearray:
+        values = bytearray(len(self))
+        for slot in range(len(self.slots)):
+            values[slot] = self._compare(slot, record, errors)
+        for index in range(len(self.slots), len(values)):
+            values[index] = self._combine(index, values)
+        return values
+
+    def update(self, record: Dict[str, Any], values: bytearray, errors: Dict[int, str],
+               fields: Iterable[str], before: Dict[int, int]) -> int:
+        # Recomputes the comparisons on the changed fields, then walks up from
+        # each one that changed, stopping where a value stays the same. Every
+        # node is recomputed after each change of a child, so it ends up
+        # consistent with its children. The first value of each rule root that
+        # changed is recorded in before. Returns the number of nodes recomputed.
+        changed = []
+        evaluated = 0
+        for name in fields:
+            for slot in self.by_field.get(name, ()):
+                value = self._compare(slot, record, errors)
+                evaluated += 1
+                if value != values[slot]:
+                    if slot in self.rules_at:
+                        before.setdefault(slot, values[slot])
+                    values[slot] = value
+                    changed.append(slot)
+        for slot in changed:
+            for index in self.parents[slot]:
+                while True:
+                    value = self._combine(index, values)
+                    evaluated += 1
+                    if value == values[index]:
+                        break
+                    if index in self.rules_at:
+                        before.setdefault(index, values[index])
+                    values[index] = value
+                    if not self.parents[index]:
+                        break
+                    index = self.parents[index][0]
+        return evaluated
+
+    def error(self, index: int, values: bytearray, errors: Dict[int, str]) -> str:
+        # Follows the operands that decided the result down to the failing comparison
+        while index >= len(self.slots):
+            left, right, is_and = self.operators[index - len(self.slots)]
+            index = right if values[left] == (TRUE if is_and else FALSE) else left
+        return errors[index]
+
+def _nodes(root: Node) -> Iterable[Node]:
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node.type == NodeType.OPERATOR:
+            stack += [node.right, node.left]
+
+def _outcome(value: int) -> Optional[bool]:
+    return None if value == ERROR else value == TRUE
+
+class _KeyState:
+    __slots__ = ("network", "record", "values", "errors", "matched", "errored")
+
+    def __init__(self, network: IncrementalNetwork, record: Dict[str, Any], values: bytearray,
+                 errors: Dict[int, str]):
+        self.network = network
+        self.record = record
+        self.values = values
+        # Error messages of the comparison slots that failed
+        self.errors = errors
+        self.matched: Set[str] = set()
+        self.errored: Set[str] = set()
+
+class EvaluationSession:
+    # Evaluates a rule set against records identified by a key, remembering
+    # each record and the last value of every node for it. A delta recomputes
+    # only the comparisons on the changed fields and the paths above them, and
+    # reports the rules whose outcome changed. Keys are evicted least recently
+    # used beyond max_keys.
+    def __init__(self, rules: Optional[Dict[str, Node]] = None, max_keys: int = 100000):
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1")
+        self.max_keys = max_keys
+        self._rules: Dict[str, Node] = dict(rules or {})
+        self._network: Optional[IncrementalNetwork] = None
+        self._states: "OrderedDict[str, _KeyState]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._states
+
+    def add_rule(self, rule_id: str, node: Node):
+        # Stored keys are re-evaluated in full against the new rule set on
+        # their next update
+        with self._lock:
+            if self._rules.get(rule_id) is not node:
+                self._rules[rule_id] = node
+                self._network = None
+
+    def remove_rule(self, rule_id: str) -> bool:
+        with self._lock:
+            if self._rules.pop(rule_id, None) is None:
+                return False
+            self._network = None
+            return True
+
+    def sync_rules(self, rules: Dict[str, Node]):
+        with self._lock:
+            if rules.keys() != self._rules.keys() or any(self._rules[rule_id] is not node
+                                                         for rule_id, node in rules.items()):
+                self._rules = dict(rules)
+                self._network = None
+
+    def evaluate(self, key: str, record: Dict[str, Any]) -> SessionResult:
+        # Full record. For a known key only the fields that differ from the
+        # stored record are recomputed.
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return self._update(key, None, dict(record), ())
+            stored = state.record
+            fields = [name for name in stored.keys() | record.keys()
+                      if name not in record or name not in stored or not _same(stored[name], record[name])]
+            return self._update(key, state, dict(record), fields)
+
+    def apply_delta(self, key: str, changes: Dict[str, Any], removed: Iterable[str] = ()) -> SessionResult:
+        # Raises KeyError for keys that were never evaluated (or were evicted)
+        with self._lock:
+            state = self._states[key]
+            record = dict(state.record)
+            record.update(changes)
+            removed = [name for name in removed if name in record]
+            for name in removed:
+                del record[name]
+            return self._update(key, state, record, [*changes, *removed])
+
+    def forget(self, key: str) -> bool:
+        with self._lock:
+            return self._states.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+    def _update(self, key: str, state: Optional[_KeyState], record: Dict[str, Any],
+                fields: Iterable[str]) -> SessionResult:
+        if self._network is None:
+            self._network = IncrementalNetwork(self._rules)
+        network = self._network
+        result = SessionResult()
+
+        if state is not None and state.network is network:
+            state.record = record
+            before: Dict[int, int] = {}
+            result.evaluated_nodes = network.update(record, state.values, state.errors, fields, before)
+            for index, value in before.items():
+                if state.values[index] != value:
+                    for rule_id in network.rules_at[index]:
+                        self._track(state, rule_id, state.values[index], result)
+        else:
+            # New key, or the rules changed since the key's last update
+            errors: Dict[int, str] = {}
+            values = network.evaluate(record, errors)
+            result.evaluated_nodes = len(values)
+            previous = state
+            state = _KeyState(network, record, values, errors)
+            for rule_id, index in network.roots.items():
+                old = None
+                if previous is not None and rule_id in previous.network.roots:
+                    old = previous.values[previous.network.roots[rule_id]]
+                if old != values[index]:
+                    self._track(state, rule_id, values[index], result)
+                elif old == TRUE:
+                    state.matched.add(rule_id)
+                elif old == ERROR:
+                    state.errored.add(rule_id)
+
+        result.matched = sorted(state.matched)
+        result.errors = {rule_id: network.error(network.roots[rule_id], state.values, state.errors)
+                         for rule_id in sorted(state.errored)}
+        self._states[key] = state
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_keys:
+            self._states.popitem(last=False)
+        return result
+
+    def _track(self, state: _KeyState, rule_id: str, value: int, result: SessionResult):
+        result.changed[rule_id] = _outcome(value)
+        state.matched.discard(rule_id)
+        state.errored.discard(rule_id)
+        if value == TRUE:
+            state.matched.add(rule_id)
+        elif value == ERROR:
+            state.errored.add(rule_id)
+
+def _same(old: Any, new: Any) -> bool:
+    # 1 == 1.0 == True, but they can compare differently against a rule value
+    return type(old) is type(new) and old == new
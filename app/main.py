@@ -1,8 +1,11 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import api
+import asyncio
 import logging
+import os
 
 
 # Create logger
@@ -10,11 +13,51 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
-# Create FastAPI instance
+# Preload and compile all active rules when the app starts; GET /api/ready
+# reports progress. Runs in the background so the server accepts requests
+# (and readiness probes) while loading. Unless RULE_SYNC_MODE is "off", the
+# task then keeps following rule changes made by other workers.
+RULE_WARMUP_ON_STARTUP = os.getenv("RULE_WARMUP_ON_STARTUP", "true").lower() == "true"
+
+async def sync_rules():
+    try:
+        await api.rule_sync.run()
+    except Exception as e:
+        logger.error(f"Rule registry warm-up or sync failed: {str(e)}", exc_info=True)
 
+async def create_indexes():
+    # Indexes backing rule listing filters, pagination and sync polling
+    try:
+        await api.rule_repository.create_indexes()
+    except Exception as e:
+        logger.error(f"Creating rule indexes failed: {str(e)}", exc_info=True)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    indexes = asyncio.create_task(create_indexes())
+    log_flusher = asyncio.create_task(api.evaluation_log.run()) if api.evaluation_log is not None else None
+    # Sync needs a warmed-up registry, so enabling it implies the warm-up
+    if RULE_WARMUP_ON_STARTUP or api.RULE_SYNC_MODE != "off":
+        background = asyncio.create_task(sync_rules())
+    else:
+        background = None
+    yield
+    indexes.cancel()
+    if background is not None:
+        background.cancel()
+    if api.parallel_evaluator is not None:
+        api.parallel_evaluator.close(wait=False)
+    if api.parse_pool is not None:
+        api.parse_pool.shutdown(wait=False, cancel_futures=True)
+        api.parse_pool = None
+    if log_flusher is not None:
+        # Waits for a flush in progress, then writes out whatever is still buffered
+        await api.evaluation_log.close()
+        log_flusher.cancel()
 
-app = FastAPI(title="Rule Engine API")
+
+# Create FastAPI instance
+app = FastAPI(title="Rule Engine API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
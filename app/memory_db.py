@@ -0,0 +1,419 @@
+import copy
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+# In-memory stand-in for the subset of the pymongo API this project uses.
+# Selected with MONGODB_URL=memory:// for tests, benchmarks and local runs
+# without a MongoDB server.
+
+# Change events retained for change streams. A stream that falls further
+# behind fails with ChangeStreamHistoryLost, like one whose resume point has
+# rolled off a server's oplog.
+CHANGE_LOG_SIZE = 10000
+CHANGE_STREAM_HISTORY_LOST = 286
+
+@dataclass
+class InsertOneResult:
+    inserted_id: Any
+    acknowledged: bool = True
+
+@dataclass
+class InsertManyResult:
+    inserted_ids: List[Any]
+    acknowledged: bool = True
+
+@dataclass
+class UpdateResult:
+    matched_count: int
+    modified_count: int
+    acknowledged: bool = True
+
+@dataclass
+class DeleteResult:
+    deleted_count: int
+    acknowledged: bool = True
+
+def _type_rank(value: Any) -> int:
+    # BSON comparison order for the types we store
+    if value is None:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, (list, tuple)):
+        return 5
+    if isinstance(value, bytes):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+def sort_key(value: Any) -> Tuple[int, Any]:
+    rank = _type_rank(value)
+    return (rank, value if rank in (2, 3, 6, 7, 8, 9) else 0)
+
+def _compare(value: Any, operand: Any, compare) -> bool:
+    # Range operators only match values in the same BSON type bracket
+    if _type_rank(value) != _type_rank(operand):
+        return False
+    return compare(value, operand)
+
+def _equals(present: bool, value: Any, operand: Any) -> bool:
+    if not present:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand and _type_rank(value) == _type_rank(operand)
+
+def _apply_operator(operator: str, present: bool, value: Any, operand: Any, condition: Dict[str, Any]) -> bool:
+    if operator == "$eq":
+        return _equals(present, value, operand)
+    if operator == "$ne":
+        return not _equals(present, value, operand)
+    if operator == "$gt":
+        return present and _compare(value, operand, lambda a, b: a > b)
+    if operator == "$gte":
+        return present and _compare(value, operand, lambda a, b: a >= b)
+    if operator == "$lt":
+        return present and _compare(value, operand, lambda a, b: a < b)
+    if operator == "$lte":
+        return present and _compare(value, operand, lambda a, b: a <= b)
+    if operator == "$in":
+        return any(_equals(present, value, item) for item in operand)
+    if operator == "$nin":
+        return not any(_equals(present, value, item) for item in operand)
+    if operator == "$exists":
+        return present == bool(operand)
+    if operator == "$regex":
+        flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+        return present and isinstance(value, str) and re.search(operand, value, flags) is not None
+    if operator == "$options":
+        return True
+    if operator == "$not":
+        return not _match_condition(present, value, operand)
+    raise ValueError(f"Unsupported query operator: {operator}")
+
+def _match_condition(present: bool, value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        return all(_apply_operator(op, present, value, operand, condition) for op, operand in condition.items())
+    return _equals(present, value, condition)
+
+def matches(document: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(document, sub_query) for sub_query in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, sub_query) for sub_query in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, sub_query) for sub_query in condition):
+                return False
+        elif not _match_condition(key in document, document.get(key), condition):
+            return False
+    return True
+
+def project(document: Dict[str, Any], projection: Optional[Any]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(document)
+    if isinstance(projection, (list, tuple)):
+        projection = {key: 1 for key in projection}
+    include_id = projection.get("_id", 1)
+    fields = {key: flag for key, flag in projection.items() if key != "_id"}
+    if fields and all(fields.values()):
+        result = {key: copy.deepcopy(document[key]) for key in fields if key in document}
+    else:
+        result = {key: copy.deepcopy(value) for key, value in document.items() if fields.get(key, 1)}
+    if include_id and "_id" in document:
+        result["_id"] = document["_id"]
+    else:
+        result.pop("_id", None)
+    return result
+
+class InMemoryCursor:
+    def __init__(self, collection: "InMemoryCollection", query: Optional[Dict[str, Any]], projection: Optional[Any]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._iterator: Optional[Iterator[Dict[str, Any]]] = None
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "InMemoryCursor":
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> "InMemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "InMemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "InMemoryCursor":
+        return self
+
+    def hint(self, index: Any) -> "InMemoryCursor":
+        return self
+
+    def close(self):
+        self._iterator = iter(())
+
+    def __iter__(self) -> "InMemoryCursor":
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        if self._iterator is None:
+            self._iterator = iter(self._materialize())
+        return next(self._iterator)
+
+    def _materialize(self) -> List[Dict[str, Any]]:
+        with self._collection._lock:
+            documents = self._collection._select(self._query)
+            for key, direction in reversed(self._sort):
+                documents.sort(key=lambda document: sort_key(document.get(key)), reverse=direction < 0)
+            documents = documents[self._skip:]
+            if self._limit:
+                documents = documents[:self._limit]
+            return [project(document, self._projection) for document in documents]
+
+class InMemoryChangeStream:
+    # Change stream over a collection's change log. fullDocument is looked up
+    # when the event is read (as with full_document="updateLookup"), so it is
+    # None once the document has been deleted.
+    def __init__(self, collection: "InMemoryCollection", position: int, full_document: Optional[str]):
+        self._collection = collection
+        self._position = position
+        self._full_document = full_document
+        self.alive = True
+
+    @property
+    def resume_token(self) -> Dict[str, Any]:
+        return {"_data": str(self._position)}
+
+    def try_next(self) -> Optional[Dict[str, Any]]:
+        if not self.alive:
+            return None
+        collection = self._collection
+        with collection._lock:
+            if collection._change_seq == self._position:
+                return None
+            oldest = collection._change_seq - len(collection._changes) + 1
+            if self._position + 1 < oldest:
+                self.alive = False
+                raise OperationFailure("Resume of change stream was not possible, as the resume point "
+                                       "may no longer be in the oplog", code=CHANGE_STREAM_HISTORY_LOST)
+            self._position += 1
+            event = copy.deepcopy(collection._changes[self._position - oldest])
+            event["_id"] = self.resume_token
+            if event["operationType"] == "insert" or (
+                    event["operationType"] == "update" and self._full_document == "updateLookup"):
+                document = collection._documents.get(event["documentKey"]["_id"])
+                event["fullDocument"] = copy.deepcopy(document)
+            if event["operationType"] == "invalidate":
+                self.alive = False
+            return event
+
+    def close(self):
+        self.alive = False
+
+    def __enter__(self) -> "InMemoryChangeStream":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class InMemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: Dict[Any, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[str, Any]] = {"_id_": {"key": [("_id", 1)]}}
+        self._lock = threading.RLock()
+        self._changes: deque = deque(maxlen=CHANGE_LOG_SIZE)
+        self._change_seq = 0
+
+    def _record_change(self, operation: str, document_id: Any = None, **details):
+        event = {"operationType": operation, "ns": {"coll": self.name}, **details}
+        if document_id is not None:
+            event["documentKey"] = {"_id": document_id}
+        self._changes.append(event)
+        self._change_seq += 1
+
+    def watch(self, pipeline: Optional[List[Dict[str, Any]]] = None, full_document: Optional[str] = None,
+              resume_after: Optional[Dict[str, Any]] = None, **kwargs) -> InMemoryChangeStream:
+        if pipeline:
+            raise NotImplementedError("Change stream pipelines are not supported in memory")
+        with self._lock:
+            position = int(resume_after["_data"]) if resume_after else self._change_seq
+            return InMemoryChangeStream(self, position, full_document)
+
+    def _select(self, query: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [document for document in self._documents.values() if matches(document, query)]
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Any] = None, **kwargs) -> InMemoryCursor:
+        cursor = InMemoryCursor(self, filter, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    def find_one(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Any] = None, **kwargs) -> Optional[Dict[str, Any]]:
+        return next(self.find(filter, projection, **kwargs).limit(1), None)
+
+    def count_documents(self, filter: Dict[str, Any], **kwargs) -> int:
+        count = len(self._select(filter)[kwargs.get("skip", 0):])
+        return min(count, kwargs["limit"]) if kwargs.get("limit") else count
+
+    def insert_one(self, document: Dict[str, Any]) -> InsertOneResult:
+        with self._lock:
+            document.setdefault("_id", ObjectId())
+            if document["_id"] in self._documents:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} dup key: {document['_id']}")
+            self._documents[document["_id"]] = copy.deepcopy(document)
+            self._record_change("insert", document["_id"])
+            return InsertOneResult(inserted_id=document["_id"])
+
+    def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> InsertManyResult:
+        inserted_ids, errors = [], []
+        with self._lock:
+            for position, document in enumerate(documents):
+                try:
+                    inserted_ids.append(self.insert_one(document).inserted_id)
+                except DuplicateKeyError as e:
+                    errors.append({"index": position, "code": 11000, "errmsg": str(e), "op": document})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted_ids)})
+        return InsertManyResult(inserted_ids=inserted_ids)
+
+    def _apply_update(self, document: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        before = copy.deepcopy(document)
+        for operator, changes in update.items():
+            for key, value in changes.items():
+                if operator == "$set":
+                    document[key] = copy.deepcopy(value)
+                elif operator == "$unset":
+                    document.pop(key, None)
+                elif operator == "$inc":
+                    document[key] = document.get(key, 0) + value
+                else:
+                    raise ValueError(f"Unsupported update operator: {operator}")
+        if document == before:
+            return False
+        self._record_change("update", document["_id"], updateDescription={
+            "updatedFields": {key: copy.deepcopy(value) for key, value in document.items()
+                              if key not in before or before[key] != value},
+            "removedFields": [key for key in before if key not in document]
+        })
+        return True
+
+    def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], **kwargs) -> UpdateResult:
+        with self._lock:
+            documents = self._select(filter)
+            if not documents:
+                return UpdateResult(matched_count=0, modified_count=0)
+            return UpdateResult(matched_count=1, modified_count=int(self._apply_update(documents[0], update)))
+
+    def find_one_and_update(self, filter: Dict[str, Any], update: Dict[str, Any], projection: Optional[Any] = None,
+                            return_document: bool = ReturnDocument.BEFORE, **kwargs) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            documents = self._select(filter)
+            if not documents:
+                return None
+            before = project(documents[0], projection)
+            self._apply_update(documents[0], update)
+            return project(documents[0], projection) if return_document == ReturnDocument.AFTER else before
+
+    def delete_one(self, filter: Dict[str, Any], **kwargs) -> DeleteResult:
+        with self._lock:
+            documents = self._select(filter)
+            if not documents:
+                return DeleteResult(deleted_count=0)
+            del self._documents[documents[0]["_id"]]
+            self._record_change("delete", documents[0]["_id"])
+            return DeleteResult(deleted_count=1)
+
+    def delete_many(self, filter: Dict[str, Any], **kwargs) -> DeleteResult:
+        with self._lock:
+            documents = self._select(filter)
+            for document in documents:
+                del self._documents[document["_id"]]
+                self._record_change("delete", document["_id"])
+            return DeleteResult(deleted_count=len(documents))
+
+    def create_index(self, keys: Any, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        name = kwargs.get("name") or "_".join(f"{key}_{direction}" for key, direction in keys)
+        with self._lock:
+            self._indexes[name] = {"key": list(keys), **{k: v for k, v in kwargs.items() if k != "name"}}
+        return name
+
+    def index_information(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return copy.deepcopy(self._indexes)
+
+    def drop(self):
+        with self._lock:
+            self._documents.clear()
+            self._indexes = {"_id_": {"key": [("_id", 1)]}}
+            self._record_change("drop")
+            self._record_change("invalidate")
+
+class InMemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name)
+        return self._collections[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+class InMemoryClient:
+    def __init__(self, *args, **kwargs):
+        self._databases: Dict[str, InMemoryDatabase] = {}
+
+    def __getattr__(self, name: str) -> InMemoryDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> InMemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = InMemoryDatabase(name)
+        return self._databases[name]
+
+    def close(self):
+        pass
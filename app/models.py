@@ -38,4 +38,13 @@ class ValidAttribute(str, Enum):
     SPEND = "spend"
     INCOME = "income"
 
-VALID_ATTRIBUTES = set(item.value for item in ValidAttribute)
\ No newline at end of file
+VALID_ATTRIBUTES = set(item.value for item in ValidAttribute)
+# Declared type of each attribute; records are coerced to it by RecordSchema
+ATTRIBUTE_TYPES = {
+    ValidAttribute.AGE.value: int,
+    ValidAttribute.DEPARTMENT.value: str,
+    ValidAttribute.SALARY.value: float,
+    ValidAttribute.EXPERIENCE.value: int,
+    ValidAttribute.SPEND.value: float,
+    ValidAttribute.INCOME.value: float,
+}
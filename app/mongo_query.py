@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.rule_engine import COMPARATORS, ComparisonOperator, Node, NodeType, Operator
+
+# Translates rule trees into MongoDB filters so matching records are selected
+# by the server (and its indexes) instead of evaluating every document in
+# Python. Missing attributes and type mismatches simply do not match, as in a
+# MongoDB query, where RuleEvaluator would raise; records the rule cannot be
+# evaluated on are therefore never returned.
+
+MONGO_OPERATORS = {
+    ComparisonOperator.GT: "$gt",
+    ComparisonOperator.LT: "$lt",
+    ComparisonOperator.GTE: "$gte",
+    ComparisonOperator.LTE: "$lte",
+    ComparisonOperator.EQ: "$eq",
+    ComparisonOperator.NEQ: "$ne",
+}
+
+# Matches no document
+MATCH_NOTHING = {"$nor": [{}]}
+
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+@dataclass
+class MongoQuery:
+    filter: Dict[str, Any]
+    # Conjuncts that could not be translated; documents returned by filter
+    # must also satisfy residual (see matches_residual)
+    residual: Optional[Node] = None
+
+def to_mongo_query(node: Node) -> MongoQuery:
+    # Conjuncts are translated independently so one untranslatable comparison
+    # only moves itself to the residual; an OR must translate as a whole
+    filters: List[Dict[str, Any]] = []
+    residual: List[Node] = []
+    for conjunct in _chain(node, Operator.AND):
+        translated = _translate(conjunct)
+        if translated is None:
+            residual.append(conjunct)
+        else:
+            filters.append(translated)
+
+    if not filters:
+        query: Dict[str, Any] = {}
+    elif len(filters) == 1:
+        query = filters[0]
+    else:
+        query = {"$and": filters}
+
+    remainder = None
+    for conjunct in residual:
+        remainder = conjunct if remainder is None else Node(NodeType.OPERATOR, operator=Operator.AND,
+                                                            left=remainder, right=conjunct)
+    return MongoQuery(query, remainder)
+
+def matches_residual(node: Node, document: Dict[str, Any]) -> bool:
+    # Python counterpart of the translated filter, with the same treatment of
+    # missing attributes and type mismatches
+    if node.type == NodeType.OPERATOR:
+        children = _chain(node, node.operator)
+        if node.operator == Operator.AND:
+            return all(matches_residual(child, document) for child in children)
+        return any(matches_residual(child, document) for child in children)
+    if node.type == NodeType.LITERAL:
+        return bool(node.value)
+    if node.type != NodeType.COMPARISON or node.field not in document:
+        return False
+    try:
+        return bool(COMPARATORS[node.operator](document[node.field], node.value))
+    except TypeError:
+        return False
+
+def _chain(node: Node, operator: Operator) -> List[Node]:
+    # Operands of a run of same-operator nodes, left to right, without
+    # recursing down the parser's left-deep chains
+    if node.type != NodeType.OPERATOR or node.operator != operator:
+        return [node]
+    operands, stack = [], [node]
+    while stack:
+        current = stack.pop()
+        if current.type == NodeType.OPERATOR and current.operator == operator:
+            stack += [current.right, current.left]
+        else:
+            operands.append(current)
+    return operands
+
+def _translate(node: Node) -> Optional[Dict[str, Any]]:
+    if node.type == NodeType.COMPARISON:
+        return _comparison(node)
+    if node.type == NodeType.LITERAL:
+        return {} if node.value else dict(MATCH_NOTHING)
+    if node.type != NodeType.OPERATOR:
+        return None
+    parts = []
+    for child in _chain(node, node.operator):
+        translated = _translate(child)
+        if translated is None:
+            return None
+        parts.append(translated)
+    return {"$and" if node.operator == Operator.AND else "$or": parts}
+
+def _comparison(node: Node) -> Optional[Dict[str, Any]]:
+    operator = MONGO_OPERATORS.get(node.operator)
+    field, value = node.field, node.value
+    # Dots and leading $ mean paths and operators to MongoDB, not plain keys
+    if operator is None or not field or "." in field or field.startswith("$") or "\0" in field:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    if isinstance(value, int) and not INT64_MIN <= value <= INT64_MAX:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if operator == "$ne":
+        # $ne alone also matches documents without the field
+        return {field: {"$ne": value, "$exists": True}}
+    return {field: {operator: value}}
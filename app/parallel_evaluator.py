@@ -0,0 +1,181 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.rule_engine import Node
+from app.rule_index import RuleIndex
+from app.rule_network import RuleNetwork
+
+# Matched rule ids and {rule_id: error} for one record
+RecordResult = Tuple[List[str], Dict[str, str]]
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_MAX_PENDING_CHANGES = 100
+
+# (version, rule_id, node or None when the rule was removed)
+RuleChange = Tuple[int, str, Optional[Node]]
+
+# Rule set of the current worker process, built by _init_worker and brought up
+# to date with the changes shipped along with each chunk
+_worker_rules: Optional[Tuple[RuleNetwork, RuleIndex]] = None
+_worker_version = 0
+
+def _build(rules: Dict[str, Node]) -> Tuple[RuleNetwork, RuleIndex]:
+    network, index = RuleNetwork(), RuleIndex()
+    for rule_id, node in rules.items():
+        network.add_rule(rule_id, node)
+        index.add_rule(rule_id, node)
+    return network, index
+
+def _evaluate_records(rules: Tuple[RuleNetwork, RuleIndex], records: Sequence[Dict[str, Any]]) -> List[RecordResult]:
+    network, index = rules
+    results = []
+    for record in records:
+        result = network.evaluate(record, rule_ids=sorted(index.candidates(record)))
+        results.append((result.matched, result.errors))
+    return results
+
+def _init_worker(rules: Dict[str, Node], version: int):
+    global _worker_rules, _worker_version
+    _worker_rules = _build(rules)
+    _worker_version = version
+
+def _apply_changes(changes: Sequence[RuleChange]):
+    global _worker_version
+    network, index = _worker_rules
+    for version, rule_id, node in changes:
+        if version <= _worker_version:
+            continue
+        network.remove_rule(rule_id)
+        index.remove_rule(rule_id)
+        if node is not None:
+            network.add_rule(rule_id, node)
+            index.add_rule(rule_id, node)
+        _worker_version = version
+
+def _evaluate_chunk(records: Sequence[Dict[str, Any]], changes: Sequence[RuleChange] = ()) -> List[RecordResult]:
+    _apply_changes(changes)
+    return _evaluate_records(_worker_rules, records)
+
+class ParallelRuleEvaluator:
+    # Evaluates a rule set over large batches of records on a pool of worker
+    # processes, sidestepping the GIL. The rules are shipped once, as the pool
+    # initializer's argument, and compiled into a shared-predicate network in
+    # every worker; afterwards only record chunks and results cross the
+    # process boundary. Batches of at most chunk_size records are evaluated
+    # in-process, on a thread, where pickling would cost more than it saves.
+    #
+    # update() ships later rule changes along with each chunk, and workers
+    # apply the ones they have not seen yet. Once more than max_pending_changes
+    # accumulate, the pool is retired (its pending chunks still run) and the
+    # next batch starts a new one from the current rules.
+    def __init__(self, rules: Dict[str, Node], workers: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_pending_changes: int = DEFAULT_MAX_PENDING_CHANGES):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.rules = dict(rules)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_pending_changes = max_pending_changes
+        self.version = 0
+        self._changes: List[RuleChange] = []
+        # (version, rules) built from the rules of that version; replaced, never
+        # mutated, so threads evaluating an older one are unaffected
+        self._local = (0, _build(self.rules))
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ParallelRuleEvaluator":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that already runs database threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.rules, self.version)
+            )
+            self._changes = []
+        return self._pool
+
+    def update(self, rules: Dict[str, Node]):
+        version = self.version
+        changes: List[RuleChange] = []
+        for rule_id, node in rules.items():
+            if self.rules.get(rule_id) is not node:
+                version += 1
+                changes.append((version, rule_id, node))
+        for rule_id in self.rules.keys() - rules.keys():
+            version += 1
+            changes.append((version, rule_id, None))
+        if not changes:
+            return
+        self.rules = dict(rules)
+        self.version = version
+        if self._pool is None:
+            return
+        self._changes.extend(changes)
+        if len(self._changes) > self.max_pending_changes:
+            self.close(wait=False, cancel_futures=False)
+
+    def _local_rules(self) -> Tuple[RuleNetwork, RuleIndex]:
+        version, rules = self.version, self.rules
+        local = self._local
+        if local[0] != version:
+            local = self._local = (version, _build(rules))
+        return local[1]
+
+    def _evaluate_local(self, records: Sequence[Dict[str, Any]]) -> List[RecordResult]:
+        return _evaluate_records(self._local_rules(), records)
+
+    def _chunks(self, records: Sequence[Dict[str, Any]]) -> List[Sequence[Dict[str, Any]]]:
+        # Enough chunks to keep every worker busy, none larger than chunk_size
+        size = min(self.chunk_size, -(-len(records) // self.workers))
+        return [records[start:start + size] for start in range(0, len(records), size)]
+
+    def evaluate(self, records: Sequence[Dict[str, Any]]) -> List[RecordResult]:
+        if self.workers == 1 or len(records) <= self.chunk_size:
+            return self._evaluate_local(records)
+        pool = self._get_pool()
+        changes = tuple(self._changes)
+        results: List[RecordResult] = []
+        for chunk in pool.map(_evaluate_chunk, self._chunks(records), repeat(changes)):
+            results.extend(chunk)
+        return results
+
+    async def evaluate_async(self, records: Sequence[Dict[str, Any]]) -> List[RecordResult]:
+        # Same as evaluate() without blocking the event loop
+        if self.workers == 1 or len(records) <= self.chunk_size:
+            return await asyncio.get_running_loop().run_in_executor(None, self._evaluate_local, records)
+        pool = self._get_pool()
+        changes = tuple(self._changes)
+        chunks = await asyncio.gather(*(
+            asyncio.wrap_future(pool.submit(_evaluate_chunk, chunk, changes)) for chunk in self._chunks(records)
+        ))
+        return [result for chunk in chunks for result in chunk]
+
+    def close(self, wait: bool = True, cancel_futures: Optional[bool] = None):
+        # cancel_futures defaults to not wait: shutting down for good
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=not wait if cancel_futures is None else cancel_futures)
+            self._pool = None
+            self._changes = []
+
+def evaluate_rule_parallel(node: Node, records: Sequence[Dict[str, Any]], workers: Optional[int] = None,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[bool]:
+    # evaluate_rule over many records. Raises ValueError for the first record
+    # the rule cannot be evaluated on. Starts and stops a pool per call; keep a
+    # ParallelRuleEvaluator around to amortize that over several batches.
+    with ParallelRuleEvaluator({"rule": node}, workers=workers, chunk_size=chunk_size) as evaluator:
+        results = evaluator.evaluate(records)
+    for position, (matched, errors) in enumerate(results):
+        if errors:
+            raise ValueError(f"Record {position}: {errors['rule']}")
+    return [bool(matched) for matched, _ in results]
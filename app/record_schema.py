@@ -0,0 +1,212 @@
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.models import ATTRIBUTE_TYPES
+from app.rule_engine import ComparisonOperator, Node, NodeType, Operator
+from app.rule_index import RuleIndex
+
+# A record decoded into one value per schema slot
+Row = Tuple[Any, ...]
+SlotRule = Callable[[Row], bool]
+# Matched rule ids and {rule_id: error} for one row
+RowResult = Tuple[List[str], Dict[str, str]]
+
+class Missing:
+    # Placeholder for an absent attribute. Comparing it raises the error
+    # evaluating the rule on the original record would have raised, so slot
+    # rules need no presence check of their own.
+    __slots__ = ("field",)
+
+    def __init__(self, field: str):
+        self.field = field
+
+    def _raise(self, other: Any) -> bool:
+        raise ValueError(f"Field {self.field} not found in data")
+
+    __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = _raise
+    __hash__ = object.__hash__
+
+    def __repr__(self) -> str:
+        return f"Missing({self.field!r})"
+
+def _number_text(value: str) -> str:
+    # int() and float() accept digit separators ("1_000"); records may not
+    text = value.strip()
+    if "_" in text:
+        raise ValueError(f"invalid number {value!r}")
+    return text
+
+def _to_int(value: Any) -> int:
+    if type(value) is int:
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        text = _number_text(value)
+        try:
+            return int(text)
+        except ValueError:
+            return _to_int(float(text))
+    raise ValueError(f"expected int, got {value!r}")
+
+def _to_float(value: Any) -> float:
+    if type(value) is float:
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        return float(_number_text(value))
+    raise ValueError(f"expected float, got {value!r}")
+
+def _to_str(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    raise ValueError(f"expected str, got {value!r}")
+
+COERCERS: Dict[type, Callable[[Any], Any]] = {int: _to_int, float: _to_float, str: _to_str}
+
+# Per comparison operator: (slot, value) -> slot rule
+_SLOT_COMPARISONS: Dict[ComparisonOperator, Callable[[int, Any], SlotRule]] = {
+    ComparisonOperator.GT: lambda slot, value: lambda row: row[slot] > value,
+    ComparisonOperator.LT: lambda slot, value: lambda row: row[slot] < value,
+    ComparisonOperator.GTE: lambda slot, value: lambda row: row[slot] >= value,
+    ComparisonOperator.LTE: lambda slot, value: lambda row: row[slot] <= value,
+    ComparisonOperator.EQ: lambda slot, value: lambda row: row[slot] == value,
+    ComparisonOperator.NEQ: lambda slot, value: lambda row: row[slot] != value,
+}
+
+class RecordSchema:
+    # Fixed layout for records: every attribute has a declared type and a
+    # slot. decode() validates and coerces a record once (so "30" becomes 30
+    # for an int attribute) into a tuple; rules compiled against the schema
+    # read their slots by index and compare without any per-comparison
+    # lookup. Rule values are coerced to the attribute's type at compile time
+    # when that is lossless. Null counts as missing; unknown keys are ignored.
+    def __init__(self, types: Dict[str, type] = ATTRIBUTE_TYPES):
+        unsupported = [name for name, kind in types.items() if kind not in COERCERS]
+        if unsupported:
+            raise ValueError(f"Unsupported attribute types: {', '.join(unsupported)}")
+        self.types = dict(types)
+        self.fields: List[str] = list(types)
+        self.slots: Dict[str, int] = {name: slot for slot, name in enumerate(self.fields)}
+        self._decoders = [(slot, name, COERCERS[types[name]]) for slot, name in enumerate(self.fields)]
+        self._missing: Row = tuple(Missing(name) for name in self.fields)
+        self._compiled: "weakref.WeakKeyDictionary[Node, SlotRule]" = weakref.WeakKeyDictionary()
+        self._coerced: "weakref.WeakKeyDictionary[Node, Node]" = weakref.WeakKeyDictionary()
+
+    def decode(self, record: Dict[str, Any]) -> Row:
+        # Raises ValueError naming the first attribute that does not coerce
+        row = list(self._missing)
+        for slot, name, coerce in self._decoders:
+            value = record.get(name)
+            if value is not None:
+                try:
+                    row[slot] = coerce(value)
+                except (ValueError, OverflowError) as e:
+                    raise ValueError(f"Invalid value for {name}: {str(e)}") from None
+        return tuple(row)
+
+    def decode_many(self, records: Iterable[Dict[str, Any]]) -> Tuple[List[Optional[Row]], Dict[int, str]]:
+        # Rows in record order, None for records that failed validation, and
+        # the error of each failed record by position
+        rows: List[Optional[Row]] = []
+        errors: Dict[int, str] = {}
+        for position, record in enumerate(records):
+            try:
+                rows.append(self.decode(record))
+            except ValueError as e:
+                rows.append(None)
+                errors[position] = str(e)
+        return rows, errors
+
+    def as_dict(self, row: Row) -> Dict[str, Any]:
+        # The coerced record, without missing attributes
+        return {name: value for name, value in zip(self.fields, row) if not isinstance(value, Missing)}
+
+    def coerce(self, node: Node) -> Node:
+        # The rule with comparison values coerced to their attribute's type
+        # where nothing is lost: 30.5 stays a float for an int attribute
+        coerced = self._coerced.get(node)
+        if coerced is None:
+            coerced = self._coerced[node] = self._coerce(node)
+        return coerced
+
+    def _coerce(self, node: Node) -> Node:
+        if node.type == NodeType.OPERATOR:
+            return Node(node.type, value=node.value, field=node.field, operator=node.operator,
+                        left=self._coerce(node.left), right=self._coerce(node.right))
+        if node.type == NodeType.COMPARISON and node.operator in _SLOT_COMPARISONS:
+            if node.field not in self.slots:
+                raise ValueError(f"Attribute {node.field} is not in the schema")
+            value = node.value
+            try:
+                coerced = COERCERS[self.types[node.field]](value)
+                if coerced == value or isinstance(value, str):
+                    value = coerced
+            except (ValueError, OverflowError):
+                pass
+            return Node(node.type, value=value, field=node.field, operator=node.operator)
+        return node
+
+    def compile(self, node: Node) -> SlotRule:
+        # Cached per AST, like compile_rule
+        compiled = self._compiled.get(node)
+        if compiled is None:
+            compiled = self._compiled[node] = self._compile(self.coerce(node))
+        return compiled
+
+    def _compile(self, node: Node) -> SlotRule:
+        if node.type == NodeType.OPERATOR:
+            left, right = self._compile(node.left), self._compile(node.right)
+            if node.operator == Operator.AND:
+                return lambda row: left(row) and right(row)
+            return lambda row: left(row) or right(row)
+
+        if node.type == NodeType.COMPARISON and node.operator in _SLOT_COMPARISONS:
+            return _SLOT_COMPARISONS[node.operator](self.slots[node.field], node.value)
+
+        if node.type == NodeType.LITERAL:
+            value = bool(node.value)
+            return lambda row: value
+
+        raise ValueError(f"Invalid node type: {node.type}")
+
+    def evaluate_rows(self, node: Node, rows: Sequence[Row]) -> List[bool]:
+        # Raises like evaluate_rule for the first row the rule cannot be evaluated on
+        compiled = self.compile(node)
+        return [compiled(row) for row in rows]
+
+class TypedRuleSet:
+    # A rule set compiled against a schema, for evaluating decoded rows. The
+    # index is built over the coerced rules, so its candidates for a row are
+    # the same rules the slot rules can match ("age = '30'" for age 30).
+    # Rules that do not compile against the schema are reported as an error
+    # on every row.
+    def __init__(self, schema: RecordSchema, rules: Dict[str, Node]):
+        self.schema = schema
+        self.index = RuleIndex()
+        self.compiled: Dict[str, SlotRule] = {}
+        self.failed: Dict[str, str] = {}
+        for rule_id, node in rules.items():
+            try:
+                coerced = schema.coerce(node)
+                self.compiled[rule_id] = schema.compile(node)
+            except ValueError as e:
+                self.failed[rule_id] = str(e)
+                continue
+            self.index.add_rule(rule_id, coerced)
+
+    def evaluate(self, rows: Sequence[Row]) -> List[RowResult]:
+        results = []
+        for row in rows:
+            matched, errors = [], dict(self.failed)
+            for rule_id in sorted(self.index.candidates(self.schema.as_dict(row))):
+                try:
+                    if self.compiled[rule_id](row):
+                        matched.append(rule_id)
+                except (ValueError, TypeError) as e:
+                    errors[rule_id] = str(e)
+            results.append((matched, errors))
+        return results
+
+record_schema = RecordSchema()
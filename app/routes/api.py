@@ -1,19 +1,197 @@
-from fastapi import APIRouter, HTTPException, status
-from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from bson.errors import InvalidId
 from datetime import datetime
 from typing import List
 from pydantic import ValidationError, BaseModel
+from pymongo.errors import OperationFailure
 
 from ..models import RuleCreate, RuleUpdate, RuleEvaluation, Rule
-from ..database import rules_collection
-from ..rule_engine import create_rule, evaluate_rule, combine_rules
+from ..database import async_evaluations_collection, async_rules_collection, get_async_collection
+from ..rule_engine import Node, NodeType, Operator, create_rule, evaluate_rule, combine_asts, compile_rule, rule_fields, to_rule_string
+from ..ast_codec import serialize_ast, ast_from_document
+from ..record_schema import TypedRuleSet, record_schema
+from ..batch_evaluator import ColumnarBatch, evaluate_batch
+from ..incremental_evaluator import EvaluationSession, SessionResult
+from ..mongo_query import to_mongo_query
+from ..parallel_evaluator import ParallelRuleEvaluator
+from ..rule_profiler import RuleProfiles
+from ..rule_optimizer import RuleOptimizer, SelectivityStats
+from ..services.rule_analytics import RuleAnalyticsService
+from ..services.rule_cache import RuleCache
+from ..services.result_cache import ResultCache
+from ..services.rule_registry import RuleRegistry
+from ..services.rule_sync import RuleSync
+from ..services.rule_repository import RuleRepository, rule_filter
+from ..services.bulk_import import BulkRuleImporter, BulkImportResult
+from ..services.evaluation_log import EvaluationLog, JsonlSink, MongoSink, ParquetSink
+from ..services.record_query import RecordQuery, validate_collection_name
+from .streaming import NDJSON_MEDIA_TYPE, BodyStreamingResponse, is_ndjson, iter_ndjson_batches
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from functools import partial
+import asyncio
+import json
 import logging
+import multiprocessing
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+rule_repository = RuleRepository(async_rules_collection)
+
+# Parsed ASTs keyed by (rule_id, version), shared by the evaluation endpoints
+rule_cache = RuleCache(
+    max_size=int(os.getenv("RULE_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("RULE_CACHE_TTL_SECONDS", "300"))
+)
+
+# Memoized single-rule results keyed by the attributes each rule reads;
+# disabled unless RESULT_CACHE_SIZE is set
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "0"))
+result_cache = ResultCache(max_size=RESULT_CACHE_SIZE) if RESULT_CACHE_SIZE > 0 else None
+
+# Audit trail of evaluations, buffered in memory and written in batches by a
+# background task (see main.py); EVALUATION_LOG picks the sink
+EVALUATION_LOG = os.getenv("EVALUATION_LOG", "off")
+
+def build_evaluation_log() -> Optional[EvaluationLog]:
+    if EVALUATION_LOG == "off":
+        return None
+    if EVALUATION_LOG == "mongo":
+        sink = MongoSink(async_evaluations_collection)
+    elif EVALUATION_LOG == "jsonl":
+        sink = JsonlSink(os.getenv("EVALUATION_LOG_PATH", "evaluations.jsonl"))
+    elif EVALUATION_LOG == "parquet":
+        sink = ParquetSink(os.getenv("EVALUATION_LOG_PATH", "evaluations.parquet"))
+    else:
+        raise ValueError(f"Unknown evaluation log sink: {EVALUATION_LOG}")
+    return EvaluationLog(
+        sink,
+        capacity=int(os.getenv("EVALUATION_LOG_BUFFER_SIZE", "10000")),
+        flush_size=int(os.getenv("EVALUATION_LOG_FLUSH_SIZE", "500")),
+        flush_interval=float(os.getenv("EVALUATION_LOG_FLUSH_INTERVAL", "1.0")),
+        overflow=os.getenv("EVALUATION_LOG_OVERFLOW", "drop")
+    )
+
+evaluation_log = build_evaluation_log()
+
+def invalidate_rule(rule_id: str):
+    rule_cache.invalidate(rule_id)
+    if result_cache is not None:
+        result_cache.invalidate(rule_id)
+
+# Process pool for parsing large rule imports and warm-ups, created on first
+# use and shut down with the app (see main.py)
+BULK_PARSE_WORKERS = int(os.getenv("BULK_PARSE_WORKERS", "0")) or os.cpu_count()
+BULK_INSERT_BATCH_SIZE = int(os.getenv("BULK_INSERT_BATCH_SIZE", "1000"))
+parse_pool: Optional[ProcessPoolExecutor] = None
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global parse_pool
+    if parse_pool is None:
+        # spawn: forking a process that already runs database threads is unsafe
+        parse_pool = ProcessPoolExecutor(max_workers=BULK_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return parse_pool
+
+# Observed comparison selectivity, fed from rule profiles
+selectivity_stats = SelectivityStats()
+RULE_OPTIMIZER_ENABLED = os.getenv("RULE_OPTIMIZER", "false").lower() == "true"
+
+# All active rules, compiled and indexed. Warmed up at startup (see main.py),
+# or on first use otherwise, and kept in sync by the write endpoints. With
+# RULE_OPTIMIZER=true rules are evaluated in their optimized form.
+rule_registry = RuleRegistry(
+    executor_factory=get_parse_pool,
+    batch_size=int(os.getenv("RULE_WARMUP_BATCH_SIZE", "500")),
+    optimizer=RuleOptimizer(selectivity_stats) if RULE_OPTIMIZER_ENABLED else None
+)
+
+async def ensure_rule_registry() -> RuleRegistry:
+    return await rule_registry.ensure_loaded(rule_repository)
+
+# Applies rule changes made by other workers to this worker's registry, from
+# the MongoDB change stream or by polling ("auto", "change_stream", "poll" or "off")
+RULE_SYNC_MODE = os.getenv("RULE_SYNC_MODE", "auto")
+rule_sync = RuleSync(
+    rule_registry,
+    rule_repository,
+    on_change=invalidate_rule,
+    mode=RULE_SYNC_MODE,
+    poll_interval=float(os.getenv("RULE_SYNC_POLL_SECONDS", "5"))
+)
+
+# Per-rule evaluation counters and latency histograms (per worker process)
+rule_analytics = RuleAnalyticsService(sample_every=int(os.getenv("ANALYTICS_SAMPLE_EVERY", "1")))
+
+# Rules evaluated through the per-node profiling evaluator (opt-in per rule)
+rule_profiles = RuleProfiles()
+
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1 << 20)))
+
+# Worker processes for large batch evaluations of all active rules. Rule
+# changes are shipped to the workers with the next chunks; the pool is only
+# restarted once more than PARALLEL_EVAL_MAX_PENDING_CHANGES have piled up.
+PARALLEL_EVAL_WORKERS = int(os.getenv("PARALLEL_EVAL_WORKERS", "0")) or os.cpu_count()
+PARALLEL_EVAL_CHUNK_SIZE = int(os.getenv("PARALLEL_EVAL_CHUNK_SIZE", "1000"))
+PARALLEL_EVAL_MAX_PENDING_CHANGES = int(os.getenv("PARALLEL_EVAL_MAX_PENDING_CHANGES", "100"))
+parallel_evaluator: Optional[ParallelRuleEvaluator] = None
+parallel_evaluator_generation = -1
+
+def get_parallel_evaluator(registry: RuleRegistry) -> ParallelRuleEvaluator:
+    global parallel_evaluator, parallel_evaluator_generation
+    if parallel_evaluator is None:
+        parallel_evaluator = ParallelRuleEvaluator(
+            registry.optimized_rules(),
+            workers=PARALLEL_EVAL_WORKERS,
+            chunk_size=PARALLEL_EVAL_CHUNK_SIZE,
+            max_pending_changes=PARALLEL_EVAL_MAX_PENDING_CHANGES
+        )
+        parallel_evaluator_generation = registry.generation
+    elif parallel_evaluator_generation != registry.generation:
+        parallel_evaluator.update(registry.optimized_rules())
+        parallel_evaluator_generation = registry.generation
+    return parallel_evaluator
+
+# All active rules compiled against the record schema for typed batches;
+# rebuilt on the first typed batch after the rules change
+typed_rules: Optional[TypedRuleSet] = None
+typed_rules_generation = -1
+
+def get_typed_rules(registry: RuleRegistry) -> TypedRuleSet:
+    global typed_rules, typed_rules_generation
+    if typed_rules is None or typed_rules_generation != registry.generation:
+        typed_rules = TypedRuleSet(record_schema, registry.optimized_rules())
+        typed_rules_generation = registry.generation
+    return typed_rules
+
+# Last record and per-node results for each record key, so deltas only
+# recompute what they touch. State is per worker: route a key's updates to
+# the same worker.
+evaluation_session = EvaluationSession(max_keys=int(os.getenv("SESSION_MAX_KEYS", "100000")))
+evaluation_session_generation = -1
+
+def get_evaluation_session(registry: RuleRegistry) -> EvaluationSession:
+    global evaluation_session_generation
+    if evaluation_session_generation != registry.generation:
+        evaluation_session.sync_rules(registry.optimized_rules())
+        evaluation_session_generation = registry.generation
+    return evaluation_session
+
+async def insert_registered_rule(rule_doc: dict, ast: Node) -> dict:
+    # A rule the registry cannot compile is not kept either: stored, it would
+    # fail every evaluation of it and every warm-up that loads it
+    created_rule = await rule_repository.insert(rule_doc)
+    try:
+        rule_registry.register(created_rule["_id"], created_rule["version"], ast)
+    except Exception:
+        await rule_repository.delete(created_rule["_id"])
+        raise
+    return created_rule
+
 @router.post("/rules/", response_model=Rule)
 async def create_new_rule(rule: RuleCreate):
     try:
@@ -25,6 +203,7 @@ async def create_new_rule(rule: RuleCreate):
             "name": rule.name,
             "description": rule.description,
             "rule_string": rule.rule_string,
+            "ast": serialize_ast(ast),
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
             "version": 1,
@@ -32,11 +211,8 @@ async def create_new_rule(rule: RuleCreate):
         }
         
         # Insert into database
-        result = rules_collection.insert_one(rule_doc)
-        
-        # Get created rule
-        created_rule = rules_collection.find_one({"_id": result.inserted_id})
-        created_rule["_id"] = str(created_rule["_id"])
+        created_rule = await insert_registered_rule(rule_doc, ast)
+        rule_cache.put(created_rule["_id"], created_rule["version"], ast)
         
         return created_rule
         
@@ -47,25 +223,151 @@ async def create_new_rule(rule: RuleCreate):
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
 
-@router.get("/rules/", response_model=List[Rule])
-async def get_rules():
+async def read_bulk_items(request: Request) -> AsyncIterator[Any]:
+    if is_ndjson(request.headers.get("content-type", "")):
+        # Stream NDJSON so large imports are processed while they arrive
+        async for batch in iter_ndjson_batches(request.stream(), STREAM_MAX_LINE_BYTES):
+            for _, item in batch:
+                yield item
+        return
+    
+    payload = json.loads(await request.body())
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array of rules")
+    for item in payload:
+        yield item
+
+@router.post("/rules/bulk", response_model=BulkImportResult)
+async def bulk_create_rules(request: Request):
+    def on_inserted(rule_doc: dict, ast: Node):
+        rule_registry.register(rule_doc["_id"], rule_doc["version"], ast)
+    
+    try:
+        importer = BulkRuleImporter(
+            rule_repository,
+            executor=get_parse_pool(),
+            insert_batch_size=BULK_INSERT_BATCH_SIZE,
+            on_inserted=on_inserted
+        )
+        result = await importer.import_rules(read_bulk_items(request))
+        logger.info(f"Bulk import: {result.inserted} inserted, {result.failed} failed, "
+                    f"{result.rules_per_second:.0f} rules/s")
+        return result
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Unexpected error in bulk import: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
+
+# Rule fields clients can list; stored ASTs and other internals are never returned
+RULE_LIST_FIELDS = ("_id", "name", "description", "rule_string", "created_at", "updated_at", "version", "active")
+RULE_LIST_MAX_LIMIT = int(os.getenv("RULE_LIST_MAX_LIMIT", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("RULE_EXPORT_BATCH_SIZE", "500"))
+
+def rule_projection(fields: Optional[str]) -> dict:
+    if not fields:
+        return {field: 1 for field in RULE_LIST_FIELDS}
+    requested = ["_id" if field == "id" else field for field in (field.strip() for field in fields.split(",")) if field]
+    unknown = [field for field in requested if field not in RULE_LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return {"_id": 1, **{field: 1 for field in requested}}
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def dump_rule(rule: dict, projection: dict) -> str:
+    # The sort keys a page needed for its cursor are dropped unless requested
+    return json.dumps({key: value for key, value in rule.items() if key in projection}, default=json_default)
+
+@router.get("/rules/")
+async def get_rules(limit: int = Query(100, ge=1), cursor: Optional[str] = None,
+                    sort: str = Query("id", pattern="^(id|updated_at)$"), active: Optional[bool] = None,
+                    name: Optional[str] = None, fields: Optional[str] = None):
+    # One page of rules in _id (or updated_at) order. Pass the X-Next-Cursor
+    # response header back as ?cursor= for the next page; it is absent on the
+    # last one. name filters by prefix, fields is a comma-separated projection.
     try:
-        rules = []
-        for rule in rules_collection.find():
-            rule["_id"] = str(rule["_id"])
-            rules.append(rule)
-        return rules
+        projection = rule_projection(fields)
+        rules, next_cursor = await rule_repository.list_page(
+            rule_filter(active, name), projection, limit=min(limit, RULE_LIST_MAX_LIMIT), sort=sort, cursor=cursor
+        )
+        content = "[" + ",".join(dump_rule(rule, projection) for rule in rules) + "]"
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else None
+        return Response(content=content, media_type="application/json", headers=headers)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
+        logger.error(f"Unexpected error listing rules: {str(e)}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
 
+@router.get("/rules/export")
+async def export_rules(format: str = Query("json", pattern="^(json|ndjson)$"), active: Optional[bool] = None,
+                       name: Optional[str] = None, fields: Optional[str] = None):
+    # Full dump streamed batch by batch from the database cursor, as a JSON
+    # array or NDJSON; memory use does not grow with the catalog
+    try:
+        projection = rule_projection(fields)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    query = rule_filter(active, name)
+    ndjson = format == "ndjson"
+    
+    async def lines() -> AsyncIterator[bytes]:
+        first = True
+        if not ndjson:
+            yield b"["
+        async for batch in rule_repository.iter_rules(query, projection, batch_size=EXPORT_BATCH_SIZE):
+            if ndjson:
+                yield "".join(dump_rule(rule, projection) + "\n" for rule in batch).encode()
+            else:
+                yield (("" if first else ",") + ",".join(dump_rule(rule, projection) for rule in batch)).encode()
+            first = False
+        if not ndjson:
+            yield b"]"
+    
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json")
+
+@router.get("/ready")
+async def readiness():
+    # 503 until the rule registry warm-up has completed
+    status_code = status.HTTP_200_OK if rule_registry.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=status_code, content={
+        "ready": rule_registry.ready,
+        "rules": len(rule_registry),
+        **rule_registry.status.dict(),
+        "sync": rule_sync.stats()
+    })
+
+@router.get("/rules/cache/stats", response_model=dict)
+async def get_rule_cache_stats():
+    return rule_cache.stats()
+
+@router.get("/rules/{rule_id}/analytics", response_model=dict)
+async def get_rule_analytics(rule_id: str):
+    return rule_analytics.get_rule_analytics(rule_id)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus scrape endpoint
+    content = rule_analytics.prometheus_metrics()
+    if result_cache is not None:
+        content += result_cache.prometheus_metrics()
+    if evaluation_log is not None:
+        content += evaluation_log.prometheus_metrics()
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
+
 @router.get("/rules/{rule_id}", response_model=Rule)
 async def get_rule(rule_id: str):
     try:
-        rule = rules_collection.find_one({"_id": ObjectId(rule_id)})
+        rule = await rule_repository.get(rule_id)
         if rule is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
-        rule["_id"] = str(rule["_id"])
         return rule
+    except HTTPException:
+        raise
     except InvalidId:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid rule ID format")
     except Exception as e:
@@ -74,34 +376,36 @@ async def get_rule(rule_id: str):
 @router.put("/rules/{rule_id}", response_model=Rule)
 async def update_rule(rule_id: str, rule_update: RuleUpdate):
     try:
-        # Check if rule exists
-        existing_rule = rules_collection.find_one({"_id": ObjectId(rule_id)})
-        if existing_rule is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
-            
         # Prepare update data
         update_data = rule_update.dict(exclude_unset=True)
+        ast = None
         if "rule_string" in update_data:
             # Validate new rule string
-            create_rule(update_data["rule_string"])
+            ast = create_rule(update_data["rule_string"])
+            update_data["ast"] = serialize_ast(ast)
             
         update_data["updated_at"] = datetime.utcnow()
-        update_data["version"] = existing_rule["version"] + 1
         
-        # Update rule
-        result = rules_collection.update_one(
-            {"_id": ObjectId(rule_id)},
-            {"$set": update_data}
-        )
+        # Update rule and bump its version
+        updated_rule = await rule_repository.update(rule_id, update_data)
+        if updated_rule is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
+        invalidate_rule(rule_id)
         
-        if result.modified_count == 0:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Rule update failed")
-            
-        # Get updated rule
-        updated_rule = rules_collection.find_one({"_id": ObjectId(rule_id)})
-        updated_rule["_id"] = str(updated_rule["_id"])
+        if ast is not None:
+            rule_cache.put(rule_id, updated_rule["version"], ast)
+        
+        if not updated_rule.get("active", True):
+            rule_registry.unregister(rule_id)
+        else:
+            # Metadata-only updates bump the version too, so always re-register
+            rule_registry.register(rule_id, updated_rule["version"], ast if ast is not None else ast_from_document(updated_rule))
         return updated_rule
         
+    except HTTPException:
+        raise
+    except InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid rule ID format")
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
@@ -110,24 +414,244 @@ async def update_rule(rule_id: str, rule_update: RuleUpdate):
 class RuleEvaluationRequest(BaseModel):
     data: dict
 
+def optimized_ast(rule_id: str, ast: Node) -> Node:
+    registered = rule_registry.get(rule_id)
+    return registered.optimized if registered is not None and registered.ast is ast else ast
+
+async def load_rule_ast(rule_id: str) -> Node:
+    _, ast = await load_rule(rule_id)
+    return ast
+
+async def load_rule(rule_id: str) -> Tuple[int, Node]:
+    # (version, ast) from the registry, the cache or the database
+    registered = rule_registry.get(rule_id)
+    if registered is not None:
+        return registered.version, registered.ast
+    cached = rule_cache.get_latest(rule_id)
+    if cached is not None:
+        return cached
+    
+    try:
+        rule = await rule_repository.get(rule_id, {"rule_string": 1, "ast": 1, "version": 1})
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid rule ID format")
+    if rule is None:
+        logger.debug(f"Rule not found: {rule_id}")
+        raise HTTPException(status_code=404, detail="Rule not found")
+    
+    logger.debug(f"Retrieved rule: {rule}")
+    
+    ast = ast_from_document(rule)
+    rule_cache.put(rule_id, rule["version"], ast)
+    return rule["version"], ast
+
+@router.post("/rules/evaluate")
+async def evaluate_active_rules_endpoint(evaluation: RuleEvaluationRequest):
+    try:
+        registry = await ensure_rule_registry()
+        # Only rules whose guard predicates can hold for this record get evaluated
+        start = time.perf_counter_ns()
+        candidates = sorted(registry.index.candidates(evaluation.data))
+        result = registry.network.evaluate(evaluation.data, rule_ids=candidates)
+        if evaluation_log is not None:
+            # One entry per evaluated rule, all carrying the latency of the whole call
+            latency = time.perf_counter_ns() - start
+            matched = set(result.matched)
+            for rule_id in candidates:
+                registered = registry.get(rule_id)
+                error = result.errors.get(rule_id)
+                await evaluation_log.log(rule_id, registered.version if registered else None, evaluation.data,
+                                         None if error is not None else rule_id in matched, latency, error)
+        return {
+            "matched": result.matched,
+            "errors": result.errors,
+            "total_rules": len(registry),
+            "evaluated_rules": result.evaluated_rules,
+            "evaluated_predicates": result.evaluated_predicates
+        }
+    except Exception as e:
+        logger.error(f"Unexpected error evaluating active rules: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error evaluating rules: {str(e)}")
+
+def stream_error(line: int, error: Exception) -> dict:
+    return {"line": line, "error": str(error)}
+
+@router.post("/rules/evaluate/stream")
+async def evaluate_active_rules_stream(request: Request):
+    # NDJSON in, NDJSON out: one {"line", "matched", "errors"} object per record
+    registry = await ensure_rule_registry()
+    
+    async def results() -> AsyncIterator[bytes]:
+        async for batch in iter_ndjson_batches(request.stream(), STREAM_MAX_LINE_BYTES):
+            output = []
+            for line, record in batch:
+                if isinstance(record, Exception):
+                    output.append(stream_error(line, record))
+                elif not isinstance(record, dict):
+                    output.append(stream_error(line, ValueError("Record must be a JSON object")))
+                else:
+                    result = registry.network.evaluate(record, rule_ids=sorted(registry.index.candidates(record)))
+                    output.append({"line": line, "matched": result.matched, "errors": result.errors})
+            yield "".join(json.dumps(item) + "\n" for item in output).encode()
+    
+    return BodyStreamingResponse(results(), media_type=NDJSON_MEDIA_TYPE)
+
+@router.post("/rules/evaluate/batch")
+async def evaluate_active_rules_batch(request: Request, typed: bool = False):
+    # Accepts {"records": [...]} or an NDJSON body of records and evaluates all
+    # active rules on each, sharded across worker processes for large batches.
+    # With typed=true, records are first validated and coerced to the declared
+    # attribute types in bulk and evaluated on a thread by rules compiled
+    # against the schema; records that fail get an "error" and no results.
+    try:
+        body = await request.body()
+        if is_ndjson(request.headers.get("content-type", "")):
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            payload = json.loads(body)
+            records = payload.get("records") if isinstance(payload, dict) else None
+            if not isinstance(records, list):
+                raise ValueError("Expected a 'records' array of objects")
+        if not all(isinstance(record, dict) for record in records):
+            raise ValueError("Every record must be a JSON object")
+        
+        registry = await ensure_rule_registry()
+        if not typed:
+            results = await get_parallel_evaluator(registry).evaluate_async(records)
+            return {
+                "results": [{"matched": matched, "errors": errors} for matched, errors in results],
+                "count": len(results),
+                "total_rules": len(registry)
+            }
+        
+        rows, invalid = record_schema.decode_many(records)
+        valid = [row for row in rows if row is not None]
+        evaluated = iter(await asyncio.get_running_loop().run_in_executor(None, get_typed_rules(registry).evaluate, valid))
+        response = []
+        for position in range(len(rows)):
+            if position in invalid:
+                response.append({"matched": [], "errors": {}, "error": invalid[position]})
+            else:
+                matched, errors = next(evaluated)
+                response.append({"matched": matched, "errors": errors})
+        return {
+            "results": response,
+            "count": len(response),
+            "invalid": len(invalid),
+            "total_rules": len(registry)
+        }
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        logger.debug(f"Error in parallel batch evaluation: {str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Unexpected error in parallel batch evaluation: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error evaluating rules: {str(e)}")
+
+class SessionDeltaRequest(BaseModel):
+    changes: dict = {}
+    removed: List[str] = []
+
+def session_response(record_key: str, result: SessionResult) -> dict:
+    return {
+        "key": record_key,
+        "matched": result.matched,
+        "errors": result.errors,
+        "changed": result.changed,
+        "evaluated_nodes": result.evaluated_nodes,
+        "total_rules": len(rule_registry)
+    }
+
+@router.put("/sessions/{record_key}")
+async def evaluate_session_record(record_key: str, evaluation: RuleEvaluationRequest):
+    # Full record; for a known key only the attributes that differ are re-evaluated
+    try:
+        session = get_evaluation_session(await ensure_rule_registry())
+        return session_response(record_key, session.evaluate(record_key, evaluation.data))
+    except Exception as e:
+        logger.error(f"Unexpected error evaluating session record {record_key}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error evaluating rules: {str(e)}")
+
+@router.patch("/sessions/{record_key}")
+async def apply_session_delta(record_key: str, delta: SessionDeltaRequest):
+    try:
+        session = get_evaluation_session(await ensure_rule_registry())
+        return session_response(record_key, session.apply_delta(record_key, delta.changes, delta.removed))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown record key; send the full record first")
+    except Exception as e:
+        logger.error(f"Unexpected error applying delta to {record_key}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error evaluating rules: {str(e)}")
+
+@router.delete("/sessions/{record_key}")
+async def forget_session_record(record_key: str):
+    if not evaluation_session.forget(record_key):
+        raise HTTPException(status_code=404, detail="Unknown record key")
+    return {"message": "Record key forgotten"}
+
+@router.post("/rules/evaluate/{rule_id}/stream")
+async def evaluate_rule_stream(rule_id: str, request: Request):
+    # NDJSON in, NDJSON out: one {"line", "result"} or {"line", "error"} per record.
+    # The rule is compiled once; a bad record never aborts the stream.
+    ast = await load_rule_ast(rule_id)
+    profiler = rule_profiles.profiler(rule_id, ast) if rule_profiles else None
+    compiled = compile_rule(optimized_ast(rule_id, ast)) if profiler is None else partial(profiler.evaluate, ast)
+    
+    async def results() -> AsyncIterator[bytes]:
+        async for batch in iter_ndjson_batches(request.stream(), STREAM_MAX_LINE_BYTES):
+            output = []
+            evaluated = matched = errors = 0
+            start = time.perf_counter_ns()
+            for line, record in batch:
+                if isinstance(record, Exception):
+                    output.append(stream_error(line, record))
+                    continue
+                evaluated += 1
+                try:
+                    if not isinstance(record, dict):
+                        raise ValueError("Record must be a JSON object")
+                    result = compiled(record)
+                    matched += result
+                    output.append({"line": line, "result": result})
+                except (ValueError, TypeError) as e:
+                    errors += 1
+                    output.append(stream_error(line, e))
+            # Timed per chunk: per-record timing would cost as much as evaluating
+            rule_analytics.track_batch(rule_id, time.perf_counter_ns() - start, evaluated, matched, errors)
+            yield "".join(json.dumps(item) + "\n" for item in output).encode()
+    
+    return BodyStreamingResponse(results(), media_type=NDJSON_MEDIA_TYPE)
+
 @router.post("/rules/evaluate/{rule_id}")
 async def evaluate_rule_endpoint(rule_id: str, evaluation: RuleEvaluationRequest):
     try:
         logger.debug(f"Evaluating rule {rule_id} with data: {evaluation.data}")
         
-        rule = rules_collection.find_one({"_id": ObjectId(rule_id)})
-        if rule is None:
-            logger.debug(f"Rule not found: {rule_id}")
-            raise HTTPException(status_code=404, detail="Rule not found")
-        
-        logger.debug(f"Retrieved rule: {rule}")
-        
-        ast = create_rule(rule["rule_string"])
-        result = evaluate_rule(ast, evaluation.data)
+        version, ast = await load_rule(rule_id)
+        profiler = rule_profiles.profiler(rule_id, ast) if rule_profiles else None
+        start = time.perf_counter_ns()
+        try:
+            if profiler is None and result_cache is not None:
+                # Profiled rules bypass the cache so every evaluation is counted
+                result = rule_analytics.evaluate(rule_id, result_cache.evaluate, rule_id, version, ast, evaluation.data,
+                                                 partial(evaluate_rule, optimized_ast(rule_id, ast)))
+            elif profiler is None:
+                result = rule_analytics.evaluate(rule_id, evaluate_rule, optimized_ast(rule_id, ast), evaluation.data)
+            else:
+                result = rule_analytics.evaluate(rule_id, profiler.evaluate, ast, evaluation.data)
+        except (ValueError, TypeError) as e:
+            if evaluation_log is not None:
+                await evaluation_log.log(rule_id, version, evaluation.data, None, time.perf_counter_ns() - start, str(e))
+            raise
+        if evaluation_log is not None:
+            await evaluation_log.log(rule_id, version, evaluation.data, result, time.perf_counter_ns() - start)
         
         logger.debug(f"Rule evaluation result: {result}")
         return {"result": result}
         
+    except HTTPException:
+        raise
     except ValueError as ve:
         logger.debug(f"ValueError in rule evaluation: {str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -135,50 +659,215 @@ async def evaluate_rule_endpoint(rule_id: str, evaluation: RuleEvaluationRequest
         logger.error(f"Unexpected error in rule evaluation: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error evaluating rule: {str(e)}")
 
+@router.post("/rules/evaluate/{rule_id}/batch")
+async def evaluate_rule_batch_endpoint(rule_id: str, request: Request):
+    # Accepts either {"columns": {"age": [...], ...}} or an NDJSON body of records
+    # (Content-Type: application/x-ndjson) and evaluates the rule column-wise.
+    try:
+        ast = await load_rule_ast(rule_id)
+        fields = rule_fields(ast)
+        body = await request.body()
+        
+        if is_ndjson(request.headers.get("content-type", "")):
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+            batch = ColumnarBatch.from_records(records, fields=fields)
+        else:
+            payload = json.loads(body)
+            columns = payload.get("columns") if isinstance(payload, dict) else None
+            if not isinstance(columns, dict):
+                raise ValueError("Expected a 'columns' object mapping attributes to arrays")
+            batch = ColumnarBatch(columns, fields=fields)
+        
+        start = time.perf_counter_ns()
+        results = evaluate_batch(optimized_ast(rule_id, ast), batch)
+        rule_analytics.track_batch(rule_id, time.perf_counter_ns() - start, int(results.size), int(results.sum()))
+        return {"results": results.tolist(), "count": int(results.size), "matched": int(results.sum())}
+        
+    except HTTPException:
+        raise
+    except (ValueError, TypeError) as e:
+        logger.debug(f"Error in batch rule evaluation: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error in batch rule evaluation: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error evaluating rule: {str(e)}")
+
+def profile_response(rule_id: str) -> dict:
+    profiler = rule_profiles.get(rule_id)
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled for this rule")
+    return {
+        "rule_id": rule_id,
+        "rule_string": to_rule_string(profiler.root),
+        "evaluations": profiler.profiles[0].evaluations,
+        "tree": profiler.annotated_tree()
+    }
+
+@router.post("/rules/{rule_id}/profile")
+async def enable_rule_profile(rule_id: str):
+    # Starts (or restarts) per-node profiling of the rule's evaluations
+    rule_profiles.enable(rule_id, await load_rule_ast(rule_id))
+    return profile_response(rule_id)
+
+@router.get("/rules/{rule_id}/profile")
+async def get_rule_profile(rule_id: str):
+    return profile_response(rule_id)
+
+@router.delete("/rules/{rule_id}/profile")
+async def disable_rule_profile(rule_id: str):
+    # Returns the final profile
+    response = profile_response(rule_id)
+    rule_profiles.disable(rule_id)
+    return response
+
+@router.post("/rules/{rule_id}/optimize")
+async def optimize_rule(rule_id: str):
+    # Folds the rule's profile (if any) into the selectivity statistics and
+    # returns the optimized form; with RULE_OPTIMIZER=true it is also applied
+    ast = await load_rule_ast(rule_id)
+    profiler = rule_profiles.get(rule_id)
+    if profiler is not None:
+        selectivity_stats.record_profile(profiler)
+        profiler.reset()
+    
+    result = RuleOptimizer(selectivity_stats).optimize_with_stats(ast)
+    applied = rule_registry.optimizer is not None and rule_id in rule_registry
+    if applied:
+        rule_registry.reoptimize(rule_id)
+    
+    constant = result.node.type == NodeType.LITERAL
+    return {
+        "rule_id": rule_id,
+        "rule_string": to_rule_string(ast),
+        "optimized_rule_string": None if constant else to_rule_string(result.node),
+        "constant": bool(result.node.value) if constant else None,
+        "estimated_cost_before_ns": result.cost_before,
+        "estimated_cost_after_ns": result.cost_after,
+        "estimated_selectivity": result.selectivity,
+        "removed_duplicates": result.removed_duplicates,
+        "folded": result.folded,
+        "applied": applied
+    }
+
+RECORD_QUERY_BATCH_SIZE = int(os.getenv("RECORD_QUERY_BATCH_SIZE", "500"))
+# Comma-separated collections GET /rules/{rule_id}/records may read; none by
+# default, so the rule catalog and audit log are never exposed by accident
+RECORD_QUERY_COLLECTIONS = frozenset(
+    name.strip() for name in os.getenv("RECORD_QUERY_COLLECTIONS", "").split(",") if name.strip()
+)
+
+async def next_batch(batches: AsyncIterator[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+    try:
+        return await batches.__anext__()
+    except StopAsyncIteration:
+        return None
+
+@router.get("/rules/{rule_id}/records")
+async def query_rule_records(rule_id: str, collection: str, hint: Optional[str] = None, count: bool = False,
+                             limit: int = Query(0, ge=0), format: str = Query("json", pattern="^(json|ndjson)$")):
+    # Documents of the named collection matching the rule, selected by MongoDB
+    # through the translated filter (hint: index name); count=true only counts
+    try:
+        validate_collection_name(collection, RECORD_QUERY_COLLECTIONS)
+        _, ast = await load_rule(rule_id)
+        query = to_mongo_query(ast)
+        records = RecordQuery(get_async_collection(collection), batch_size=RECORD_QUERY_BATCH_SIZE)
+        if count:
+            return {
+                "count": await records.count(ast, hint),
+                "filter": query.filter,
+                "residual": to_rule_string(query.residual) if query.residual is not None else None
+            }
+        
+        # The first batch is fetched up front so query errors (an unknown
+        # hint) still produce an error status
+        batches = records.find(ast, hint, limit)
+        first = await next_batch(batches)
+    except HTTPException:
+        raise
+    except (ValueError, OperationFailure) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error querying records for rule {rule_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
+    ndjson = format == "ndjson"
+    
+    async def lines() -> AsyncIterator[bytes]:
+        if not ndjson:
+            yield b"["
+        batch, separator = first, ""
+        while batch is not None:
+            if ndjson:
+                yield "".join(json.dumps(record, default=json_default) + "\n" for record in batch).encode()
+            else:
+                yield (separator + ",".join(json.dumps(record, default=json_default) for record in batch)).encode()
+                separator = ","
+            batch = await next_batch(batches)
+        if not ndjson:
+            yield b"]"
+    
+    headers = {"X-Residual-Filter": "true" if query.residual is not None else "false"}
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json", headers=headers)
+
 @router.delete("/rules/{rule_id}", response_model=dict)
 async def delete_rule(rule_id: str):
     try:
         # Attempt to delete the rule
-        result = rules_collection.delete_one({"_id": ObjectId(rule_id)})
+        deleted = await rule_repository.delete(rule_id)
+        invalidate_rule(rule_id)
+        rule_registry.unregister(rule_id)
         
         # Check if a rule was actually deleted
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
         
         return {"message": "Rule successfully deleted"}
+    except HTTPException:
+        raise
     except InvalidId:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid rule ID format")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
 
 @router.post("/rules/combine", response_model=Rule)
-async def combine_rules_endpoint(rule_ids: List[str]):
+async def combine_rules_endpoint(rule_ids: List[str], operator: Optional[str] = None):
     try:
-        # Fetch rules from database
-        rules = [rules_collection.find_one({"_id": ObjectId(rule_id)}) for rule_id in rule_ids]
-        rule_strings = [rule["rule_string"] for rule in rules if rule]
+        if operator is not None and operator.upper() not in ("AND", "OR"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="operator must be AND or OR")
+        # Parsed trees of registered rules are grafted as they are; only the
+        # others are loaded from the database
+        registered = {rule_id: rule_registry.get(rule_id) for rule_id in rule_ids}
+        missing = [rule_id for rule_id, entry in registered.items() if entry is None]
+        loaded = {}
+        if missing:
+            for rule in await rule_repository.get_many(missing, {"rule_string": 1, "ast": 1}):
+                loaded[rule["_id"]] = ast_from_document(rule)
+        asts = [registered[rule_id].ast if registered[rule_id] is not None else loaded[rule_id]
+                for rule_id in rule_ids if registered[rule_id] is not None or rule_id in loaded]
         
-        if not rule_strings:
+        if not asts:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No valid rules found")
         
         # Combine rules
-        combined_ast = combine_rules(rule_strings)
+        combined_ast = combine_asts(asts, Operator(operator.upper()) if operator is not None else None)
         
         # Create a new rule with the combined AST
         new_rule = {
             "name": "Combined Rule",
             "description": f"Combination of rules: {', '.join(rule_ids)}",
-            "rule_string": str(combined_ast),
+            "rule_string": to_rule_string(combined_ast),
+            "ast": serialize_ast(combined_ast),
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
             "version": 1,
             "active": True
         }
         
-        result = rules_collection.insert_one(new_rule)
-        new_rule["_id"] = str(result.inserted_id)
-        
-        return new_rule
+        return await insert_registered_rule(new_rule, combined_ast)
+    except HTTPException:
+        raise
+    except InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid rule ID format")
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
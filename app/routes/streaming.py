@@ -0,0 +1,60 @@
+import json
+from typing import Any, AsyncIterator, List, Tuple
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def is_ndjson(content_type: str) -> bool:
+    return content_type.startswith(NDJSON_MEDIA_TYPE)
+
+def decode_json_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {str(e)}")
+
+async def iter_ndjson_batches(stream: AsyncIterator[bytes],
+                              max_line_bytes: int = 1 << 20) -> AsyncIterator[List[Tuple[int, Any]]]:
+    # Yields (line number, record) for the records decoded from each received
+    # chunk. Line numbers count every line, blank ones included, so they match
+    # the client's file. Undecodable or oversized lines come through as
+    # ValueError items so callers can report them in place; memory stays
+    # bounded by the chunk plus one partial line.
+    buffer = b""
+    number = 0
+    skipping = False
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        items = []
+        for line in lines:
+            if skipping:
+                # Tail of a line that was already reported as too long
+                skipping = False
+                continue
+            number += 1
+            if len(line) > max_line_bytes:
+                items.append((number, ValueError(f"Line exceeds {max_line_bytes} bytes")))
+            elif line.strip():
+                items.append((number, decode_json_line(line)))
+        if skipping:
+            buffer = b""
+        elif len(buffer) > max_line_bytes:
+            number += 1
+            items.append((number, ValueError(f"Line exceeds {max_line_bytes} bytes")))
+            buffer = b""
+            skipping = True
+        if items:
+            yield items
+    if buffer.strip() and not skipping:
+        yield [(number + 1, decode_json_line(buffer))]
+
+class BodyStreamingResponse(StreamingResponse):
+    # Streaming response whose body generator reads the request body itself.
+    # The stock StreamingResponse listens for disconnects by calling receive()
+    # concurrently, which would steal request body chunks from the generator.
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -1,6 +1,12 @@
-from typing import Any, Dict, Optional, Union, List
-from dataclasses import dataclass
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Union, List
+import heapq
+import json
+import math
+import operator as py_operator
 import re
+import threading
+import weakref
+from decimal import Decimal
 from enum import Enum
 from app.models import VALID_ATTRIBUTES
 import logging
@@ -24,81 +30,241 @@ class ComparisonOperator(Enum):
     EQ = "="
     NEQ = "!="
 
-@dataclass
 class Node:
+    # Immutable and hash-consed: constructing a node identical to a live one
+    # (same type, field, operator, type-tagged value and child objects)
+    # returns that instance, so a comparison or subtree repeated within and
+    # across rules is stored once. Children are interned first, so identity
+    # is structural equality and == / hash stay the fast object defaults.
+    # Slots keep each node at a fixed few words; __weakref__ serves the
+    # intern table and compile_rule's cache. Construction, attribute access,
+    # == and pickling work as they did for the former dataclass.
+    __slots__ = ("type", "value", "field", "operator", "left", "right", "__weakref__")
+
     type: NodeType
-    value: Optional[Any] = None
-    field: Optional[str] = None
-    operator: Optional[Union[Operator, ComparisonOperator]] = None
-    left: Optional['Node'] = None
-    right: Optional['Node'] = None
+    value: Optional[Any]
+    field: Optional[str]
+    operator: Optional[Union[Operator, ComparisonOperator]]
+    left: Optional['Node']
+    right: Optional['Node']
 
-class RuleParser:
-    def __init__(self):
-        self.tokens = []
-        self.current = 0
+    def __new__(cls, type: NodeType, value: Optional[Any] = None, field: Optional[str] = None,
+                operator: Optional[Union[Operator, ComparisonOperator]] = None,
+                left: Optional['Node'] = None, right: Optional['Node'] = None) -> 'Node':
+        # Values are tagged so 1, 1.0 and True stay distinct nodes. Enum
+        # members are singletons keyed by id(): Enum.__hash__ runs in Python.
+        # Keys of the two common shapes only hold what can differ; the key
+        # lengths keep the shapes apart.
+        if type is NodeType.OPERATOR and value is None and field is None:
+            key = (id(operator), left, right)
+        elif type is NodeType.COMPARISON and left is None and right is None:
+            key = (field, id(operator), value.__class__, value)
+        else:
+            key = (id(type), value.__class__, value, field, id(operator), left, right)
+        try:
+            ref = _interned.get(key)
+        except TypeError:
+            key = (id(type), "json", json.dumps(value, sort_keys=True, default=str), field, id(operator), left, right)
+            ref = _interned.get(key)
+        if ref is not None:
+            node = ref()
+            if node is not None:
+                return node
+        # Inserts are serialized, and the key looked up again, so nodes built
+        # on other threads (e.g. results unpickled by an executor) cannot
+        # leave two live copies of a node that then compare unequal
+        with _intern_lock:
+            ref = _interned.get(key)
+            if ref is not None:
+                node = ref()
+                if node is not None:
+                    return node
+            node = _new_object(cls)
+            _set_type(node, type)
+            _set_value(node, value)
+            _set_field(node, field)
+            _set_operator(node, operator)
+            _set_left(node, left)
+            _set_right(node, right)
+            ref = _interned[key] = _NodeRef(node, _forget)
+            ref.key = key
+        return node
 
-    def tokenize(self, rule_string: str) -> list:
-        pattern = r'(\(|\)|\bAND\b|\bOR\b|>=|<=|!=|>|<|=|\b\w+\b|\'[^\']*\'|\d+)'
-        tokens = re.findall(pattern, rule_string)
-        return [token.strip("'") for token in tokens if token.strip()]
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"Node is immutable; cannot set {name}")
 
-    def parse(self, rule_string: str) -> Node:
-        self.tokens = self.tokenize(rule_string)
-        self.current = 0
-        return self.parse_expression()
+    def __delattr__(self, name: str):
+        raise AttributeError(f"Node is immutable; cannot delete {name}")
 
-    def parse_expression(self) -> Node:
-        left = self.parse_comparison()
-        
-        while self.current < len(self.tokens) and self.tokens[self.current] in ('AND', 'OR'):
-            operator = Operator(self.tokens[self.current])
-            self.current += 1
-            right = self.parse_comparison()
-            left = Node(type=NodeType.OPERATOR, operator=operator, left=left, right=right)
-        
-        return left
+    def __reduce__(self):
+        # Unpickled nodes (e.g. in worker processes) are interned there
+        return (Node, (self.type, self.value, self.field, self.operator, self.left, self.right))
 
-    def parse_comparison(self) -> Node:
-        if self.current >= len(self.tokens):
-            raise ValueError("Unexpected end of expression")
-        
-        if self.tokens[self.current] == '(':
-            self.current += 1
-            node = self.parse_expression()
-            if self.current < len(self.tokens) and self.tokens[self.current] == ')':
-                self.current += 1
+    def __repr__(self) -> str:
+        return (f"Node(type={self.type!r}, value={self.value!r}, field={self.field!r}, "
+                f"operator={self.operator!r}, left={self.left!r}, right={self.right!r})")
+
+class _NodeRef(weakref.ref):
+    # Like weakref.KeyedRef, without its Python-level constructor
+    __slots__ = ("key",)
+
+# Live nodes by their construction key; an entry goes when its node is collected
+_interned: Dict[tuple, _NodeRef] = {}
+# Reentrant: a collection during an insert can run _forget on the same thread
+_intern_lock = threading.RLock()
+
+def _forget(ref: _NodeRef):
+    with _intern_lock:
+        if _interned.get(ref.key) is ref:
+            del _interned[ref.key]
+
+def interned_node_count() -> int:
+    return len(_interned)
+
+_new_object = object.__new__
+_set_type, _set_value, _set_field, _set_operator, _set_left, _set_right = (
+    getattr(Node, name).__set__ for name in ("type", "value", "field", "operator", "left", "right"))
+
+class TokenType(Enum):
+    AND = "AND"
+    OR = "OR"
+    IDENTIFIER = "identifier"
+    COMPARATOR = "comparator"
+    NUMBER = "number"
+    STRING = "string"
+    LPAREN = "("
+    RPAREN = ")"
+
+class Token(NamedTuple):
+    type: TokenType
+    value: Any
+    position: int
+    text: str
+
+# Single-pass scanner: one alternation matched left to right, leading
+# whitespace absorbed, with groups named after the TokenType they produce.
+# Numbers must end at a word boundary (30abc is a bare word). The last three
+# groups mark the end of input and turn anything unrecognized into a
+# positioned error instead of silently dropping it.
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+      (?P<AND>AND\b)
+    | (?P<OR>OR\b)
+    | (?P<IDENTIFIER>[^\W\d]\w*)
+    | (?P<COMPARATOR>>=|<=|!=|>|<|=)
+    | (?P<NUMBER>-?\d+(?:\.\d+)?(?![\w.]))
+    | (?P<STRING>'[^']*')
+    | (?P<LPAREN>\()
+    | (?P<RPAREN>\))
+    | (?P<WORD>\w+)
+    | (?P<END>$)
+    | (?P<UNTERMINATED>')
+    | (?P<INVALID>.)
+    )
+""", re.VERBOSE)
+
+_COMPARATORS = {operator.value: operator for operator in ComparisonOperator}
+
+# Binding strength of the logical operators: AND before OR
+PRECEDENCE = {Operator.OR: 1, Operator.AND: 2}
+
+# Parser states: what the next token has to be
+_OPERAND, _COMPARATOR, _VALUE, _OPERATOR = range(4)
+
+def _token_value(kind: str, text: str) -> Any:
+    if kind == "NUMBER":
+        return float(text) if "." in text else int(text)
+    if kind == "STRING":
+        return text[1:-1]
+    if kind == "COMPARATOR":
+        return _COMPARATORS[text]
+    if kind == "AND" or kind == "OR":
+        return Operator(text)
+    return text
+
+def _unexpected(match: "re.Match", expected: str) -> ValueError:
+    kind = match.lastgroup
+    text, position = match.group(kind), match.start(kind)
+    if kind == "END":
+        return ValueError("Unexpected end of expression")
+    if kind == "UNTERMINATED":
+        return ValueError(f"Unterminated string at position {position}")
+    if kind == "INVALID":
+        return ValueError(f"Unexpected character '{text}' at position {position}")
+    return ValueError(f"Expected {expected} at position {position}, got '{text}'")
+
+class RuleParser:
+    # Operator-precedence (shunting-yard) parser run directly on the scanner's
+    # matches, without recursion, so parsing itself never runs out of stack;
+    # create_rule bounds the depth of what it accepts. Chains of one operator
+    # are built left-deep.
+    def tokenize(self, rule_string: str) -> List[Token]:
+        tokens = []
+        for match in _TOKEN_PATTERN.finditer(rule_string):
+            kind = match.lastgroup
+            if kind == "END":
+                break
+            if kind == "UNTERMINATED" or kind == "INVALID":
+                raise _unexpected(match, "")
+            text = match.group(kind)
+            token_type = TokenType.IDENTIFIER if kind == "WORD" else TokenType[kind]
+            tokens.append(Token(token_type, _token_value(kind, text), match.start(kind), text))
+        return tokens
+
+    def parse(self, rule_string: str) -> Node:
+        operands: List[Node] = []
+        # Pending AND/OR operators, with None marking an open parenthesis
+        operators: List[Optional[Operator]] = []
+        state = _OPERAND
+        for match in _TOKEN_PATTERN.finditer(rule_string):
+            kind = match.lastgroup
+            if state == _OPERAND:
+                if kind == "IDENTIFIER" or kind == "WORD":
+                    field = match.group(kind)
+                    state = _COMPARATOR
+                elif kind == "LPAREN":
+                    operators.append(None)
+                else:
+                    raise _unexpected(match, "a field name or '('")
+            elif state == _COMPARATOR:
+                if kind != "COMPARATOR":
+                    raise _unexpected(match, "a comparison operator")
+                comparator = _COMPARATORS[match.group(kind)]
+                state = _VALUE
+            elif state == _VALUE:
+                # A number, a quoted string or a bare word
+                if kind not in ("NUMBER", "STRING", "IDENTIFIER", "WORD"):
+                    raise _unexpected(match, "a value")
+                operands.append(Node(NodeType.COMPARISON, _token_value(kind, match.group(kind)), field, comparator))
+                state = _OPERATOR
+            elif kind == "AND" or kind == "OR":
+                operator = Operator.AND if kind == "AND" else Operator.OR
+                while operators and operators[-1] is not None and PRECEDENCE[operators[-1]] >= PRECEDENCE[operator]:
+                    self._reduce(operands, operators.pop())
+                operators.append(operator)
+                state = _OPERAND
+            elif kind == "RPAREN":
+                while operators and operators[-1] is not None:
+                    self._reduce(operands, operators.pop())
+                if not operators:
+                    raise ValueError(f"Unexpected ')' at position {match.start(kind)}")
+                operators.pop()
+            elif kind == "END":
+                break
             else:
+                raise _unexpected(match, "AND, OR or ')'")
+
+        while operators:
+            operator = operators.pop()
+            if operator is None:
                 raise ValueError("Expected closing parenthesis")
-            return node
-        
-        field = self.tokens[self.current]
-        self.current += 1
-        
-        if self.current >= len(self.tokens):
-            raise ValueError("Unexpected end of expression")
-            
-        operator = self.tokens[self.current]
-        self.current += 1
-        
-        if self.current >= len(self.tokens):
-            raise ValueError("Unexpected end of expression")
-            
-        value = self.tokens[self.current]
-        self.current += 1
-        
-        # Convert numeric values
-        if value.isdigit():
-            value = int(value)
-        elif value.replace('.', '').isdigit():
-            value = float(value)
-            
-        return Node(
-            type=NodeType.COMPARISON,
-            field=field,
-            operator=ComparisonOperator(operator),
-            value=value
-        )
+            self._reduce(operands, operator)
+        return operands[0]
+
+    @staticmethod
+    def _reduce(operands: List[Node], operator: Operator):
+        right = operands.pop()
+        operands[-1] = Node(NodeType.OPERATOR, operator=operator, left=operands[-1], right=right)
 
 class RuleEvaluator:
     def evaluate(self, node: Node, data: Dict[str, Any]) -> bool:
@@ -135,53 +301,262 @@ class RuleEvaluator:
                 return field_value == node.value
             elif node.operator == ComparisonOperator.NEQ:
                 return field_value != node.value
+        
+        elif node.type == NodeType.LITERAL:
+            # Constant produced by the optimizer when it folds a sub-expression
+            return bool(node.value)
                 
         raise ValueError(f"Invalid node type: {node.type}")
 
-def validate_attributes(node: Node):
+CompiledRule = Callable[[Dict[str, Any]], bool]
+
+COMPARATORS = {
+    ComparisonOperator.GT: py_operator.gt,
+    ComparisonOperator.LT: py_operator.lt,
+    ComparisonOperator.GTE: py_operator.ge,
+    ComparisonOperator.LTE: py_operator.le,
+    ComparisonOperator.EQ: py_operator.eq,
+    ComparisonOperator.NEQ: py_operator.ne,
+}
+
+class RuleCompiler:
+    # Builds one nested closure per node so evaluation no longer dispatches on
+    # node type and operator at every step. Semantics match RuleEvaluator.
+    def compile(self, node: Node) -> CompiledRule:
+        if node.type == NodeType.OPERATOR:
+            left = self.compile(node.left)
+            right = self.compile(node.right)
+            if node.operator == Operator.AND:
+                return lambda data: left(data) and right(data)
+            return lambda data: left(data) or right(data)
+
+        if node.type == NodeType.COMPARISON and node.operator in COMPARATORS:
+            return self._compile_comparison(node.field, COMPARATORS[node.operator], node.value)
+
+        if node.type == NodeType.LITERAL:
+            value = bool(node.value)
+            return lambda data: value
+
+        raise ValueError(f"Invalid node type: {node.type}")
+
+    def _compile_comparison(self, field: str, compare: Callable[[Any, Any], bool], value: Any) -> CompiledRule:
+        def comparison(data: Dict[str, Any]) -> bool:
+            try:
+                field_value = data[field]
+            except KeyError:
+                raise ValueError(f"Field {field} not found in data") from None
+            return compare(field_value, value)
+        return comparison
+
+# Compiled closures keyed by id(node); the weakref callback drops the entry
+# when the AST is garbage collected. ASTs are never mutated after parsing.
+_compiled_rules: Dict[int, Tuple["weakref.ref[Node]", CompiledRule]] = {}
+
+def compile_rule(node: Node) -> CompiledRule:
+    key = id(node)
+    cached = _compiled_rules.get(key)
+    if cached is not None and cached[0]() is node:
+        return cached[1]
+    compiled = RuleCompiler().compile(node)
+    _compiled_rules[key] = (weakref.ref(node, lambda _, key=key: _compiled_rules.pop(key, None)), compiled)
+    return compiled
+
+def rule_fields(node: Node) -> set:
     if node.type == NodeType.COMPARISON:
-        logger.debug(f"Validating attribute: {node.field}")
-        if node.field not in VALID_ATTRIBUTES:
-            logger.error(f"Invalid attribute: {node.field}")
-            raise ValueError(f"Invalid attribute: {node.field}")
-    if node.left:
-        validate_attributes(node.left)
-    if node.right:
-        validate_attributes(node.right)
+        return {node.field}
+    fields = set()
+    for child in (node.left, node.right):
+        if child is not None:
+            fields |= rule_fields(child)
+    return fields
+
+# Deepest rule accepted, counted in nodes from the root to a leaf (a chain of
+# n clauses joined by one operator is n deep). Evaluation, compilation,
+# pickling and the optimizer recurse once or twice per level, so this keeps
+# well inside Python's recursion limit.
+MAX_RULE_DEPTH = 200
+
+def validate_depth(node: Node):
+    stack = [(node, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if depth > MAX_RULE_DEPTH:
+            raise ValueError(f"Rule is nested more than {MAX_RULE_DEPTH} levels deep")
+        if node.right:
+            stack.append((node.right, depth + 1))
+        if node.left:
+            stack.append((node.left, depth + 1))
+
+def validate_attributes(node: Node):
+    # Iterative, like the parser
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.type == NodeType.COMPARISON:
+            if node.field not in VALID_ATTRIBUTES:
+                logger.error("Invalid attribute: %s", node.field)
+                raise ValueError(f"Invalid attribute: {node.field}")
+        if node.right:
+            stack.append(node.right)
+        if node.left:
+            stack.append(node.left)
 
 
 logger = logging.getLogger(__name__)
 
 def create_rule(rule_string: str) -> Node:
-    logger.debug(f"Creating rule from string: {rule_string}")
+    logger.debug("Creating rule from string: %s", rule_string)
     parser = RuleParser()
     try:
         ast = parser.parse(rule_string)
+        validate_depth(ast)
         validate_attributes(ast)
-        logger.debug(f"Rule created successfully: {ast}")
+        logger.debug("Rule created successfully: %s", ast)
         return ast
     except Exception as e:
-        logger.error(f"Error creating rule: {str(e)}")
+        logger.error("Error creating rule: %s", e)
         raise
 
+def parse_rules(rule_strings: List[str]) -> List[Tuple[Optional[Node], Optional[str]]]:
+    # Parses a chunk of rules, returning (ast, None) or (None, error) per rule.
+    # Module-level so it can be shipped to worker processes.
+    results = []
+    for rule_string in rule_strings:
+        try:
+            results.append((create_rule(rule_string), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
 def evaluate_rule(node: Node, data: Dict[str, Any]) -> bool:
-    logger.debug(f"Evaluating rule with data: {data}")
-    evaluator = RuleEvaluator()
+    logger.debug("Evaluating rule with data: %s", data)
     try:
-        result = evaluator.evaluate(node, data)
-        logger.debug(f"Rule evaluation result: {result}")
+        result = compile_rule(node)(data)
+        logger.debug("Rule evaluation result: %s", result)
         return result
     except Exception as e:
-        logger.error(f"Error evaluating rule: {str(e)}")
+        logger.error("Error evaluating rule: %s", e)
         raise
 
-def combine_rules(rule_strings: List[str]) -> Node:
+def format_value(value: Any) -> str:
+    if isinstance(value, str):
+        return f"'{value}'"
+    if isinstance(value, float) and math.isfinite(value):
+        # Positional, as the scanner reads no exponents; the point keeps the
+        # value a float when it parses back (1e+19 -> 10000000000000000000.0)
+        text = format(Decimal(repr(value)), "f")
+        return text if "." in text else text + ".0"
+    return repr(value)
+
+def to_rule_string(node: Node) -> str:
+    # Canonical rule string that parses back to the same tree. A run of one
+    # operator down the left spine is written flat, as the parser builds such
+    # runs left-deep; any other nested operator is parenthesized, so the
+    # string does not depend on precedence.
+    if node.type == NodeType.COMPARISON:
+        return f"{node.field} {node.operator.value} {format_value(node.value)}"
+    if node.type == NodeType.OPERATOR:
+        operands = []
+        current = node
+        while current.type == NodeType.OPERATOR and current.operator == node.operator:
+            operands.append(current.right)
+            current = current.left
+        operands.append(current)
+        parts = []
+        for child in reversed(operands):
+            text = to_rule_string(child)
+            parts.append(f"({text})" if child.type == NodeType.OPERATOR else text)
+        return f" {node.operator.value} ".join(parts)
+    raise ValueError(f"Invalid node type: {node.type}")
+
+def most_frequent_operator(asts: List[Node]) -> Operator:
+    # Operator of the most operator nodes across the rules; AND on a tie
+    counts = {Operator.AND: 0, Operator.OR: 0}
+    stack = list(asts)
+    while stack:
+        node = stack.pop()
+        if node.type == NodeType.OPERATOR:
+            counts[node.operator] += 1
+            stack += [node.left, node.right]
+    return Operator.OR if counts[Operator.OR] > counts[Operator.AND] else Operator.AND
+
+def combine_asts(asts: List[Node], operator: Optional[Operator] = None) -> Node:
+    # Grafts parsed rules into one tree instead of re-parsing their text.
+    # Without an operator, the one most frequent in the rules joins them.
+    # Repeated operands are dropped and terms shared by several operands are
+    # factored out: (A AND B) OR (A AND C) becomes A AND (B OR C), and
+    # A OR (A AND B) becomes A. As with RuleOptimizer, a record missing a
+    # field may fail on a different comparison than the rules one by one.
+    if not asts:
+        raise ValueError("No rules provided to combine")
+    if len(asts) == 1:
+        return asts[0]
+    if operator is None:
+        operator = most_frequent_operator(asts)
+    operands = _unique([operand for ast in asts for operand in _chain_operands(ast, operator)])
+    combined = _factor(operands, operator)
+    validate_depth(combined)
+    return combined
+
+def _chain_operands(node: Node, operator: Operator) -> List[Node]:
+    # Operands of a run of one operator, left to right, without recursion
+    operands, stack = [], [node]
+    while stack:
+        current = stack.pop()
+        if current.type == NodeType.OPERATOR and current.operator == operator:
+            stack += [current.right, current.left]
+        else:
+            operands.append(current)
+    return operands
+
+def _unique(nodes: List[Node]) -> List[Node]:
+    # Nodes are hash-consed, so equal subtrees are the same object
+    seen = set()
+    return [node for node in nodes if not (node in seen or seen.add(node))]
+
+def _join(nodes: List[Node], operator: Operator) -> Node:
+    # Left-deep, like the parser
+    joined = nodes[0]
+    for node in nodes[1:]:
+        joined = Node(type=NodeType.OPERATOR, operator=operator, left=joined, right=node)
+    return joined
+
+def _factor(operands: List[Node], operator: Operator) -> Node:
+    # Greedily pulls out the term shared by the most operands (the first one
+    # seen on a tie) until no term is shared by two of them. Merging operands
+    # only lowers counts, so stale heap entries are re-queued when popped.
+    inner = Operator.OR if operator == Operator.AND else Operator.AND
+    terms = {index: _unique(_chain_operands(operand, inner)) for index, operand in enumerate(operands)}
+    containing: Dict[Node, List[int]] = {}
+    for index, operand_terms in terms.items():
+        for term in operand_terms:
+            containing.setdefault(term, []).append(index)
+    heap = [(-len(indices), order, term) for order, (term, indices) in enumerate(containing.items()) if len(indices) > 1]
+    heapq.heapify(heap)
+    while heap:
+        count, order, shared = heapq.heappop(heap)
+        members = sorted({index for index in containing[shared] if index in terms and shared in terms[index]})
+        containing[shared] = members
+        if len(members) < -count:
+            if len(members) > 1:
+                heapq.heappush(heap, (-len(members), order, shared))
+            continue
+        remainders = [[term for term in terms[index] if term is not shared] for index in members]
+        if not all(remainders):
+            # An operand that is just the shared term absorbs the others
+            factored = [shared]
+        else:
+            rest = _factor([_join(remainder, inner) for remainder in remainders], operator)
+            factored = [shared] + _chain_operands(rest, inner)
+        # The merged operand takes the place of the first member
+        terms[members[0]] = factored
+        for index in members[1:]:
+            del terms[index]
+        for term in factored:
+            containing.setdefault(term, []).append(members[0])
+    return _join([_join(operand_terms, inner) for operand_terms in terms.values()], operator)
+
+def combine_rules(rule_strings: List[str], operator: Optional[Operator] = None) -> Node:
     if not rule_strings:
         raise ValueError("No rules provided to combine")
-    
-    if len(rule_strings) == 1:
-        return create_rule(rule_strings[0])
-    
-    # Combine rules with AND operator
-    combined_string = "(" + ") AND (".join(rule_strings) + ")"
-    return create_rule(combined_string)
\ No newline at end of file
+    return combine_asts([create_rule(rule_string) for rule_string in rule_strings], operator)
@@ -0,0 +1,209 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Set, Tuple
+
+from app.rule_engine import Node, NodeType, Operator, ComparisonOperator
+
+PredicateKey = Tuple[str, ComparisonOperator, Any]
+
+RANGE_OPERATORS = {ComparisonOperator.GT, ComparisonOperator.GTE, ComparisonOperator.LT, ComparisonOperator.LTE}
+
+# Rough cost of a guard predicate: how many candidates it tends to produce
+GUARD_COSTS = {
+    ComparisonOperator.EQ: 1,
+    ComparisonOperator.GT: 2,
+    ComparisonOperator.GTE: 2,
+    ComparisonOperator.LT: 2,
+    ComparisonOperator.LTE: 2,
+    ComparisonOperator.NEQ: 4,
+}
+
+# Guard of a rule that is a candidate for every record (a literal True)
+ALWAYS: PredicateKey = ("", None, None)
+
+class SortedThresholds:
+    # Thresholds for one (field, operator) pair kept in sorted order, with the
+    # owning rule ids in a parallel list so a record value maps to a slice.
+    def __init__(self):
+        self.thresholds: List[Any] = []
+        self.rule_ids: List[str] = []
+
+    def add(self, threshold: Any, rule_id: str):
+        position = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(position, threshold)
+        self.rule_ids.insert(position, rule_id)
+
+    def remove(self, threshold: Any, rule_id: str):
+        start = bisect_left(self.thresholds, threshold)
+        end = bisect_right(self.thresholds, threshold)
+        position = self.rule_ids.index(rule_id, start, end)
+        del self.thresholds[position]
+        del self.rule_ids[position]
+
+    def satisfied(self, operator: ComparisonOperator, value: Any) -> List[str]:
+        # Rules whose "value <op> threshold" holds for this record value
+        if operator == ComparisonOperator.GT:
+            return self.rule_ids[:bisect_left(self.thresholds, value)]
+        if operator == ComparisonOperator.GTE:
+            return self.rule_ids[:bisect_right(self.thresholds, value)]
+        if operator == ComparisonOperator.LT:
+            return self.rule_ids[bisect_right(self.thresholds, value):]
+        return self.rule_ids[bisect_left(self.thresholds, value):]
+
+class RuleIndex:
+    # Candidate-rule index over COMPARISON nodes. For each rule we pick a set of
+    # guard predicates such that the rule can only be true if at least one guard
+    # is true (all comparisons under an OR, the cheaper side of an AND). Guards are
+    # indexed by sorted thresholds for range operators and by hash for = and !=,
+    # so finding candidates for a record does not touch every rule.
+    #
+    # The index is conservative: when a record lacks a field any comparison of
+    # a rule reads, or its value cannot be ordered against the rule's range
+    # thresholds, the rule stays a candidate whatever its guards say, so full
+    # evaluation reports the same error it would without the index.
+    def __init__(self):
+        self._ranges: Dict[Tuple[str, ComparisonOperator, bool], SortedThresholds] = {}
+        self._equals: Dict[str, Dict[Any, Set[str]]] = {}
+        self._not_equals: Dict[str, Dict[Any, Set[str]]] = {}
+        self._guards: Dict[str, List[PredicateKey]] = {}
+        self._always: Set[str] = set()
+        # Rules by field they compare, and by (field, string threshold) for
+        # the range comparisons among those
+        self._fields: Dict[str, Set[str]] = {}
+        self._ranged: Dict[Tuple[str, bool], Set[str]] = {}
+        self._rule_fields: Dict[str, Tuple[Set[str], Set[Tuple[str, bool]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._guards)
+
+    def __contains__(self, rule_id: str) -> bool:
+        return rule_id in self._guards
+
+    def add_rule(self, rule_id: str, node: Node):
+        if rule_id in self._guards:
+            self.remove_rule(rule_id)
+        _, guards = self._select_guards(node)
+        guards = list(dict.fromkeys(guards))
+        for field, operator, value in guards:
+            if operator is None:
+                self._always.add(rule_id)
+            elif operator in RANGE_OPERATORS:
+                key = (field, operator, isinstance(value, str))
+                self._ranges.setdefault(key, SortedThresholds()).add(value, rule_id)
+            else:
+                index = self._equals if operator == ComparisonOperator.EQ else self._not_equals
+                index.setdefault(field, {}).setdefault(value, set()).add(rule_id)
+        self._guards[rule_id] = guards
+
+        fields, ranged = _referenced(node)
+        for field in fields:
+            self._fields.setdefault(field, set()).add(rule_id)
+        for key in ranged:
+            self._ranged.setdefault(key, set()).add(rule_id)
+        self._rule_fields[rule_id] = (fields, ranged)
+
+    def remove_rule(self, rule_id: str) -> bool:
+        guards = self._guards.pop(rule_id, None)
+        if guards is None:
+            return False
+        for field, operator, value in guards:
+            if operator is None:
+                self._always.discard(rule_id)
+            elif operator in RANGE_OPERATORS:
+                key = (field, operator, isinstance(value, str))
+                self._ranges[key].remove(value, rule_id)
+                if not self._ranges[key].thresholds:
+                    del self._ranges[key]
+            else:
+                index = self._equals if operator == ComparisonOperator.EQ else self._not_equals
+                owners = index[field][value]
+                owners.discard(rule_id)
+                if not owners:
+                    del index[field][value]
+                    if not index[field]:
+                        del index[field]
+        fields, ranged = self._rule_fields.pop(rule_id)
+        for table, keys in ((self._fields, fields), (self._ranged, ranged)):
+            for key in keys:
+                table[key].discard(rule_id)
+                if not table[key]:
+                    del table[key]
+        return True
+
+    def clear(self):
+        self._ranges.clear()
+        self._equals.clear()
+        self._not_equals.clear()
+        self._guards.clear()
+        self._always.clear()
+        self._fields.clear()
+        self._ranged.clear()
+        self._rule_fields.clear()
+
+    def candidates(self, data: Dict[str, Any]) -> Set[str]:
+        candidates: Set[str] = set(self._always)
+
+        # Rules that would fail on this record, whichever comparison fails
+        for field, rule_ids in self._fields.items():
+            if field not in data:
+                candidates |= rule_ids
+        for (field, is_string), rule_ids in self._ranged.items():
+            if field in data:
+                value = data[field]
+                if not isinstance(value, (int, float, str)) or isinstance(value, str) != is_string:
+                    candidates |= rule_ids
+
+        for (field, operator, is_string), thresholds in self._ranges.items():
+            if field not in data:
+                candidates.update(thresholds.rule_ids)
+                continue
+            value = data[field]
+            if isinstance(value, str) == is_string and isinstance(value, (int, float, str)):
+                candidates.update(thresholds.satisfied(operator, value))
+            else:
+                candidates.update(thresholds.rule_ids)
+
+        for field, by_value in self._equals.items():
+            if field not in data:
+                for owners in by_value.values():
+                    candidates |= owners
+                continue
+            try:
+                candidates |= by_value.get(data[field], set())
+            except TypeError:
+                for owners in by_value.values():
+                    candidates |= owners
+
+        for field, by_value in self._not_equals.items():
+            missing = field not in data
+            value = data.get(field)
+            for threshold, owners in by_value.items():
+                if missing or threshold != value:
+                    candidates |= owners
+
+        return candidates
+
+    def _select_guards(self, node: Node) -> Tuple[int, List[PredicateKey]]:
+        if node.type == NodeType.COMPARISON:
+            return GUARD_COSTS[node.operator], [(node.field, node.operator, node.value)]
+        if node.type == NodeType.LITERAL:
+            # False can never hold, so it needs no guard at all
+            return 0, [ALWAYS] if node.value else []
+        left = self._select_guards(node.left)
+        right = self._select_guards(node.right)
+        if node.operator == Operator.AND:
+            return min(left, right, key=lambda guard: guard[0])
+        return left[0] + right[0], left[1] + right[1]
+
+def _referenced(root: Node) -> Tuple[Set[str], Set[Tuple[str, bool]]]:
+    fields: Set[str] = set()
+    ranged: Set[Tuple[str, bool]] = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.type == NodeType.COMPARISON:
+            fields.add(node.field)
+            if node.operator in RANGE_OPERATORS:
+                ranged.add((node.field, isinstance(node.value, str)))
+        elif node.type == NodeType.OPERATOR:
+            stack += [node.left, node.right]
+    return fields, ranged
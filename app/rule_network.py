@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.rule_engine import Node, NodeType, Operator, ComparisonOperator, COMPARATORS
+
+PredicateKey = Tuple[str, ComparisonOperator, Any]
+NetworkRule = Callable[[Dict[str, Any], List[Optional[bool]]], bool]
+
+@dataclass
+class NetworkResult:
+    matched: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    evaluated_rules: int = 0
+    evaluated_predicates: int = 0
+
+class RuleNetwork:
+    # Shared-predicate network over many rules. Every distinct (field, operator,
+    # value) comparison gets one slot; rules are compiled into closures that read
+    # the slot's result from a per-record memo, so a comparison used by several
+    # rules is computed at most once per record. Short-circuiting is kept per rule.
+    def __init__(self):
+        self._slots: Dict[PredicateKey, int] = {}
+        self._keys: List[Optional[PredicateKey]] = []
+        self._refcounts: List[int] = []
+        self._free_slots: List[int] = []
+        self._rules: Dict[str, Tuple[NetworkRule, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __contains__(self, rule_id: str) -> bool:
+        return rule_id in self._rules
+
+    @property
+    def predicate_count(self) -> int:
+        return len(self._slots)
+
+    def add_rule(self, rule_id: str, node: Node):
+        if rule_id in self._rules:
+            self.remove_rule(rule_id)
+        slots: List[int] = []
+        try:
+            compiled = self._compile(node, slots)
+        except Exception:
+            self._release(slots)
+            raise
+        self._rules[rule_id] = (compiled, slots)
+
+    def remove_rule(self, rule_id: str) -> bool:
+        entry = self._rules.pop(rule_id, None)
+        if entry is None:
+            return False
+        self._release(entry[1])
+        return True
+
+    def clear(self):
+        self._slots.clear()
+        self._keys.clear()
+        self._refcounts.clear()
+        self._free_slots.clear()
+        self._rules.clear()
+
+    def evaluate(self, data: Dict[str, Any], rule_ids: Optional[Iterable[str]] = None) -> NetworkResult:
+        memo: List[Optional[bool]] = [None] * len(self._keys)
+        result = NetworkResult()
+        rules = self._rules.items() if rule_ids is None else (
+            (rule_id, self._rules[rule_id]) for rule_id in rule_ids if rule_id in self._rules
+        )
+        for rule_id, (compiled, _) in rules:
+            result.evaluated_rules += 1
+            try:
+                if compiled(data, memo):
+                    result.matched.append(rule_id)
+            except (ValueError, TypeError) as e:
+                result.errors[rule_id] = str(e)
+        result.evaluated_predicates = len(memo) - memo.count(None)
+        return result
+
+    def _compile(self, node: Node, slots: List[int]) -> NetworkRule:
+        if node.type == NodeType.OPERATOR:
+            left = self._compile(node.left, slots)
+            right = self._compile(node.right, slots)
+            if node.operator == Operator.AND:
+                return lambda data, memo: left(data, memo) and right(data, memo)
+            return lambda data, memo: left(data, memo) or right(data, memo)
+
+        if node.type == NodeType.COMPARISON and node.operator in COMPARATORS:
+            slot = self._acquire((node.field, node.operator, node.value))
+            slots.append(slot)
+            return self._compile_predicate(slot, node.field, COMPARATORS[node.operator], node.value)
+
+        if node.type == NodeType.LITERAL:
+            value = bool(node.value)
+            return lambda data, memo: value
+
+        raise ValueError(f"Invalid node type: {node.type}")
+
+    def _compile_predicate(self, slot: int, field: str, compare: Callable[[Any, Any], bool], value: Any) -> NetworkRule:
+        def predicate(data: Dict[str, Any], memo: List[Optional[bool]]) -> bool:
+            result = memo[slot]
+            if result is None:
+                if field not in data:
+                    raise ValueError(f"Field {field} not found in data")
+                result = memo[slot] = compare(data[field], value)
+            return result
+        return predicate
+
+    def _acquire(self, key: PredicateKey) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+                self._keys[slot] = key
+                self._refcounts[slot] = 0
+            else:
+                slot = len(self._keys)
+                self._keys.append(key)
+                self._refcounts.append(0)
+            self._slots[key] = slot
+        self._refcounts[slot] += 1
+        return slot
+
+    def _release(self, slots: List[int]):
+        for slot in slots:
+            self._refcounts[slot] -= 1
+            if self._refcounts[slot] == 0:
+                del self._slots[self._keys[slot]]
+                self._keys[slot] = None
+                self._free_slots.append(slot)
@@ -0,0 +1,257 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.rule_engine import ComparisonOperator, Node, NodeType, Operator
+from app.rule_profiler import ProfilingRuleEvaluator
+
+# Share of records a comparison is assumed to hold for without observations
+DEFAULT_SELECTIVITY = {
+    ComparisonOperator.EQ: 0.1,
+    ComparisonOperator.NEQ: 0.9,
+    ComparisonOperator.GT: 1 / 3,
+    ComparisonOperator.GTE: 1 / 3,
+    ComparisonOperator.LT: 1 / 3,
+    ComparisonOperator.LTE: 1 / 3,
+}
+# Assumed cost of one comparison in ns until one has been measured
+DEFAULT_COMPARISON_COST_NS = 200.0
+# Observations needed before measured statistics replace the defaults
+MIN_OBSERVATIONS = 20
+
+NEGATED = {
+    ComparisonOperator.GT: ComparisonOperator.LTE,
+    ComparisonOperator.GTE: ComparisonOperator.LT,
+    ComparisonOperator.LT: ComparisonOperator.GTE,
+    ComparisonOperator.LTE: ComparisonOperator.GT,
+    ComparisonOperator.EQ: ComparisonOperator.NEQ,
+    ComparisonOperator.NEQ: ComparisonOperator.EQ,
+}
+
+ComparisonKey = Tuple[str, ComparisonOperator, Any]
+
+def comparison_key(node: Node) -> ComparisonKey:
+    # 1 and 1.0 compare equal but are kept apart, like True and 1
+    return (node.field, node.operator, (type(node.value).__name__, node.value))
+
+class SelectivityStats:
+    # Observed true rate and cost per distinct comparison, merged from rule
+    # profiles (see rule_profiler). Shared by every rule using the comparison.
+    def __init__(self):
+        self._observations: Dict[ComparisonKey, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._observations)
+
+    def record(self, node: Node, evaluations: int, true_results: int, total_ns: int):
+        observed = self._observations.setdefault(comparison_key(node), [0, 0, 0])
+        observed[0] += evaluations
+        observed[1] += true_results
+        observed[2] += total_ns
+
+    def record_profile(self, profiler: ProfilingRuleEvaluator):
+        for node, profile in zip(profiler.nodes, profiler.profiles):
+            if node.type == NodeType.COMPARISON and profile.evaluations:
+                self.record(node, profile.evaluations, profile.true_results, profile.total_ns)
+
+    def estimate(self, node: Node) -> Tuple[float, float]:
+        # (probability the comparison holds, cost in ns)
+        observed = self._observations.get(comparison_key(node))
+        if observed is None or observed[0] < MIN_OBSERVATIONS:
+            return DEFAULT_SELECTIVITY[node.operator], DEFAULT_COMPARISON_COST_NS
+        evaluations, true_results, total_ns = observed
+        # Laplace smoothing keeps never/always-true comparisons reorderable
+        return (true_results + 1) / (evaluations + 2), total_ns / evaluations
+
+@dataclass
+class Chain:
+    operator: Operator
+    operands: List[Union[Node, "Chain"]]
+
+Term = Union[Node, Chain, bool]
+
+@dataclass
+class OptimizationResult:
+    node: Node
+    cost_before: float
+    cost_after: float
+    selectivity: float
+    removed_duplicates: int = 0
+    folded: int = 0
+
+class RuleOptimizer:
+    # Rewrites a rule into an equivalent, cheaper tree:
+    #   - flattens AND/OR chains and drops duplicate operands
+    #   - folds contradictions (age > 30 AND age < 20) and tautologies
+    #     (age > 30 OR age <= 30) on a field into literals, then propagates them
+    #   - orders each chain so the operand most likely to decide it per unit of
+    #     cost runs first (AND: cost / P(false), OR: cost / P(true))
+    # Results are identical for records that carry every referenced field with
+    # comparable values; dropping or reordering operands changes which missing
+    # field (if any) raises. The input tree is never modified.
+    def __init__(self, stats: Optional[SelectivityStats] = None):
+        self.stats = stats if stats is not None else SelectivityStats()
+        self._removed = 0
+        self._folded = 0
+
+    def optimize(self, node: Node) -> Node:
+        return self.optimize_with_stats(node).node
+
+    def optimize_with_stats(self, node: Node) -> OptimizationResult:
+        self._removed = self._folded = 0
+        term = self._simplify(node)
+        if isinstance(term, Chain):
+            self._reorder(term)
+        optimized = self._build(term)
+        _, cost_before = self.estimate(node)
+        selectivity, cost_after = self.estimate(optimized)
+        return OptimizationResult(node=optimized, cost_before=cost_before, cost_after=cost_after,
+                                  selectivity=selectivity, removed_duplicates=self._removed, folded=self._folded)
+
+    def estimate(self, node: Node) -> Tuple[float, float]:
+        # (probability the rule holds, expected evaluation cost in ns) for the
+        # tree as written, assuming independent comparisons
+        if node.type == NodeType.LITERAL:
+            return float(bool(node.value)), 0.0
+        if node.type == NodeType.COMPARISON:
+            return self.stats.estimate(node)
+        return self._estimate_chain(node.operator, [self.estimate(operand) for operand in _flatten(node)])
+
+    @staticmethod
+    def _estimate_chain(operator: Operator, estimates: List[Tuple[float, float]]) -> Tuple[float, float]:
+        # Probability that evaluation continues past each operand
+        continues, cost = 1.0, 0.0
+        for probability, operand_cost in estimates:
+            cost += continues * operand_cost
+            continues *= probability if operator == Operator.AND else 1 - probability
+        return (continues, cost) if operator == Operator.AND else (1 - continues, cost)
+
+    def _simplify(self, node: Node) -> Term:
+        if node.type == NodeType.LITERAL:
+            return bool(node.value)
+        if node.type == NodeType.COMPARISON:
+            return node
+        if node.type != NodeType.OPERATOR:
+            raise ValueError(f"Invalid node type: {node.type}")
+
+        operator = node.operator
+        # AND absorbs False and drops True; OR the other way round
+        absorbing = operator == Operator.OR
+        operands: List[Union[Node, Chain]] = []
+        seen = set()
+        # Stack in reverse, so operands come off in source order
+        pending = [self._simplify(operand) for operand in reversed(_flatten(node))]
+        while pending:
+            term = pending.pop()
+            if isinstance(term, Chain) and term.operator == operator:
+                pending.extend(reversed(term.operands))
+                continue
+            if isinstance(term, bool):
+                if term == absorbing:
+                    return absorbing
+                continue
+            key = _term_key(term)
+            if key in seen:
+                self._removed += 1
+                continue
+            seen.add(key)
+            operands.append(term)
+
+        if self._unsatisfiable([term for term in operands if isinstance(term, Node)], negate=absorbing):
+            self._folded += 1
+            return absorbing
+        if not operands:
+            return not absorbing
+        if len(operands) == 1:
+            return operands[0]
+        return Chain(operator, operands)
+
+    def _unsatisfiable(self, comparisons: List[Node], negate: bool) -> bool:
+        # For OR chains the negated comparisons are checked: an OR is a
+        # tautology exactly when the AND of the negations is unsatisfiable
+        by_field: Dict[str, List[Tuple[ComparisonOperator, Any]]] = {}
+        for comparison in comparisons:
+            operator = NEGATED[comparison.operator] if negate else comparison.operator
+            by_field.setdefault(comparison.field, []).append((operator, comparison.value))
+        return any(len(constraints) > 1 and _contradicts(constraints) for constraints in by_field.values())
+
+    def _reorder(self, chain: Chain) -> Tuple[float, float]:
+        estimates = []
+        for operand in chain.operands:
+            estimates.append(self._reorder(operand) if isinstance(operand, Chain) else self.stats.estimate(operand))
+
+        def rank(position: int) -> float:
+            probability, cost = estimates[position]
+            decides = 1 - probability if chain.operator == Operator.AND else probability
+            return cost / decides if decides > 0 else float("inf")
+
+        # Stable, so ties keep the source order
+        order = sorted(range(len(chain.operands)), key=rank)
+        chain.operands = [chain.operands[position] for position in order]
+        return self._estimate_chain(chain.operator, [estimates[position] for position in order])
+
+    def _build(self, term: Term) -> Node:
+        if isinstance(term, bool):
+            return Node(type=NodeType.LITERAL, value=term)
+        if isinstance(term, Node):
+            return term
+        # Left-deep, like the parser builds chains
+        node = self._build(term.operands[0])
+        for operand in term.operands[1:]:
+            node = Node(type=NodeType.OPERATOR, operator=term.operator, left=node, right=self._build(operand))
+        return node
+
+def _flatten(node: Node) -> List[Node]:
+    # Operands of the AND/OR chain rooted at node, in source order
+    operands, stack = [], [node]
+    while stack:
+        current = stack.pop()
+        if current.type == NodeType.OPERATOR and current.operator == node.operator:
+            stack.append(current.right)
+            stack.append(current.left)
+        else:
+            operands.append(current)
+    return operands
+
+def _term_key(term: Union[Node, Chain]) -> Any:
+    if isinstance(term, Node):
+        return comparison_key(term)
+    return (term.operator, frozenset(_term_key(operand) for operand in term.operands))
+
+def _comparable(values: List[Any]) -> bool:
+    numbers = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)
+    return numbers or all(isinstance(value, str) for value in values)
+
+def _contradicts(constraints: List[Tuple[ComparisonOperator, Any]]) -> bool:
+    # True when no single value satisfies every constraint. Bounds are
+    # (value, inclusive); the domain is treated as dense, so integer gaps such
+    # as x > 3 AND x < 4 are not folded.
+    if not _comparable([value for _, value in constraints]):
+        return False
+    lower: Optional[Tuple[Any, bool]] = None
+    upper: Optional[Tuple[Any, bool]] = None
+    equal, excluded = [], set()
+    for operator, value in constraints:
+        if operator in (ComparisonOperator.GT, ComparisonOperator.GTE):
+            bound = (value, operator == ComparisonOperator.GTE)
+            if lower is None or bound[0] > lower[0] or (bound[0] == lower[0] and not bound[1]):
+                lower = bound
+        elif operator in (ComparisonOperator.LT, ComparisonOperator.LTE):
+            bound = (value, operator == ComparisonOperator.LTE)
+            if upper is None or bound[0] < upper[0] or (bound[0] == upper[0] and not bound[1]):
+                upper = bound
+        elif operator == ComparisonOperator.EQ:
+            equal.append(value)
+        else:
+            excluded.add(value)
+
+    if equal:
+        value = equal[0]
+        return (any(other != value for other in equal) or value in excluded
+                or (lower is not None and (value < lower[0] or (value == lower[0] and not lower[1])))
+                or (upper is not None and (value > upper[0] or (value == upper[0] and not upper[1]))))
+    if lower is not None and upper is not None:
+        if lower[0] > upper[0]:
+            return True
+        if lower[0] == upper[0]:
+            return not (lower[1] and upper[1]) or lower[0] in excluded
+    return False
@@ -0,0 +1,132 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.rule_engine import Node, NodeType, Operator, RuleEvaluator, format_value
+
+@dataclass
+class NodeProfile:
+    evaluations: int = 0
+    true_results: int = 0
+    short_circuits: int = 0
+    errors: int = 0
+    total_ns: int = 0
+
+class ProfilingRuleEvaluator(RuleEvaluator):
+    # Opt-in instrumented evaluator for a single rule. Same semantics as
+    # RuleEvaluator, but counts per node how often it ran, returned True and
+    # (for AND/OR) skipped its right child, plus the time spent in it. Nodes
+    # are addressed by pre-order position, so shared subtrees are profiled
+    # separately. RuleEvaluator and compiled rules are untouched.
+    def __init__(self, root: Node):
+        self.root = root
+        self.nodes: List[Node] = []
+        self.right_child: List[int] = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self.nodes.append(node)
+            self.right_child.append(-1)
+            if node.type == NodeType.OPERATOR:
+                stack.append(node.right)
+                stack.append(node.left)
+        # The right child follows the left subtree in pre-order
+        sizes = [1] * len(self.nodes)
+        for index in range(len(self.nodes) - 1, -1, -1):
+            if self.nodes[index].type == NodeType.OPERATOR:
+                left_size = sizes[index + 1]
+                self.right_child[index] = index + 1 + left_size
+                sizes[index] += left_size + sizes[self.right_child[index]]
+        self.profiles = [NodeProfile() for _ in self.nodes]
+
+    def evaluate(self, node: Node, data: Dict[str, Any]) -> bool:
+        # An equal AST (the rule re-read from the database) is the same rule
+        if node is not self.root and node != self.root:
+            raise ValueError("Profiler was created for a different rule")
+        return self._evaluate(0, data)
+
+    def _evaluate(self, index: int, data: Dict[str, Any]) -> bool:
+        node = self.nodes[index]
+        profile = self.profiles[index]
+        start = time.perf_counter_ns()
+        try:
+            if node.type == NodeType.OPERATOR:
+                result = self._evaluate(index + 1, data)
+                # AND stops on False, OR stops on True
+                if (node.operator == Operator.AND) != bool(result):
+                    profile.short_circuits += 1
+                else:
+                    result = self._evaluate(self.right_child[index], data)
+            else:
+                result = RuleEvaluator.evaluate(self, node, data)
+        except Exception:
+            profile.errors += 1
+            raise
+        finally:
+            profile.evaluations += 1
+            profile.total_ns += time.perf_counter_ns() - start
+        if result:
+            profile.true_results += 1
+        return result
+
+    def reset(self):
+        self.profiles = [NodeProfile() for _ in self.nodes]
+
+    def annotated_tree(self) -> Dict[str, Any]:
+        # Built bottom-up: children always come after their parent in pre-order
+        trees: List[Optional[Dict[str, Any]]] = [None] * len(self.nodes)
+        for index in range(len(self.nodes) - 1, -1, -1):
+            node, profile = self.nodes[index], self.profiles[index]
+            evaluations = profile.evaluations
+            tree: Dict[str, Any] = {"type": node.type.value, "operator": node.operator.value if node.operator else None}
+            if node.type == NodeType.COMPARISON:
+                tree["field"] = node.field
+                tree["value"] = node.value
+                tree["expression"] = f"{node.field} {node.operator.value} {format_value(node.value)}"
+            tree.update({
+                "evaluations": evaluations,
+                "true_results": profile.true_results,
+                "true_rate": profile.true_results / evaluations if evaluations else 0,
+                "errors": profile.errors,
+                "total_time_ms": profile.total_ns / 1e6,
+                "self_time_ms": profile.total_ns / 1e6
+            })
+            if node.type == NodeType.OPERATOR:
+                left, right = index + 1, self.right_child[index]
+                child_ns = self.profiles[left].total_ns + self.profiles[right].total_ns
+                tree["self_time_ms"] = max(profile.total_ns - child_ns, 0) / 1e6
+                tree["short_circuits"] = profile.short_circuits
+                tree["short_circuit_rate"] = profile.short_circuits / evaluations if evaluations else 0
+                tree["left"] = trees[left]
+                tree["right"] = trees[right]
+            trees[index] = tree
+        return trees[0]
+
+class RuleProfiles:
+    # Rules with profiling switched on, each with a profiler for its current
+    # AST. A profiler is replaced (and its counts reset) when the rule changes.
+    def __init__(self):
+        self._profilers: Dict[str, ProfilingRuleEvaluator] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._profilers)
+
+    def __contains__(self, rule_id: str) -> bool:
+        return rule_id in self._profilers
+
+    def enable(self, rule_id: str, ast: Node) -> ProfilingRuleEvaluator:
+        profiler = self._profilers[rule_id] = ProfilingRuleEvaluator(ast)
+        return profiler
+
+    def disable(self, rule_id: str) -> bool:
+        return self._profilers.pop(rule_id, None) is not None
+
+    def get(self, rule_id: str) -> Optional[ProfilingRuleEvaluator]:
+        return self._profilers.get(rule_id)
+
+    def profiler(self, rule_id: str, ast: Node) -> Optional[ProfilingRuleEvaluator]:
+        # Profiler to evaluate ast with, or None when profiling is off
+        profiler = self._profilers.get(rule_id)
+        if profiler is not None and profiler.root is not ast and profiler.root != ast:
+            profiler = self.enable(rule_id, ast)
+        return profiler
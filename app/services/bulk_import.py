@@ -0,0 +1,115 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+
+from app.models import RuleCreate
+from app.rule_engine import Node, parse_rules
+from app.ast_codec import serialize_ast
+from app.services.rule_repository import RuleRepository
+
+class BulkImportError(BaseModel):
+    index: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    failed: int = 0
+    ids: List[Optional[str]] = []
+    errors: List[BulkImportError] = []
+    elapsed_seconds: float = 0
+    rules_per_second: float = 0
+
+class BulkRuleImporter:
+    # Imports rules in windows of insert_batch_size: each window is parsed in
+    # chunks on the executor (a process pool for large imports), then the valid
+    # rules are written with one unordered insert_many.
+    def __init__(self, repository: RuleRepository, executor: Optional[Executor] = None,
+                 parse_chunk_size: int = 250, insert_batch_size: int = 1000,
+                 on_inserted: Optional[Callable[[Dict[str, Any], Node], None]] = None):
+        self.repository = repository
+        self.executor = executor
+        self.parse_chunk_size = parse_chunk_size
+        self.insert_batch_size = insert_batch_size
+        self.on_inserted = on_inserted
+
+    async def import_rules(self, items: AsyncIterator[Any]) -> BulkImportResult:
+        result = BulkImportResult()
+        start = time.perf_counter()
+        window: List[Any] = []
+        async for item in items:
+            window.append(item)
+            if len(window) >= self.insert_batch_size:
+                await self._import_window(window, result)
+                window = []
+        if window:
+            await self._import_window(window, result)
+
+        result.errors.sort(key=lambda error: error.index)
+        result.failed = len(result.errors)
+        result.elapsed_seconds = time.perf_counter() - start
+        result.rules_per_second = result.inserted / result.elapsed_seconds if result.elapsed_seconds > 0 else 0
+        return result
+
+    async def _import_window(self, window: List[Any], result: BulkImportResult):
+        offset = result.received
+        result.received += len(window)
+        result.ids.extend([None] * len(window))
+
+        rules: List[Tuple[int, RuleCreate]] = []
+        for position, item in enumerate(window):
+            try:
+                if isinstance(item, Exception):
+                    raise item
+                rules.append((offset + position, item if isinstance(item, RuleCreate) else RuleCreate(**item)))
+            except (ValidationError, ValueError, TypeError) as e:
+                result.errors.append(BulkImportError(index=offset + position, error=str(e)))
+
+        parsed = await self._parse([rule.rule_string for _, rule in rules])
+
+        now = datetime.utcnow()
+        rule_docs, pending = [], []
+        for (index, rule), (ast, error) in zip(rules, parsed):
+            if error is not None:
+                result.errors.append(BulkImportError(index=index, error=error))
+                continue
+            rule_docs.append({
+                "name": rule.name,
+                "description": rule.description,
+                "rule_string": rule.rule_string,
+                "ast": serialize_ast(ast),
+                "created_at": now,
+                "updated_at": now,
+                "version": 1,
+                "active": True
+            })
+            pending.append((index, ast))
+
+        failed = await self.repository.insert_many(rule_docs)
+        for position, (rule_doc, (index, ast)) in enumerate(zip(rule_docs, pending)):
+            if position in failed:
+                result.errors.append(BulkImportError(index=index, error=failed[position]))
+                continue
+            if self.on_inserted is not None:
+                try:
+                    self.on_inserted(rule_doc, ast)
+                except Exception as e:
+                    # A rule the callback rejects is removed again and reported
+                    # like any other invalid item
+                    await self.repository.delete(rule_doc["_id"])
+                    result.errors.append(BulkImportError(index=index, error=str(e) or type(e).__name__))
+                    continue
+            result.ids[index] = rule_doc["_id"]
+            result.inserted += 1
+
+    async def _parse(self, rule_strings: List[str]) -> List[Tuple[Optional[Node], Optional[str]]]:
+        chunks = [rule_strings[i:i + self.parse_chunk_size] for i in range(0, len(rule_strings), self.parse_chunk_size)]
+        if self.executor is None or len(chunks) <= 1:
+            # Not worth the inter-process round trip
+            return parse_rules(rule_strings)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(loop.run_in_executor(self.executor, parse_rules, chunk) for chunk in chunks))
+        return [parsed for chunk in results for parsed in chunk]
@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.database import AsyncCollection
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "block")
+
+# (timestamp, rule_id, version, data, result, error, latency_ns) as buffered
+# on the request path; hashing and document building happen at flush time
+LogEntry = Tuple[float, str, Optional[int], Dict[str, Any], Optional[bool], Optional[str], int]
+
+def input_hash(data: Dict[str, Any]) -> str:
+    # Stable across key order, so equal inputs share a hash
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+def log_document(entry: LogEntry) -> Dict[str, Any]:
+    timestamp, rule_id, version, data, result, error, latency_ns = entry
+    return {
+        "timestamp": datetime.fromtimestamp(timestamp, timezone.utc),
+        "rule_id": rule_id,
+        "version": version,
+        "input_hash": input_hash(data),
+        "result": result,
+        "error": error,
+        "latency_ns": latency_ns
+    }
+
+class EvaluationSink:
+    # Destination of flushed batches. write() may raise; the batch is then
+    # counted as failed and dropped.
+    async def write(self, documents: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class MongoSink(EvaluationSink):
+    def __init__(self, collection: AsyncCollection):
+        self.collection = collection
+
+    async def write(self, documents: List[Dict[str, Any]]):
+        await self.collection.insert_many(documents, ordered=False)
+
+class JsonlSink(EvaluationSink):
+    # Appends one JSON object per line; the file is opened on first write
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def _write(self, documents: List[Dict[str, Any]]):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps({**document, "timestamp": document["timestamp"].isoformat()}) + "\n"
+                                 for document in documents))
+        self._file.flush()
+
+    async def write(self, documents: List[Dict[str, Any]]):
+        await asyncio.get_running_loop().run_in_executor(None, self._write, documents)
+
+    async def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class ParquetSink(EvaluationSink):
+    # One row group per flush. Parquet files are only readable once closed,
+    # so the file is complete after close() (on shutdown). Requires pyarrow.
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("The parquet evaluation log sink requires pyarrow") from None
+        self._pa = pyarrow
+        self._parquet = pyarrow.parquet
+        self.path = path
+        self.schema = pyarrow.schema([
+            ("timestamp", pyarrow.timestamp("us", tz="UTC")),
+            ("rule_id", pyarrow.string()),
+            ("version", pyarrow.int64()),
+            ("input_hash", pyarrow.string()),
+            ("result", pyarrow.bool_()),
+            ("error", pyarrow.string()),
+            ("latency_ns", pyarrow.int64()),
+        ])
+        self._writer = None
+
+    def _write(self, documents: List[Dict[str, Any]]):
+        if self._writer is None:
+            self._writer = self._parquet.ParquetWriter(self.path, self.schema)
+        self._writer.write_table(self._pa.Table.from_pylist(documents, schema=self.schema))
+
+    async def write(self, documents: List[Dict[str, Any]]):
+        await asyncio.get_running_loop().run_in_executor(None, self._write, documents)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+class EvaluationLog:
+    # Audit trail of evaluations without a write per evaluation. log() only
+    # appends to a bounded in-memory buffer; run() drains it in batches of
+    # flush_size to the sink, at least every flush_interval seconds. When the
+    # buffer is full, the "drop" policy discards new entries (counted in
+    # dropped) and "block" makes callers wait for the next flush.
+    #
+    # Everything runs on the event loop; the sinks do their I/O on executors.
+    def __init__(self, sink: EvaluationSink, capacity: int = 10000, flush_size: int = 500,
+                 flush_interval: float = 1.0, overflow: str = "drop"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        if capacity < 1 or flush_size < 1:
+            raise ValueError("capacity and flush_size must be at least 1")
+        self.sink = sink
+        self.capacity = capacity
+        self.flush_size = min(flush_size, capacity)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self._buffer: Deque[LogEntry] = deque()
+        # Timestamp of the oldest entry of the batch being written
+        self._writing_since: Optional[float] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.blocked_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def _bind(self):
+        # asyncio primitives belong to the loop that first waits on them; a new
+        # loop (an app restarted in the same process) gets fresh ones
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._space = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+
+    async def log(self, rule_id: str, version: Optional[int], data: Dict[str, Any], result: Optional[bool],
+                  latency_ns: int, error: Optional[str] = None) -> bool:
+        # data must not be mutated afterwards: it is hashed at flush time.
+        # Returns False if the entry was dropped. Blocking waits on run().
+        self._bind()
+        if len(self._buffer) >= self.capacity:
+            if self.overflow == "drop":
+                self.dropped += 1
+                return False
+            start = time.perf_counter()
+            while len(self._buffer) >= self.capacity:
+                self._space.clear()
+                self._wake.set()
+                await self._space.wait()
+            self.blocked_seconds += time.perf_counter() - start
+        self._buffer.append((time.time(), rule_id, version, data, result, error, latency_ns))
+        self.logged += 1
+        if len(self._buffer) >= self.flush_size:
+            self._wake.set()
+        return True
+
+    def lag_seconds(self) -> float:
+        # Age of the oldest entry not yet written
+        oldest = self._writing_since if self._writing_since is not None else (
+            self._buffer[0][0] if self._buffer else None)
+        return time.time() - oldest if oldest is not None else 0.0
+
+    async def run(self):
+        # Flushes until cancelled
+        self._bind()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        # Drains everything buffered so far, one sink write per flush_size entries
+        self._bind()
+        async with self._flush_lock:
+            pending = len(self._buffer)
+            while pending > 0 and self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.flush_size, len(self._buffer)))]
+                pending -= len(batch)
+                self._space.set()
+                self._writing_since = batch[0][0]
+                start = time.perf_counter()
+                try:
+                    # Hashing inputs is CPU work: keep it off the event loop
+                    documents = await asyncio.get_running_loop().run_in_executor(
+                        None, lambda: [log_document(entry) for entry in batch])
+                    await self.sink.write(documents)
+                    self.written += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    logger.error(f"Writing {len(batch)} evaluation log entries failed: {str(e)}", exc_info=True)
+                finally:
+                    self._writing_since = None
+                self.flushes += 1
+                self.last_flush_seconds = time.perf_counter() - start
+
+    async def close(self):
+        await self.flush()
+        await self.sink.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "capacity": self.capacity,
+            "overflow": self.overflow,
+            "logged": self.logged,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "lag_seconds": self.lag_seconds(),
+            "blocked_seconds": self.blocked_seconds,
+            "last_flush_seconds": self.last_flush_seconds
+        }
+
+    def prometheus_metrics(self) -> str:
+        stats = self.stats()
+        lines = []
+        for name, kind, help_text, value in (
+            ("evaluation_log_entries_total", "counter", "Evaluations added to the audit log buffer.", stats["logged"]),
+            ("evaluation_log_written_total", "counter", "Audit log entries written to the sink.", stats["written"]),
+            ("evaluation_log_dropped_total", "counter", "Audit log entries dropped because the buffer was full.", stats["dropped"]),
+            ("evaluation_log_failed_total", "counter", "Audit log entries lost to sink write errors.", stats["failed"]),
+            ("evaluation_log_flushes_total", "counter", "Batches written to the audit log sink.", stats["flushes"]),
+            ("evaluation_log_blocked_seconds_total", "counter", "Time callers waited for audit log buffer space.", stats["blocked_seconds"]),
+            ("evaluation_log_buffered", "gauge", "Audit log entries waiting to be written.", stats["buffered"]),
+            ("evaluation_log_lag_seconds", "gauge", "Age of the oldest audit log entry not yet written.", stats["lag_seconds"]),
+            ("evaluation_log_last_flush_seconds", "gauge", "Duration of the last audit log sink write.", stats["last_flush_seconds"]),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,54 @@
+from typing import AbstractSet, Any, AsyncIterator, Dict, List, Optional
+
+from app.database import AsyncCollection
+from app.mongo_query import MongoQuery, matches_residual, to_mongo_query
+from app.rule_engine import Node
+
+def validate_collection_name(name: str, allowed: Optional[AbstractSet[str]] = None) -> str:
+    # allowed: the only collections that may be queried, when given
+    if not name or "$" in name or "\0" in name or name.startswith("system."):
+        raise ValueError(f"Invalid collection name: {name!r}")
+    if allowed is not None and name not in allowed:
+        raise ValueError(f"Collection {name!r} is not queryable")
+    return name
+
+class RecordQuery:
+    # Selects the documents of a collection matching a rule. The rule is
+    # pushed down as a MongoDB filter; conjuncts that cannot be translated are
+    # checked in Python on the streamed cursor, so only the translated part
+    # benefits from indexes. hint is an index name or key specification.
+    def __init__(self, collection: AsyncCollection, batch_size: int = 500):
+        self.collection = collection
+        self.batch_size = batch_size
+
+    async def count(self, node: Node, hint: Optional[Any] = None) -> int:
+        query = to_mongo_query(node)
+        if query.residual is None:
+            options = {"hint": hint} if hint else {}
+            return await self.collection.count_documents(query.filter, **options)
+        count = 0
+        async for batch in self._batches(query, hint, 0):
+            count += len(batch)
+        return count
+
+    async def find(self, node: Node, hint: Optional[Any] = None, limit: int = 0) -> AsyncIterator[List[Dict[str, Any]]]:
+        # Batches of matching documents, at most limit in total (0 = all)
+        remaining = limit
+        async for batch in self._batches(to_mongo_query(node), hint, limit):
+            if limit:
+                batch = batch[:remaining]
+                remaining -= len(batch)
+            if batch:
+                yield batch
+            if limit and remaining <= 0:
+                break
+
+    async def _batches(self, query: MongoQuery, hint: Optional[Any], limit: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        # The server-side limit only holds when nothing is filtered afterwards
+        async for batch in self.collection.find_batches(
+            query.filter, batch_size=self.batch_size, hint=hint,
+            limit=limit if query.residual is None else 0
+        ):
+            if query.residual is not None:
+                batch = [document for document in batch if matches_residual(query.residual, document)]
+            yield batch
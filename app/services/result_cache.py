@@ -0,0 +1,119 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+
+from app.rule_engine import Node, rule_fields
+
+# Stands in for an attribute the record does not carry
+MISSING = ("missing",)
+
+ResultKey = Tuple[str, int, Tuple[Hashable, ...]]
+
+def canonical_value(value: Any) -> Hashable:
+    # Type-tagged so 1, 1.0 and True stay distinct; unhashable values are
+    # encoded as sorted JSON so equal documents share a key
+    try:
+        hash(value)
+        return (type(value).__name__, value)
+    except TypeError:
+        return ("json", json.dumps(value, sort_keys=True, default=str))
+
+class ResultCache:
+    # Memoizes rule results per (rule_id, version, referenced attribute
+    # values). Only the attributes the rule reads are part of the key, so
+    # records differing elsewhere share an entry. Evaluations that raise are
+    # not cached. Bounded, least recently used entries are evicted first.
+    def __init__(self, max_size: int = 10000):
+        if max_size < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.max_size = max_size
+        self._entries: "OrderedDict[ResultKey, bool]" = OrderedDict()
+        # Sorted referenced attributes per rule version, and each rule's keys
+        self._fields: Dict[Tuple[str, int], Tuple[str, ...]] = {}
+        self._keys: Dict[str, Set[ResultKey]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, rule_id: str, version: int, ast: Node, data: Dict[str, Any]) -> ResultKey:
+        fields = self._fields.get((rule_id, version))
+        if fields is None:
+            fields = self._fields[(rule_id, version)] = tuple(sorted(rule_fields(ast)))
+        return (rule_id, version, tuple(canonical_value(data[field]) if field in data else MISSING
+                                        for field in fields))
+
+    def evaluate(self, rule_id: str, version: int, ast: Node, data: Dict[str, Any],
+                 function: Callable[[Dict[str, Any]], bool]) -> bool:
+        # ast determines the key; function computes the result on a miss and
+        # may evaluate an equivalent tree (compiled or optimized)
+        key = self.key(rule_id, version, ast, data)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+        result = function(data)
+        self.put(key, result)
+        return result
+
+    def put(self, key: ResultKey, result: bool):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            self._keys.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+                self.evictions += 1
+
+    def invalidate(self, rule_id: str):
+        with self._lock:
+            for key in self._keys.pop(rule_id, ()):
+                self._entries.pop(key, None)
+            for fields_key in [fields_key for fields_key in self._fields if fields_key[0] == rule_id]:
+                del self._fields[fields_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fields.clear()
+            self._keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups > 0 else 0
+            }
+
+    def prometheus_metrics(self) -> str:
+        stats = self.stats()
+        lines = []
+        for name, kind, help_text, value in (
+            ("rule_result_cache_hits_total", "counter", "Evaluations answered from the result cache.", stats["hits"]),
+            ("rule_result_cache_misses_total", "counter", "Evaluations not found in the result cache.", stats["misses"]),
+            ("rule_result_cache_evictions_total", "counter", "Results evicted from the result cache.", stats["evictions"]),
+            ("rule_result_cache_entries", "gauge", "Results currently cached.", stats["size"]),
+            ("rule_result_cache_hit_ratio", "gauge", "Share of lookups answered from the result cache.", stats["hit_ratio"]),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def _forget(self, key: ResultKey):
+        keys = self._keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[key[0]]
@@ -1,54 +1,235 @@
+import threading
+import time
+from bisect import bisect_left
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel
 
+# Upper bounds of the latency histogram buckets, in nanoseconds (1µs..1s);
+# one more bucket catches everything slower
+LATENCY_BUCKETS_NS: Tuple[int, ...] = (
+    1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000,
+    1_000_000, 2_500_000, 5_000_000, 10_000_000, 25_000_000, 50_000_000,
+    100_000_000, 250_000_000, 500_000_000, 1_000_000_000
+)
+
+# Slots of the per-rule counter list; histogram buckets follow
+COUNT, TRUE, ERRORS, TOTAL_NS, MAX_NS, LAST_EVALUATED = range(6)
+FIRST_BUCKET = 6
+
 class RuleUsageStats(BaseModel):
     total_evaluations: int = 0
     avg_execution_time: float = 0
     true_results: int = 0
     false_results: int = 0
+    errors: int = 0
+    timed_evaluations: int = 0
+    total_time_ns: int = 0
+    max_time_ns: int = 0
+    latency_buckets: List[int] = []
     last_evaluated: datetime = None
 
+    def percentile(self, quantile: float) -> float:
+        # Latency in ms, interpolated within the bucket holding the quantile
+        timed = self.timed_evaluations
+        if not timed:
+            return 0
+        rank = quantile * timed
+        seen = 0
+        for index, count in enumerate(self.latency_buckets):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS_NS[index - 1] if index > 0 else 0
+                upper = LATENCY_BUCKETS_NS[index] if index < len(LATENCY_BUCKETS_NS) else self.max_time_ns
+                upper = min(upper, self.max_time_ns)
+                lower = min(lower, upper)
+                return (lower + (upper - lower) * (rank - seen) / count) / 1e6
+            seen += count
+        return self.max_time_ns / 1e6
+
 class RuleAnalyticsService:
-    def __init__(self):
-        self.usage_stats: Dict[str, RuleUsageStats] = {}
-        
-    def track_evaluation(self, rule_id: str, execution_time: float, result: bool):
-        if rule_id not in self.usage_stats:
-            self.usage_stats[rule_id] = RuleUsageStats()
-            
-        stats = self.usage_stats[rule_id]
-        stats.total_evaluations += 1
-        stats.avg_execution_time = (
-            (stats.avg_execution_time * (stats.total_evaluations - 1) +
-             execution_time) / stats.total_evaluations
+    # Evaluation counters and latency histograms per rule. Each thread updates
+    # its own shard without locking; reads merge all shards, so they may be a
+    # few evaluations behind but never block the evaluation path. Each worker
+    # process keeps its own shards.
+    #
+    # evaluate() counts every call but only times every sample_every-th one per
+    # rule and thread: reading the clock costs about as much as evaluating a
+    # small compiled rule. Latency figures come from the timed sample.
+    def __init__(self, sample_every: int = 1):
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self.sample_every = sample_every
+        self._local = threading.local()
+        self._shards: List[Dict[str, List[Any]]] = []
+        self._shards_lock = threading.Lock()
+
+    def _counters(self, rule_id: str) -> List[Any]:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        counters = shard.get(rule_id)
+        if counters is None:
+            counters = shard[rule_id] = [0] * (FIRST_BUCKET + len(LATENCY_BUCKETS_NS) + 1)
+        return counters
+
+    def evaluate(self, rule_id: str, function: Callable[..., bool], *args) -> bool:
+        try:
+            counters = self._local.shard[rule_id]
+        except (AttributeError, KeyError):
+            counters = self._counters(rule_id)
+        if counters[COUNT] % self.sample_every:
+            try:
+                result = function(*args)
+            except Exception:
+                counters[COUNT] += 1
+                counters[ERRORS] += 1
+                raise
+            counters[COUNT] += 1
+            if result:
+                counters[TRUE] += 1
+            return result
+
+        start = time.perf_counter_ns()
+        try:
+            result = function(*args)
+        except Exception:
+            self._record(counters, time.perf_counter_ns() - start, None)
+            raise
+        self._record(counters, time.perf_counter_ns() - start, result)
+        return result
+
+    def track_evaluation(self, rule_id: str, elapsed_ns: int, result: Optional[bool]):
+        # result None records an evaluation that raised
+        self._record(self._counters(rule_id), elapsed_ns, result)
+
+    @staticmethod
+    def _record(counters: List[Any], elapsed_ns: int, result: Optional[bool]):
+        counters[COUNT] += 1
+        if result is None:
+            counters[ERRORS] += 1
+        elif result:
+            counters[TRUE] += 1
+        counters[TOTAL_NS] += elapsed_ns
+        if elapsed_ns > counters[MAX_NS]:
+            counters[MAX_NS] = elapsed_ns
+        counters[LAST_EVALUATED] = time.time()
+        counters[FIRST_BUCKET + bisect_left(LATENCY_BUCKETS_NS, elapsed_ns)] += 1
+
+    def track_batch(self, rule_id: str, elapsed_ns: int, count: int, true_results: int, errors: int = 0):
+        # One timing for many records; the histogram gets the per-record mean
+        if count <= 0:
+            return
+        counters = self._counters(rule_id)
+        per_record = elapsed_ns // count
+        counters[COUNT] += count
+        counters[TRUE] += true_results
+        counters[ERRORS] += errors
+        counters[TOTAL_NS] += elapsed_ns
+        if per_record > counters[MAX_NS]:
+            counters[MAX_NS] = per_record
+        counters[LAST_EVALUATED] = time.time()
+        counters[FIRST_BUCKET + bisect_left(LATENCY_BUCKETS_NS, per_record)] += count
+
+    def _snapshot(self) -> Dict[str, List[Any]]:
+        with self._shards_lock:
+            shards = [shard.copy() for shard in self._shards]
+        merged: Dict[str, List[Any]] = {}
+        for shard in shards:
+            for rule_id, counters in shard.items():
+                counters = list(counters)
+                total = merged.get(rule_id)
+                if total is None:
+                    merged[rule_id] = counters
+                    continue
+                for slot, value in enumerate(counters):
+                    if slot in (MAX_NS, LAST_EVALUATED):
+                        total[slot] = max(total[slot], value)
+                    else:
+                        total[slot] += value
+        return merged
+
+    @staticmethod
+    def _to_stats(counters: Optional[List[Any]]) -> RuleUsageStats:
+        if counters is None:
+            return RuleUsageStats()
+        count = counters[COUNT]
+        timed = sum(counters[FIRST_BUCKET:])
+        return RuleUsageStats(
+            total_evaluations=count,
+            avg_execution_time=counters[TOTAL_NS] / timed / 1e6 if timed else 0,
+            true_results=counters[TRUE],
+            false_results=count - counters[TRUE] - counters[ERRORS],
+            errors=counters[ERRORS],
+            timed_evaluations=timed,
+            total_time_ns=counters[TOTAL_NS],
+            max_time_ns=counters[MAX_NS],
+            latency_buckets=counters[FIRST_BUCKET:],
+            last_evaluated=datetime.utcfromtimestamp(counters[LAST_EVALUATED]) if timed else None
         )
-        if result:
-            stats.true_results += 1
-        else:
-            stats.false_results += 1
-        stats.last_evaluated = datetime.utcnow()
-        
+
+    def get_usage_stats(self, rule_id: str) -> RuleUsageStats:
+        return self._to_stats(self._snapshot().get(rule_id))
+
+    def get_all_usage_stats(self) -> Dict[str, RuleUsageStats]:
+        return {rule_id: self._to_stats(counters) for rule_id, counters in self._snapshot().items()}
+
     def get_rule_analytics(self, rule_id: str) -> Dict[str, Any]:
-        stats = self.usage_stats.get(rule_id, RuleUsageStats())
-        
+        return self._analytics(self.get_usage_stats(rule_id))
+
+    def _analytics(self, stats: RuleUsageStats) -> Dict[str, Any]:
         return {
             "performance": {
-                "average_execution_time": round(stats.avg_execution_time, 2),
+                "average_execution_time": round(stats.avg_execution_time, 4),
                 "evaluation_count": stats.total_evaluations,
-                "success_rate": (stats.true_results / stats.total_evaluations 
-                               if stats.total_evaluations > 0 else 0)
+                "success_rate": (stats.true_results / stats.total_evaluations
+                               if stats.total_evaluations > 0 else 0),
+                "latency_ms": {
+                    "p50": round(stats.percentile(0.50), 4),
+                    "p95": round(stats.percentile(0.95), 4),
+                    "p99": round(stats.percentile(0.99), 4),
+                    "max": round(stats.max_time_ns / 1e6, 4)
+                }
             },
             "usage": {
                 "outcomes": [
                     {"name": "Successful", "value": stats.true_results},
-                    {"name": "Failed", "value": stats.false_results}
-                ]
+                    {"name": "Failed", "value": stats.false_results},
+                    {"name": "Errors", "value": stats.errors}
+                ],
+                "last_evaluated": stats.last_evaluated
             }
         }
-        
+
     def get_all_analytics(self) -> Dict[str, Dict[str, Any]]:
         return {
-            rule_id: self.get_rule_analytics(rule_id)
-            for rule_id in self.usage_stats
-        }
\ No newline at end of file
+            rule_id: self._analytics(stats)
+            for rule_id, stats in self.get_all_usage_stats().items()
+        }
+
+    def prometheus_metrics(self) -> str:
+        # Prometheus text exposition format (version 0.0.4)
+        lines = [
+            "# HELP rule_evaluations_total Rule evaluations by outcome.",
+            "# TYPE rule_evaluations_total counter"
+        ]
+        stats = self.get_all_usage_stats()
+        for rule_id, rule_stats in stats.items():
+            for result, value in (("true", rule_stats.true_results), ("false", rule_stats.false_results),
+                                  ("error", rule_stats.errors)):
+                lines.append(f'rule_evaluations_total{{rule_id="{rule_id}",result="{result}"}} {value}')
+        lines += [
+            "# HELP rule_evaluation_duration_seconds Rule evaluation latency.",
+            "# TYPE rule_evaluation_duration_seconds histogram"
+        ]
+        for rule_id, rule_stats in stats.items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_NS + (None,), rule_stats.latency_buckets):
+                cumulative += count
+                le = "+Inf" if bound is None else repr(bound / 1e9)
+                lines.append(f'rule_evaluation_duration_seconds_bucket{{rule_id="{rule_id}",le="{le}"}} {cumulative}')
+            lines.append(f'rule_evaluation_duration_seconds_sum{{rule_id="{rule_id}"}} {rule_stats.total_time_ns / 1e9}')
+            lines.append(f'rule_evaluation_duration_seconds_count{{rule_id="{rule_id}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.rule_engine import Node
+
+@dataclass
+class CachedRule:
+    ast: Node
+    expires_at: float
+
+class RuleCache:
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_size < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, int], CachedRule]" = OrderedDict()
+        # Latest cached version per rule, so lookups by id can skip the database
+        self._latest: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, rule_id: str, version: int) -> Optional[Node]:
+        with self._lock:
+            return self._get((rule_id, version))
+
+    def get_latest(self, rule_id: str) -> Optional[Tuple[int, Node]]:
+        with self._lock:
+            version = self._latest.get(rule_id)
+            if version is None:
+                self.misses += 1
+                return None
+            ast = self._get((rule_id, version))
+            return (version, ast) if ast is not None else None
+
+    def put(self, rule_id: str, version: int, ast: Node):
+        with self._lock:
+            key = (rule_id, version)
+            self._entries[key] = CachedRule(ast=ast, expires_at=self._clock() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            if version >= self._latest.get(rule_id, version):
+                self._latest[rule_id] = version
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+                self.evictions += 1
+
+    def invalidate(self, rule_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == rule_id]:
+                del self._entries[key]
+            self._latest.pop(rule_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups > 0 else 0
+            }
+
+    def _get(self, key: Tuple[str, int]) -> Optional[Node]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= self._clock():
+            del self._entries[key]
+            self._forget(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.ast
+
+    def _forget(self, key: Tuple[str, int]):
+        rule_id, version = key
+        if self._latest.get(rule_id) == version:
+            del self._latest[rule_id]
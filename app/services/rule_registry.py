@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from pydantic import BaseModel
+
+from app.rule_engine import CompiledRule, Node, compile_rule, parse_rules, validate_depth
+from app.ast_codec import AST_FORMAT_VERSION, deserialize_ast
+from app.rule_network import RuleNetwork
+from app.rule_index import RuleIndex
+from app.rule_optimizer import RuleOptimizer
+from app.services.rule_repository import RuleRepository
+
+logger = logging.getLogger(__name__)
+
+# Failed rules reported individually by the readiness endpoint
+MAX_REPORTED_ERRORS = 100
+
+@dataclass
+class RegisteredRule:
+    version: int
+    ast: Node
+    # Tree actually evaluated: the optimizer's rewrite of ast, or ast itself
+    optimized: Node
+    compiled: CompiledRule
+
+class WarmupStatus(BaseModel):
+    state: str = "pending"
+    loaded: int = 0
+    failed: int = 0
+    errors: Dict[str, str] = {}
+    elapsed_seconds: float = 0
+
+class RuleRegistry:
+    # In-memory set of all active rules, parsed and compiled, together with the
+    # shared-predicate network and candidate index built from them. Filled by
+    # warm_up() and kept current by the write endpoints. With an optimizer,
+    # rules are compiled and indexed in their optimized form.
+    def __init__(self, executor: Optional[Executor] = None, batch_size: int = 500, parse_chunk_size: int = 250,
+                 optimizer: Optional[RuleOptimizer] = None, executor_factory: Optional[Callable[[], Executor]] = None):
+        self.executor = executor
+        # Returns the executor to use when none is given, called only when
+        # there is enough to parse to need one (so it can create it lazily)
+        self.executor_factory = executor_factory
+        self.optimizer = optimizer
+        self.batch_size = batch_size
+        self.parse_chunk_size = parse_chunk_size
+        self.network = RuleNetwork()
+        self.index = RuleIndex()
+        self.status = WarmupStatus()
+        self._rules: Dict[str, RegisteredRule] = {}
+        self._lock = asyncio.Lock()
+        # Ids unregistered while a load is running, which the load must not
+        # register again from the documents it already read
+        self._loading = False
+        self._deleted: Set[str] = set()
+        # Bumped on every change, so snapshots of the rule set can tell they are stale
+        self.generation = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.status.state == "ready"
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __contains__(self, rule_id: str) -> bool:
+        return rule_id in self._rules
+
+    def rule_ids(self) -> List[str]:
+        return list(self._rules)
+
+    def get(self, rule_id: str) -> Optional[RegisteredRule]:
+        return self._rules.get(rule_id)
+
+    def optimized_rules(self) -> Dict[str, Node]:
+        return {rule_id: entry.optimized for rule_id, entry in self._rules.items()}
+
+    def register(self, rule_id: str, version: int, ast: Node) -> RegisteredRule:
+        current = self._rules.get(rule_id)
+        if current is not None and current.version >= version:
+            # Already current, or a newer version was registered meanwhile
+            return current
+        return self._add(rule_id, version, ast)
+
+    def reoptimize(self, rule_id: Optional[str] = None):
+        # Re-runs the optimizer, e.g. after its selectivity statistics changed
+        for current_id in [rule_id] if rule_id is not None else self.rule_ids():
+            current = self._rules.get(current_id)
+            if current is not None:
+                self._add(current_id, current.version, current.ast)
+
+    def _add(self, rule_id: str, version: int, ast: Node) -> RegisteredRule:
+        try:
+            # Stored ASTs are decoded without create_rule and its checks
+            validate_depth(ast)
+            optimized = self.optimizer.optimize(ast) if self.optimizer is not None else ast
+            entry = RegisteredRule(version=version, ast=ast, optimized=optimized, compiled=compile_rule(optimized))
+            self.network.add_rule(rule_id, optimized)
+            self.index.add_rule(rule_id, optimized)
+        except Exception:
+            # No earlier version, nor part of this one, stays registered
+            self.unregister(rule_id)
+            raise
+        self._rules[rule_id] = entry
+        self.generation += 1
+        return entry
+
+    def unregister(self, rule_id: str) -> bool:
+        if self._loading:
+            self._deleted.add(rule_id)
+        self.network.remove_rule(rule_id)
+        self.index.remove_rule(rule_id)
+        if self._rules.pop(rule_id, None) is None:
+            return False
+        self.generation += 1
+        return True
+
+    def clear(self):
+        self.network.clear()
+        self.index.clear()
+        self._rules.clear()
+        self.generation += 1
+        self.status = WarmupStatus()
+
+    async def ensure_loaded(self, repository: RuleRepository) -> "RuleRegistry":
+        # Concurrent callers wait for the warm-up already in progress
+        async with self._lock:
+            if not self.ready:
+                await self.warm_up(repository)
+        return self
+
+    async def reload(self, repository: RuleRepository):
+        # Full resync, e.g. after a change feed lost its history. Registered
+        # rules keep serving (and ready stays true) until the pass completes;
+        # rules that are no longer active are dropped afterwards.
+        async with self._lock:
+            status = WarmupStatus(state="loading")
+            seen = await self._load(repository, status)
+            for rule_id in [rule_id for rule_id in self.rule_ids() if rule_id not in seen]:
+                self.unregister(rule_id)
+            self.status = status
+
+    async def warm_up(self, repository: RuleRepository):
+        self.status = WarmupStatus(state="loading")
+        await self._load(repository, self.status)
+
+    async def _load(self, repository: RuleRepository, status: WarmupStatus) -> Set[str]:
+        seen: Set[str] = set()
+        start = time.perf_counter()
+        self._loading = True
+        try:
+            projection = {"rule_string": 1, "ast": 1, "version": 1}
+            async for batch in repository.iter_active(projection, batch_size=self.batch_size):
+                for rule, (ast, error) in zip(batch, await self._parse(batch)):
+                    if rule["_id"] in self._deleted:
+                        continue
+                    seen.add(rule["_id"])
+                    if error is None:
+                        # Any failure is this rule's alone; the others still load
+                        try:
+                            self.register(rule["_id"], rule.get("version", 1), ast)
+                            status.loaded += 1
+                            continue
+                        except Exception as e:
+                            error = str(e) or type(e).__name__
+                    status.failed += 1
+                    if len(status.errors) < MAX_REPORTED_ERRORS:
+                        status.errors[rule["_id"]] = error
+                    logger.warning(f"Skipping rule {rule['_id']} in warm-up: {error}")
+        except Exception:
+            status.state = "failed"
+            raise
+        finally:
+            self._loading = False
+            self._deleted.clear()
+            status.elapsed_seconds = time.perf_counter() - start
+        status.state = "ready"
+        logger.info(f"Rule registry warm-up: {status.loaded} loaded, {status.failed} failed "
+                    f"in {status.elapsed_seconds:.2f}s")
+        return seen
+
+    async def _parse(self, rules: List[Dict[str, Any]]) -> List[Tuple[Optional[Node], Optional[str]]]:
+        # Stored ASTs are decoded in place; only documents without one (or with
+        # an outdated one) have their rule_string parsed, on the executor.
+        parsed: List[Tuple[Optional[Node], Optional[str]]] = [(None, None)] * len(rules)
+        pending: List[int] = []
+        for position, rule in enumerate(rules):
+            encoded = rule.get("ast")
+            if isinstance(encoded, dict) and encoded.get("format") == AST_FORMAT_VERSION:
+                try:
+                    parsed[position] = (deserialize_ast(encoded), None)
+                    continue
+                except ValueError:
+                    pass
+            pending.append(position)
+
+        rule_strings = [rules[position].get("rule_string") or "" for position in pending]
+        for position, result in zip(pending, await self._parse_strings(rule_strings)):
+            parsed[position] = result
+        return parsed
+
+    async def _parse_strings(self, rule_strings: List[str]) -> List[Tuple[Optional[Node], Optional[str]]]:
+        chunks = [rule_strings[i:i + self.parse_chunk_size] for i in range(0, len(rule_strings), self.parse_chunk_size)]
+        if len(chunks) <= 1:
+            return parse_rules(rule_strings)
+        executor = self.executor
+        if executor is None and self.executor_factory is not None:
+            executor = self.executor_factory()
+        if executor is None:
+            return parse_rules(rule_strings)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(loop.run_in_executor(executor, parse_rules, chunk) for chunk in chunks))
+        return [parsed for chunk in results for parsed in chunk]
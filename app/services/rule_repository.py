@@ -0,0 +1,150 @@
+import base64
+import json
+import re
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from app.database import AsyncChangeStream, AsyncCollection
+
+# Orderings rules can be paged by; _id breaks ties so every position is unique
+PAGE_SORTS = {
+    "id": [("_id", 1)],
+    "updated_at": [("updated_at", 1), ("_id", 1)],
+}
+
+def encode_cursor(sort: str, document: Dict[str, Any]) -> str:
+    # Opaque token holding the sort keys of the last document on a page
+    position = [sort, str(document["_id"])]
+    if sort == "updated_at":
+        position.append(document["updated_at"].isoformat())
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[ObjectId, Optional[datetime]]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if position[0] != sort:
+            raise ValueError("Cursor was issued for a different sort order")
+        updated_at = datetime.fromisoformat(position[2]) if sort == "updated_at" else None
+        return ObjectId(position[1]), updated_at
+    except (ValueError, TypeError, IndexError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+def rule_filter(active: Optional[bool] = None, name_prefix: Optional[str] = None) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if active is not None:
+        query["active"] = active
+    if name_prefix:
+        # Anchored, case-sensitive prefix regexes can use the name index
+        query["name"] = {"$regex": "^" + re.escape(name_prefix)}
+    return query
+
+class RuleRepository:
+    # All rule persistence goes through here so routes never touch the
+    # collection directly. Returned documents have their _id as a string.
+    def __init__(self, collection: AsyncCollection):
+        self.collection = collection
+
+    @staticmethod
+    def _to_rule(document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if document is not None and "_id" in document:
+            document["_id"] = str(document["_id"])
+        return document
+
+    async def get(self, rule_id: str, projection: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        # Raises bson.errors.InvalidId for malformed ids
+        return self._to_rule(await self.collection.find_one({"_id": ObjectId(rule_id)}, projection))
+
+    async def get_many(self, rule_ids: List[str], projection: Optional[Any] = None) -> List[Dict[str, Any]]:
+        object_ids = [ObjectId(rule_id) for rule_id in rule_ids]
+        documents = await self.collection.find_list({"_id": {"$in": object_ids}}, projection)
+        by_id = {str(document["_id"]): self._to_rule(document) for document in documents}
+        return [by_id[rule_id] for rule_id in rule_ids if rule_id in by_id]
+
+    async def list_rules(self) -> List[Dict[str, Any]]:
+        return [self._to_rule(document) for document in await self.collection.find_list()]
+
+    async def list_page(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None, limit: int = 100,
+                        sort: str = "id", cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # Keyset pagination: each page starts strictly after the cursor's
+        # position, so deep pages cost the same as the first. Returns the page
+        # and the cursor for the next one (None on the last page).
+        if cursor is not None:
+            after_id, after_updated = decode_cursor(cursor, sort)
+            if sort == "updated_at":
+                after = {"$or": [{"updated_at": {"$gt": after_updated}},
+                                 {"updated_at": after_updated, "_id": {"$gt": after_id}}]}
+            else:
+                after = {"_id": {"$gt": after_id}}
+            query = {"$and": [query, after]} if query else after
+        if projection is not None:
+            # The sort keys are needed to build the next cursor
+            projection = {**projection, **{key: 1 for key, _ in PAGE_SORTS[sort]}}
+        # One extra document tells whether another page follows
+        documents = await self.collection.find_list(query, projection, sort=PAGE_SORTS[sort], limit=limit + 1)
+        next_cursor = encode_cursor(sort, documents[limit - 1]) if len(documents) > limit else None
+        return [self._to_rule(document) for document in documents[:limit]], next_cursor
+
+    async def iter_rules(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None,
+                         batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        async for batch in self.collection.find_batches(query, projection, batch_size=batch_size, sort=[("_id", 1)]):
+            yield [self._to_rule(document) for document in batch]
+
+    async def iter_active(self, projection: Optional[Any] = None, batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        async for batch in self.collection.find_batches({"active": True}, projection, batch_size=batch_size):
+            yield [self._to_rule(document) for document in batch]
+
+    async def changed_since(self, since: datetime, projection: Optional[Any] = None) -> List[Dict[str, Any]]:
+        # Active and inactive rules alike, so deactivations are seen too
+        documents = await self.collection.find_list({"updated_at": {"$gte": since}}, projection, sort=[("updated_at", 1)])
+        return [self._to_rule(document) for document in documents]
+
+    async def active_ids(self) -> Set[str]:
+        return {str(document["_id"]) for document in await self.collection.find_list({"active": True}, {"_id": 1})}
+
+    async def watch(self, resume_after: Optional[Dict[str, Any]] = None, max_await_time_ms: int = 1000) -> AsyncChangeStream:
+        # Raises OperationFailure when the server does not support change streams
+        return await self.collection.watch(full_document="updateLookup", resume_after=resume_after,
+                                           max_await_time_ms=max_await_time_ms)
+
+    async def create_indexes(self):
+        # (updated_at, _id) also serves the updated_at range scans of rule sync
+        await self.collection.create_index([("updated_at", 1), ("_id", 1)])
+        await self.collection.create_index([("active", 1), ("_id", 1)])
+        await self.collection.create_index([("name", 1), ("_id", 1)])
+
+    async def insert(self, rule_doc: Dict[str, Any]) -> Dict[str, Any]:
+        result = await self.collection.insert_one(rule_doc)
+        rule_doc["_id"] = str(result.inserted_id)
+        return rule_doc
+
+    async def insert_many(self, rule_docs: List[Dict[str, Any]]) -> Dict[int, str]:
+        # Unordered insert; returns write errors by position. pymongo assigns _id
+        # to every document up front, so nothing has to be read back.
+        failed: Dict[int, str] = {}
+        if not rule_docs:
+            return failed
+        try:
+            await self.collection.insert_many(rule_docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = error.get("errmsg", "Insert failed")
+        for rule_doc in rule_docs:
+            rule_doc["_id"] = str(rule_doc["_id"])
+        return failed
+
+    async def update(self, rule_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Sets the given fields and bumps the version in a single round trip
+        document = await self.collection.find_one_and_update(
+            {"_id": ObjectId(rule_id)},
+            {"$set": update_data, "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._to_rule(document)
+
+    async def delete(self, rule_id: str) -> bool:
+        result = await self.collection.delete_one({"_id": ObjectId(rule_id)})
+        return result.deleted_count > 0
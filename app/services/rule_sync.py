@@ -0,0 +1,199 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.ast_codec import ast_from_document
+from app.database import AsyncChangeStream
+from app.services.rule_registry import RuleRegistry
+from app.services.rule_repository import RuleRepository
+
+logger = logging.getLogger(__name__)
+
+CHANGE_STREAM_HISTORY_LOST = 286
+INVALIDATING_EVENTS = ("invalidate", "drop", "rename", "dropDatabase")
+SYNC_PROJECTION = {"rule_string": 1, "ast": 1, "version": 1, "active": 1, "updated_at": 1}
+
+class RuleSync:
+    # Keeps a worker's rule registry in step with writes made by other workers.
+    # Follows the collection's change stream when the server supports it
+    # (replica sets and sharded clusters); otherwise polls for documents whose
+    # updated_at moved, and periodically reconciles ids to catch deletes.
+    # Either way only the rules that changed are re-parsed.
+    def __init__(self, registry: RuleRegistry, repository: RuleRepository,
+                 on_change: Optional[Callable[[str], None]] = None, mode: str = "auto",
+                 poll_interval: float = 5.0, poll_overlap: float = 5.0, reconcile_every: int = 12,
+                 retry_interval: float = 1.0, idle_interval: float = 0.1):
+        if mode not in ("auto", "change_stream", "poll", "off"):
+            raise ValueError(f"Unknown rule sync mode: {mode}")
+        self.registry = registry
+        self.repository = repository
+        self.on_change = on_change
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.poll_overlap = timedelta(seconds=poll_overlap)
+        self.reconcile_every = reconcile_every
+        self.retry_interval = retry_interval
+        self.idle_interval = idle_interval
+        self.active_mode: Optional[str] = None
+        self.applied = 0
+        self.skipped = 0
+        self.failed = 0
+        self.resyncs = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.active_mode,
+            "applied": self.applied,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "resyncs": self.resyncs
+        }
+
+    async def run(self):
+        # Warms the registry up itself: the change stream is opened (or the
+        # poll watermark taken) first, so nothing written during the warm-up
+        # is missed. Runs until cancelled unless the mode is "off".
+        if self.mode == "off":
+            await self.registry.ensure_loaded(self.repository)
+            return
+
+        stream = None
+        if self.mode != "poll":
+            try:
+                stream = await self.repository.watch()
+            except (OperationFailure, NotImplementedError) as e:
+                if self.mode == "change_stream":
+                    raise
+                logger.info(f"Change streams unavailable, polling for rule changes: {str(e)}")
+
+        if stream is not None:
+            self.active_mode = "change_stream"
+            await self.registry.ensure_loaded(self.repository)
+            await self._follow(stream)
+        else:
+            self.active_mode = "poll"
+            await self.repository.create_indexes()
+            since = datetime.utcnow()
+            await self.registry.ensure_loaded(self.repository)
+            await self._poll(since)
+
+    async def _follow(self, stream: AsyncChangeStream):
+        while True:
+            try:
+                event = await stream.try_next()
+            except PyMongoError as e:
+                logger.warning(f"Rule change stream interrupted, reopening: {str(e)}")
+                lost = isinstance(e, OperationFailure) and e.code == CHANGE_STREAM_HISTORY_LOST
+                stream = await self._reopen(stream, None if lost else stream.resume_token)
+                continue
+            if event is None:
+                if not stream.alive:
+                    stream = await self._reopen(stream, None)
+                else:
+                    # The server already waited max_await_time_ms; this only
+                    # keeps backends that return immediately from spinning
+                    await asyncio.sleep(self.idle_interval)
+                continue
+            if event["operationType"] in INVALIDATING_EVENTS:
+                logger.warning(f"Rule change stream invalidated by {event['operationType']}, resyncing")
+                stream = await self._reopen(stream, None)
+                continue
+            self._apply_event(event)
+
+    async def _reopen(self, stream: AsyncChangeStream, resume_token: Optional[Dict[str, Any]]) -> AsyncChangeStream:
+        try:
+            await stream.close()
+        except PyMongoError:
+            pass
+        while True:
+            try:
+                if resume_token is not None:
+                    try:
+                        return await self.repository.watch(resume_after=resume_token)
+                    except OperationFailure as e:
+                        logger.warning(f"Cannot resume rule change stream: {str(e)}")
+                        resume_token = None
+                # Changes may have been missed: open a fresh stream, then resync
+                stream = await self.repository.watch()
+                await self.resync()
+                return stream
+            except PyMongoError as e:
+                logger.warning(f"Reopening rule change stream failed: {str(e)}")
+                await asyncio.sleep(self.retry_interval)
+
+    def _apply_event(self, event: Dict[str, Any]):
+        rule_id = str(event["documentKey"]["_id"])
+        if event["operationType"] == "delete":
+            self._remove(rule_id)
+            return
+        document = event.get("fullDocument")
+        if document is None:
+            # Deleted again before the event was read; its delete event follows
+            self._remove(rule_id)
+            return
+        document["_id"] = rule_id
+        self.apply_document(document)
+
+    def apply_document(self, document: Dict[str, Any]):
+        rule_id = document["_id"]
+        if not document.get("active", True):
+            self._remove(rule_id)
+            return
+        current = self.registry.get(rule_id)
+        if current is not None and current.version >= document.get("version", 1):
+            # Already applied, typically a write made by this worker
+            self.skipped += 1
+            return
+        try:
+            self.registry.register(rule_id, document.get("version", 1), ast_from_document(document))
+        except Exception as e:
+            # One bad rule must not end the sync task, or this worker would
+            # silently stop following rule changes
+            logger.warning(f"Dropping rule {rule_id} from registry: {str(e) or type(e).__name__}")
+            self.registry.unregister(rule_id)
+            self.failed += 1
+        self._changed(rule_id)
+
+    def _remove(self, rule_id: str):
+        if self.registry.unregister(rule_id):
+            self._changed(rule_id)
+        else:
+            self.skipped += 1
+
+    def _changed(self, rule_id: str):
+        self.applied += 1
+        if self.on_change is not None:
+            self.on_change(rule_id)
+
+    async def poll_once(self, since: datetime) -> datetime:
+        # Returns the next watermark. Re-reading an overlap window tolerates
+        # clock skew between writers; unchanged versions are skipped cheaply.
+        documents = await self.repository.changed_since(since - self.poll_overlap, SYNC_PROJECTION)
+        for document in documents:
+            self.apply_document(document)
+        if documents:
+            since = max(since, documents[-1]["updated_at"])
+        return since
+
+    async def reconcile(self):
+        active = await self.repository.active_ids()
+        for rule_id in [rule_id for rule_id in self.registry.rule_ids() if rule_id not in active]:
+            self._remove(rule_id)
+
+    async def resync(self):
+        self.resyncs += 1
+        await self.registry.reload(self.repository)
+
+    async def _poll(self, since: datetime):
+        polls = 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                since = await self.poll_once(since)
+                polls += 1
+                if polls % self.reconcile_every == 0:
+                    await self.reconcile()
+            except PyMongoError as e:
+                logger.warning(f"Polling for rule changes failed: {str(e)}")
@@ -0,0 +1,110 @@
+import argparse
+import os
+import random
+import time
+import timeit
+
+from app.rule_engine import compile_rule, create_rule, evaluate_rule
+from app.services.rule_analytics import RuleAnalyticsService
+from benchmarks.bench_compiler import build_records, build_rule
+
+def compare(plain, tracked, repeat: int):
+    # Interleaved so that clock-speed drift affects both sides alike
+    plain_times, tracked_times = [], []
+    for _ in range(repeat):
+        plain_times.append(timeit.timeit(plain, number=1))
+        tracked_times.append(timeit.timeit(tracked, number=1))
+    return min(plain_times), min(tracked_times)
+
+def run(depth: int, records_per_run: int, chunk_size: int, sample_every: int, repeat: int, seed: int):
+    rng = random.Random(seed)
+    records = build_records(records_per_run, rng)
+    ast = create_rule(build_rule(depth, rng))
+    compiled = compile_rule(ast)
+    analytics = RuleAnalyticsService()
+    sampled = RuleAnalyticsService(sample_every=sample_every)
+    clock = time.perf_counter_ns
+
+    def single_plain():
+        for record in records:
+            evaluate_rule(ast, record)
+
+    def single_tracked():
+        # As in POST /rules/evaluate/{rule_id}
+        for record in records:
+            analytics.evaluate("r1", evaluate_rule, ast, record)
+
+    def single_sampled():
+        for record in records:
+            sampled.evaluate("r1", evaluate_rule, ast, record)
+
+    def stream_plain():
+        for offset in range(0, len(records), chunk_size):
+            for record in records[offset:offset + chunk_size]:
+                compiled(record)
+
+    def stream_tracked():
+        # As in the NDJSON stream endpoint: one timing per chunk
+        for offset in range(0, len(records), chunk_size):
+            start = clock()
+            chunk = records[offset:offset + chunk_size]
+            matched = 0
+            for record in chunk:
+                matched += compiled(record)
+            analytics.track_batch("r1", clock() - start, len(chunk), matched)
+
+    print(f"{records_per_run} records, rule depth {depth}")
+    for name, plain, tracked in (("per evaluation", single_plain, single_tracked),
+                                 (f"1 in {sample_every} timed", single_plain, single_sampled),
+                                 (f"per chunk of {chunk_size}", stream_plain, stream_tracked)):
+        baseline, measured = compare(plain, tracked, repeat)
+        print(f"  {name:<20} {records_per_run / baseline:>12,.0f} rec/s -> {records_per_run / measured:>12,.0f} rec/s "
+              f"({(measured / baseline - 1) * 100:+.1f}% time)")
+    print(f"  p50/p95/p99: {analytics.get_rule_analytics('r1')['performance']['latency_ms']}")
+
+def run_endpoint(requests: int, repeat: int):
+    # Overhead on POST /api/rules/evaluate/{rule_id}, the path that tracks
+    # every evaluation, against the same endpoint with tracking stubbed out
+    os.environ.setdefault("MONGODB_URL", "memory://")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routes import api
+
+    client = TestClient(app)
+    rule_id = client.post("/api/rules/", json={
+        "name": "bench", "description": "", "rule_string": "(age > 30 AND salary > 10) OR experience < 5"
+    }).json()["_id"]
+    body = {"data": {"age": 40, "salary": 50, "experience": 2}}
+
+    def requests_loop():
+        for _ in range(requests):
+            client.post(f"/api/rules/evaluate/{rule_id}", json=body)
+
+    service = api.rule_analytics
+    untracked_service = type("Untracked", (), {"evaluate": staticmethod(lambda rule_id, function, *args: function(*args))})()
+
+    def untracked_loop():
+        api.rule_analytics = untracked_service
+        try:
+            requests_loop()
+        finally:
+            api.rule_analytics = service
+
+    requests_loop()
+    untracked, tracked = compare(untracked_loop, requests_loop, repeat)
+    print(f"{requests} requests to POST /api/rules/evaluate/{{rule_id}}")
+    print(f"  {requests / untracked:>8,.0f} req/s untracked -> {requests / tracked:>8,.0f} req/s tracked "
+          f"({(tracked / untracked - 1) * 100:+.1f}% time)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overhead of evaluation metrics on the evaluation path")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--sample-every", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.depth, args.records, args.chunk_size, args.sample_every, args.repeat, args.seed)
+    run_endpoint(args.requests, args.repeat)
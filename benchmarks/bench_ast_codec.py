@@ -0,0 +1,26 @@
+import argparse
+import random
+import timeit
+
+from app.rule_engine import create_rule
+from app.ast_codec import serialize_ast, deserialize_ast
+from benchmarks.bench_compiler import build_rule
+
+def run(depths, repeat: int, number: int, seed: int):
+    rng = random.Random(seed)
+    print(f"{'depth':>5} {'parse us':>10} {'decode us':>10} {'speedup':>8}")
+    for depth in depths:
+        rule_string = build_rule(depth, rng)
+        encoded = serialize_ast(create_rule(rule_string))
+        parse = min(timeit.repeat(lambda: create_rule(rule_string), number=number, repeat=repeat)) / number
+        decode = min(timeit.repeat(lambda: deserialize_ast(encoded), number=number, repeat=repeat)) / number
+        print(f"{depth:>5} {parse * 1e6:>10.1f} {decode * 1e6:>10.1f} {parse / decode:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule load cost: parsing rule_string vs decoding the stored AST")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 3, 5, 7, 9])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.depths, args.repeat, args.number, args.seed)
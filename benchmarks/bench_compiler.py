@@ -0,0 +1,43 @@
+import argparse
+import random
+import timeit
+
+from app.rule_engine import RuleEvaluator, compile_rule, create_rule
+
+COMPARISONS = [
+    "age > {}", "age < {}", "salary >= {}", "experience <= {}", "spend > {}", "income != {}",
+]
+
+def build_rule(depth: int, rng: random.Random) -> str:
+    if depth == 0:
+        return rng.choice(COMPARISONS).format(rng.randint(0, 100))
+    operator = "AND" if depth % 2 else "OR"
+    return f"({build_rule(depth - 1, rng)} {operator} {build_rule(depth - 1, rng)})"
+
+def build_records(count: int, rng: random.Random) -> list:
+    return [
+        {field: rng.randint(0, 100) for field in ("age", "salary", "experience", "spend", "income")}
+        for _ in range(count)
+    ]
+
+def run(depths, records_per_run: int, repeat: int, seed: int):
+    rng = random.Random(seed)
+    records = build_records(records_per_run, rng)
+    evaluator = RuleEvaluator()
+    print(f"{'depth':>5} {'tree-walk rec/s':>16} {'compiled rec/s':>15} {'speedup':>8}")
+    for depth in depths:
+        ast = create_rule(build_rule(depth, rng))
+        compiled = compile_rule(ast)
+        tree_walk = min(timeit.repeat(lambda: [evaluator.evaluate(ast, r) for r in records], number=1, repeat=repeat))
+        closures = min(timeit.repeat(lambda: [compiled(r) for r in records], number=1, repeat=repeat))
+        print(f"{depth:>5} {records_per_run / tree_walk:>16,.0f} {records_per_run / closures:>15,.0f} "
+              f"{tree_walk / closures:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tree-walk vs compiled rule evaluation throughput")
+    parser.add_argument("--depths", type=int, nargs="+", default=[2, 4, 6, 8, 10])
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.depths, args.records, args.repeat, args.seed)
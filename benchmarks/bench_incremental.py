@@ -0,0 +1,63 @@
+import argparse
+import random
+import time
+
+from app.rule_engine import RuleParser
+from app.incremental_evaluator import EvaluationSession
+from app.rule_network import RuleNetwork
+
+def build_rule(depth: int, fields: list, rng: random.Random) -> str:
+    if depth == 0:
+        return f"{rng.choice(fields)} {rng.choice(['>', '<', '>=', '<=', '!='])} {rng.randint(0, 100)}"
+    operator = "AND" if depth % 2 else "OR"
+    return f"({build_rule(depth - 1, fields, rng)} {operator} {build_rule(depth - 1, fields, rng)})"
+
+def run(rule_count: int, depth: int, field_count: int, key_count: int, updates: int, changes: list,
+        repeat: int, seed: int):
+    rng = random.Random(seed)
+    fields = [f"attr{i}" for i in range(field_count)]
+    # Parsed without attribute validation: the synthetic fields are not in VALID_ATTRIBUTES
+    parser = RuleParser()
+    rules = {f"rule{i}": parser.parse(build_rule(depth, fields, rng)) for i in range(rule_count)}
+    network = RuleNetwork()
+    for rule_id, node in rules.items():
+        network.add_rule(rule_id, node)
+    records = [{name: rng.randint(0, 100) for name in fields} for _ in range(key_count)]
+    print(f"{rule_count} rules of depth {depth} over {field_count} fields, {key_count} record keys, "
+          f"{updates} updates per run")
+    print(f"{'fields changed':>14} {'full upd/s':>11} {'delta upd/s':>12} {'speedup':>8} {'nodes/upd':>10}")
+    for changed in changes:
+        session = EvaluationSession(rules, max_keys=key_count)
+        for key, record in enumerate(records):
+            session.evaluate(str(key), record)
+        deltas = [(rng.randrange(key_count), {name: rng.randint(0, 100) for name in rng.sample(fields, changed)})
+                  for _ in range(updates)]
+        full, delta, nodes = [], [], 0
+        # Interleaved so both sides see the same machine load
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for key, values in deltas:
+                records[key].update(values)
+                network.evaluate(records[key])
+            full.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            nodes = 0
+            for key, values in deltas:
+                nodes += session.apply_delta(str(key), values).evaluated_nodes
+            delta.append(time.perf_counter() - start)
+        full_rate, delta_rate = updates / min(full), updates / min(delta)
+        print(f"{changed:>14} {full_rate:>11,.0f} {delta_rate:>12,.0f} {delta_rate / full_rate:>7.2f}x "
+              f"{nodes / updates:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full re-evaluation vs incremental session deltas by number of changed fields")
+    parser.add_argument("--rules", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fields", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--changes", type=int, nargs="+", default=[1, 2, 5, 10, 25])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.rules, args.depth, args.fields, args.keys, args.updates, args.changes, args.repeat, args.seed)
@@ -0,0 +1,87 @@
+import argparse
+import gc
+import random
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.rule_engine import NodeType, combine_rules, create_rule, interned_node_count
+from benchmarks.bench_compiler import build_rule
+
+@dataclass
+class DataclassNode:
+    # The former Node: one object with a __dict__ per occurrence, nothing shared
+    type: Any
+    value: Optional[Any] = None
+    field: Optional[str] = None
+    operator: Optional[Any] = None
+    left: Optional["DataclassNode"] = None
+    right: Optional["DataclassNode"] = None
+
+def as_dataclass(root):
+    # Post-order copy; every occurrence becomes its own object, as parsing used to produce
+    stack, built = [(root, False)], []
+    while stack:
+        node, expanded = stack.pop()
+        if node.type == NodeType.OPERATOR and not expanded:
+            stack += [(node, True), (node.right, False), (node.left, False)]
+        elif node.type == NodeType.OPERATOR:
+            right, left = built.pop(), built.pop()
+            built.append(DataclassNode(node.type, operator=node.operator, left=left, right=right))
+        else:
+            built.append(DataclassNode(node.type, node.value, node.field, node.operator))
+    return built.pop()
+
+def count_nodes(root) -> int:
+    count, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if node.left is not None:
+            stack += [node.left, node.right]
+    return count
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    kept = load()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, size
+
+def run(rule_count: int, depth: int, combined_count: int, combine_width: int, seed: int):
+    rng = random.Random(seed)
+    rule_strings = [build_rule(depth, rng) for _ in range(rule_count)]
+    groups = [rng.sample(rule_strings, combine_width) for _ in range(combined_count)]
+
+    def load_interned():
+        rules = [create_rule(rule) for rule in rule_strings]
+        return rules, [combine_rules(group) for group in groups]
+
+    def load_dataclass():
+        rules = [as_dataclass(create_rule(rule)) for rule in rule_strings]
+        return rules, [as_dataclass(combine_rules(group)) for group in groups]
+
+    (rules, combined), interned_bytes = measure(load_interned)
+    occurrences = sum(count_nodes(rule) for rule in rules + combined)
+    unique = interned_node_count()
+    del rules, combined
+    _, dataclass_bytes = measure(load_dataclass)
+
+    print(f"{rule_count:,} rules of depth {depth} + {combined_count:,} combined rules of {combine_width} rules each")
+    print(f"{occurrences:,} node occurrences, {unique:,} distinct nodes after hash-consing")
+    print(f"{'representation':>16} {'MB':>9} {'bytes/rule':>11}")
+    for name, size in (("dataclass", dataclass_bytes), ("hash-consed", interned_bytes)):
+        print(f"{name:>16} {size / 1e6:>9.1f} {size / (rule_count + combined_count):>11.0f}")
+    print(f"memory saved: {1 - interned_bytes / dataclass_bytes:.0%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory held by loaded rule ASTs: per-occurrence dataclass nodes vs hash-consed nodes")
+    parser.add_argument("--rules", type=int, default=100000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--combined", type=int, default=1000)
+    parser.add_argument("--combine-width", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.rules, args.depth, args.combined, args.combine_width, args.seed)
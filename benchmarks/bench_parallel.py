@@ -0,0 +1,43 @@
+import argparse
+import os
+import random
+import time
+
+from app.rule_engine import create_rule
+from app.parallel_evaluator import ParallelRuleEvaluator
+from benchmarks.bench_compiler import build_records, build_rule
+
+def run(rule_count: int, depth: int, record_count: int, max_workers: int, chunk_size: int, repeat: int, seed: int):
+    rng = random.Random(seed)
+    rules = {f"rule{i}": create_rule(build_rule(depth, rng)) for i in range(rule_count)}
+    records = build_records(record_count, rng)
+    print(f"{rule_count} rules of depth {depth}, {record_count} records, chunks of at most {chunk_size}")
+    print(f"{'workers':>7} {'startup s':>10} {'rec/s':>12} {'speedup':>8} {'efficiency':>10}")
+    baseline = None
+    for workers in range(1, max_workers + 1):
+        with ParallelRuleEvaluator(rules, workers=workers, chunk_size=chunk_size) as evaluator:
+            # The first call spawns the workers and ships the rules to them
+            start = time.perf_counter()
+            evaluator.evaluate(records[:chunk_size * workers + 1])
+            startup = time.perf_counter() - start
+            elapsed = min(_timed(evaluator, records) for _ in range(repeat))
+        rate = record_count / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>7} {startup:>10.2f} {rate:>12,.0f} {rate / baseline:>7.2f}x {rate / baseline / workers:>9.0%}")
+
+def _timed(evaluator: ParallelRuleEvaluator, records) -> float:
+    start = time.perf_counter()
+    evaluator.evaluate(records)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel batch evaluation throughput from 1 to N worker processes")
+    parser.add_argument("--rules", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.rules, args.depth, args.records, args.workers, args.chunk_size, args.repeat, args.seed)
@@ -0,0 +1,61 @@
+import argparse
+import random
+import timeit
+
+from app.rule_engine import RuleParser, create_rule, validate_depth
+from benchmarks.bench_compiler import COMPARISONS
+
+def build_flat_rule(clauses: int, rng: random.Random) -> str:
+    # clauses comparisons joined by a random mix of AND/OR, no parentheses
+    parts = [rng.choice(COMPARISONS).format(rng.randint(0, 100))]
+    for _ in range(clauses - 1):
+        parts.append(rng.choice(("AND", "OR")))
+        parts.append(rng.choice(COMPARISONS).format(rng.randint(0, 100)))
+    return " ".join(parts)
+
+def build_nested_rule(depth: int, rng: random.Random) -> str:
+    # Right-nested: a AND (b OR (c AND (...)))
+    rule = rng.choice(COMPARISONS).format(rng.randint(0, 100))
+    for level in range(depth):
+        comparison = rng.choice(COMPARISONS).format(rng.randint(0, 100))
+        rule = f"{comparison} {'AND' if level % 2 else 'OR'} ({rule})"
+    return rule
+
+def measure(rule_string: str, repeat: int, number: int):
+    parser = RuleParser()
+    tokenize = min(timeit.repeat(lambda: parser.tokenize(rule_string), number=number, repeat=repeat)) / number
+    parse = min(timeit.repeat(lambda: parser.parse(rule_string), number=number, repeat=repeat)) / number
+    # create_rule rejects rules deeper than MAX_RULE_DEPTH; the parser does not
+    try:
+        validate_depth(parser.parse(rule_string))
+    except ValueError:
+        return tokenize, parse, None
+    create = min(timeit.repeat(lambda: create_rule(rule_string), number=number, repeat=repeat)) / number
+    return tokenize, parse, create
+
+def format_create(create) -> str:
+    return f"{create * 1e6:>10.1f}" if create is not None else f"{'too deep':>10}"
+
+def run(sizes, depths, repeat: int, number: int, seed: int):
+    rng = random.Random(seed)
+    print(f"{'clauses':>8} {'tokenize us':>12} {'parse us':>10} {'create us':>10} {'us/clause':>10}")
+    for clauses in sizes:
+        tokenize, parse, create = measure(build_flat_rule(clauses, rng), repeat, number)
+        print(f"{clauses:>8} {tokenize * 1e6:>12.1f} {parse * 1e6:>10.1f} {format_create(create)} "
+              f"{parse * 1e6 / clauses:>10.2f}")
+    print()
+    print(f"{'depth':>8} {'tokenize us':>12} {'parse us':>10} {'create us':>10} {'us/level':>10}")
+    for depth in depths:
+        tokenize, parse, create = measure(build_nested_rule(depth, rng), repeat, number)
+        print(f"{depth:>8} {tokenize * 1e6:>12.1f} {parse * 1e6:>10.1f} {format_create(create)} "
+              f"{parse * 1e6 / (depth + 1):>10.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule parse time by rule size and nesting depth")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 1000, 5000])
+    parser.add_argument("--depths", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.depths, args.repeat, args.number, args.seed)
@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database import AsyncCollection
+from app.memory_db import InMemoryCollection
+from app.services.rule_repository import RuleRepository
+
+class SlowCollection(InMemoryCollection):
+    # Simulates network round-trip latency of a remote MongoDB server
+    def __init__(self, name: str, latency: float):
+        super().__init__(name)
+        self.latency = latency
+
+    def find_one(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().find_one(*args, **kwargs)
+
+async def blocking_lookups(collection: SlowCollection, rule_ids: list, concurrency: int) -> float:
+    # Calls the collection directly from the event loop, as the routes used to
+    async def lookup(rule_id):
+        return collection.find_one({"_id": rule_id})
+    start = time.perf_counter()
+    for offset in range(0, len(rule_ids), concurrency):
+        await asyncio.gather(*(lookup(rule_id) for rule_id in rule_ids[offset:offset + concurrency]))
+    return time.perf_counter() - start
+
+async def executor_lookups(repository: RuleRepository, rule_ids: list, concurrency: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(rule_ids), concurrency):
+        await asyncio.gather(*(repository.get(str(rule_id)) for rule_id in rule_ids[offset:offset + concurrency]))
+    return time.perf_counter() - start
+
+async def run(requests: int, concurrency: int, latency: float, workers: int):
+    collection = SlowCollection("rules", latency)
+    repository = RuleRepository(AsyncCollection(collection, ThreadPoolExecutor(max_workers=workers)))
+    rule_ids = []
+    for i in range(min(requests, 100)):
+        result = collection.insert_one({"name": f"rule{i}", "rule_string": "age > 30", "version": 1, "active": True})
+        rule_ids.append(result.inserted_id)
+    rule_ids = (rule_ids * (requests // len(rule_ids) + 1))[:requests]
+
+    blocking = await blocking_lookups(collection, rule_ids, concurrency)
+    pooled = await executor_lookups(repository, rule_ids, concurrency)
+    print(f"{requests} lookups, concurrency {concurrency}, latency {latency * 1000:.1f} ms, {workers} workers")
+    print(f"  blocking in event loop: {requests / blocking:>10,.0f} req/s")
+    print(f"  executor-backed:        {requests / pooled:>10,.0f} req/s ({blocking / pooled:.1f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule lookup throughput: blocking vs executor-backed data access")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.001)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency, args.workers))
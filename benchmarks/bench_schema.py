@@ -0,0 +1,45 @@
+import argparse
+import random
+import timeit
+
+from app.record_schema import record_schema
+from app.rule_engine import compile_rule, create_rule
+from benchmarks.bench_compiler import build_records, build_rule
+
+def run(rule_count: int, depth: int, records_per_run: int, repeat: int, seed: int):
+    rng = random.Random(seed)
+    records = build_records(records_per_run, rng)
+    asts = [create_rule(build_rule(depth, rng)) for _ in range(rule_count)]
+    compiled = [compile_rule(ast) for ast in asts]
+    slot_rules = [record_schema.compile(ast) for ast in asts]
+    rows = [record_schema.decode(record) for record in records]
+
+    def on_dicts():
+        for rule in compiled:
+            for record in records:
+                rule(record)
+
+    def on_rows():
+        for rule in slot_rules:
+            for row in rows:
+                rule(row)
+
+    decode = min(timeit.repeat(lambda: [record_schema.decode(record) for record in records], number=1, repeat=repeat))
+    dicts = min(timeit.repeat(on_dicts, number=1, repeat=repeat))
+    slots = min(timeit.repeat(on_rows, number=1, repeat=repeat))
+    evaluations = rule_count * records_per_run
+    print(f"{rule_count} rules of depth {depth} over {records_per_run:,} records")
+    print(f"{'compiled on dicts':>22} {evaluations / dicts:>12,.0f} evaluations/s")
+    print(f"{'slot rules on rows':>22} {evaluations / slots:>12,.0f} evaluations/s ({dicts / slots:.2f}x)")
+    print(f"{'decoding':>22} {records_per_run / decode:>12,.0f} records/s "
+          f"(break-even after {decode / max(dicts - slots, 1e-9) * rule_count:.1f} rules per record)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rules compiled over dict records vs over schema-decoded slot rows")
+    parser.add_argument("--rules", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.rules, args.depth, args.records, args.repeat, args.seed)
@@ -0,0 +1,63 @@
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.models import ATTRIBUTE_TYPES
+
+# Value ranges the generated rules and records draw from, so comparisons
+# hold for a realistic share of records
+NUMERIC_RANGES = {
+    "age": (18, 70),
+    "salary": (20000, 200000),
+    "experience": (0, 40),
+    "spend": (0, 10000),
+    "income": (10000, 300000),
+}
+DEPARTMENTS = ["Sales", "Marketing", "Engineering", "HR", "Finance"]
+NUMERIC_OPERATORS = [">", "<", ">=", "<=", "=", "!="]
+STRING_OPERATORS = ["=", "!="]
+
+ATTRIBUTES = list(ATTRIBUTE_TYPES)
+
+def generate_value(attribute: str, rng: random.Random) -> Any:
+    if ATTRIBUTE_TYPES[attribute] is str:
+        return rng.choice(DEPARTMENTS)
+    low, high = NUMERIC_RANGES[attribute]
+    return rng.randint(low, high)
+
+def generate_comparison(rng: random.Random, attributes: Sequence[str] = ATTRIBUTES) -> str:
+    attribute = rng.choice(attributes)
+    if ATTRIBUTE_TYPES[attribute] is str:
+        return f"{attribute} {rng.choice(STRING_OPERATORS)} '{generate_value(attribute, rng)}'"
+    return f"{attribute} {rng.choice(NUMERIC_OPERATORS)} {generate_value(attribute, rng)}"
+
+def generate_rule(rng: random.Random, depth: int = 2, width: int = 2,
+                  attributes: Sequence[str] = ATTRIBUTES) -> str:
+    # depth levels of parenthesized groups, each joining width operands with
+    # one operator; leaves are comparisons on the given attributes
+    if depth == 0:
+        return generate_comparison(rng, attributes)
+    operator = rng.choice([" AND ", " OR "])
+    operands = [generate_rule(rng, depth - 1, width, attributes) for _ in range(width)]
+    return operator.join(f"({operand})" if depth > 1 else operand for operand in operands)
+
+def generate_rules(count: int, rng: random.Random, depth: int = 2, width: int = 2,
+                   attributes: Sequence[str] = ATTRIBUTES) -> List[str]:
+    return [generate_rule(rng, depth, width, attributes) for _ in range(count)]
+
+def generate_records(count: int, rng: random.Random, attributes: Sequence[str] = ATTRIBUTES,
+                     missing_rate: float = 0.0) -> List[Dict[str, Any]]:
+    # Records with every attribute, each one left out with probability missing_rate
+    return [
+        {attribute: generate_value(attribute, rng) for attribute in attributes if rng.random() >= missing_rate}
+        for _ in range(count)
+    ]
+
+def parse_attribute_mix(text: Optional[str]) -> List[str]:
+    # "age,salary,salary" weighs salary twice; None means all attributes once
+    if not text:
+        return ATTRIBUTES
+    attributes = [name.strip() for name in text.split(",") if name.strip()]
+    unknown = sorted(set(attributes) - set(ATTRIBUTE_TYPES))
+    if unknown:
+        raise ValueError(f"Unknown attributes: {', '.join(unknown)}")
+    return attributes
@@ -0,0 +1,215 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# The end-to-end runs use the in-process MongoDB stand-in unless a server is
+# configured explicitly; app.database reads this on import
+os.environ.setdefault("MONGODB_URL", "memory://")
+
+from app.rule_engine import RuleEvaluator, RuleParser, combine_rules, create_rule, validate_attributes
+from benchmarks.generators import generate_records, generate_rules, parse_attribute_mix
+
+# Results: {"micro.parse": {"ops_per_sec": ...}, "e2e.evaluate_rule": {"requests_per_sec": ..., "p95_ms": ...}}
+Results = Dict[str, Dict[str, float]]
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+def ops_metrics(operations: int, seconds: float) -> Dict[str, float]:
+    return {"ops_per_sec": operations / seconds}
+
+def best_of(run: Callable[[], Any], repeat: int) -> float:
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def run_micro(args, rng: random.Random) -> Results:
+    attributes = parse_attribute_mix(args.attributes)
+    rule_strings = generate_rules(args.rules, rng, args.depth, args.width, attributes)
+    records = generate_records(args.records, rng, attributes)
+    asts = [create_rule(rule) for rule in rule_strings]
+    evaluator = RuleEvaluator()
+    groups = [rng.sample(rule_strings, min(args.combine_width, len(rule_strings))) for _ in range(args.combine_groups)]
+
+    def parse():
+        parser = RuleParser()
+        for rule in rule_strings:
+            parser.parse(rule)
+
+    def evaluate():
+        for ast in asts:
+            for record in records:
+                evaluator.evaluate(ast, record)
+
+    def combine():
+        for group in groups:
+            combine_rules(group)
+
+    def validate():
+        for ast in asts:
+            validate_attributes(ast)
+
+    return {
+        "micro.parse": ops_metrics(len(rule_strings), best_of(parse, args.repeat)),
+        "micro.evaluate": ops_metrics(len(asts) * len(records), best_of(evaluate, args.repeat)),
+        "micro.combine_rules": ops_metrics(len(groups), best_of(combine, args.repeat)),
+        "micro.validate_attributes": ops_metrics(len(asts), best_of(validate, args.repeat)),
+    }
+
+def load_test(send: Callable[[int], Any], requests: int, concurrency: int) -> Dict[str, float]:
+    # Issues requests from concurrency threads; latency is per request, under that load
+    def timed(position: int) -> float:
+        start = time.perf_counter()
+        response = send(position)
+        if response.status_code >= 400:
+            raise RuntimeError(f"Request failed with {response.status_code}: {response.text}")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_sec": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+def run_e2e(args, rng: random.Random) -> Results:
+    # Imported here: importing the app connects to the configured database
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    attributes = parse_attribute_mix(args.attributes)
+    rule_strings = generate_rules(args.e2e_rules, rng, args.depth, args.width, attributes)
+    records = generate_records(args.requests, rng, attributes)
+    results: Results = {}
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 60
+        while client.get("/api/ready").status_code != 200:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Rule registry did not become ready")
+            time.sleep(0.05)
+
+        created = []
+        def create(position: int):
+            response = client.post("/api/rules/", json={"name": f"bench-{position}", "description": "",
+                                                        "rule_string": rule_strings[position]})
+            if response.status_code < 400:
+                created.append(response.json()["_id"])
+            return response
+
+        results["e2e.create_rule"] = load_test(create, len(rule_strings), args.concurrency)
+        results["e2e.evaluate_rule"] = load_test(
+            lambda position: client.post(f"/api/rules/evaluate/{created[position % len(created)]}",
+                                         json={"data": records[position]}),
+            args.requests, args.concurrency)
+        results["e2e.evaluate_all"] = load_test(
+            lambda position: client.post("/api/rules/evaluate", json={"data": records[position]}),
+            args.requests, args.concurrency)
+    return results
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def lower_is_better(metric: str) -> bool:
+    return metric.endswith("_ms")
+
+def threshold_for(name: str, thresholds: Dict[str, float]) -> float:
+    # The most specific (longest) matching pattern wins
+    matches = [pattern for pattern in thresholds if fnmatch.fnmatchcase(name, pattern)]
+    return thresholds[max(matches, key=len)] if matches else thresholds.get("*", 0.15)
+
+def compare(results: Results, baseline: Results, thresholds: Dict[str, float]) -> List[Tuple[str, str, float, float, float, bool]]:
+    # (benchmark, metric, baseline, current, relative change, regressed) for
+    # every metric present in both runs; change is positive when worse
+    rows = []
+    for name, metrics in results.items():
+        allowed = threshold_for(name, thresholds)
+        for metric, value in metrics.items():
+            before = baseline.get(name, {}).get(metric)
+            if not before:
+                continue
+            change = (value - before) / before if lower_is_better(metric) else (before - value) / before
+            rows.append((name, metric, before, value, change, change > allowed))
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Engine micro-benchmarks and API load tests with JSON output and regression checks")
+    parser.add_argument("--suite", choices=["all", "micro", "e2e"], default="all")
+    parser.add_argument("--rules", type=int, default=1000, help="rules for the micro-benchmarks")
+    parser.add_argument("--records", type=int, default=100, help="records evaluated against every rule")
+    parser.add_argument("--depth", type=int, default=2, help="nesting levels of the generated rules")
+    parser.add_argument("--width", type=int, default=3, help="operands per AND/OR group")
+    parser.add_argument("--attributes", help="comma-separated attribute mix; repeat a name to weigh it")
+    parser.add_argument("--combine-width", type=int, default=10, help="rules per combine_rules call")
+    parser.add_argument("--combine-groups", type=int, default=100)
+    parser.add_argument("--e2e-rules", type=int, default=200, help="rules created through the API")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per end-to-end scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS,
+                        help="JSON mapping benchmark name patterns to the allowed relative regression")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results: Results = {}
+    if args.suite in ("all", "micro"):
+        results.update(run_micro(args, rng))
+    if args.suite in ("all", "e2e"):
+        results.update(run_e2e(args, rng))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {name: value for name, value in vars(args).items()
+                       if name not in ("suite", "output", "baseline", "thresholds")},
+        "results": results,
+    }
+    for name, metrics in results.items():
+        print(f"{name:<28} " + "  ".join(f"{metric}={value:,.2f}" for metric, value in metrics.items()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    if baseline.get("parameters") != report["parameters"]:
+        print("warning: the baseline was recorded with different parameters", file=sys.stderr)
+    with open(args.thresholds, encoding="utf-8") as file:
+        thresholds = json.load(file)
+    rows = compare(results, baseline["results"], thresholds)
+    print(f"\nagainst {args.baseline} ({baseline.get('commit')}):")
+    for name, metric, before, value, change, regressed in rows:
+        print(f"{name:<28} {metric:<17} {before:>14,.2f} -> {value:>14,.2f} {-change:>+8.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    regressions = sum(regressed for *_, regressed in rows)
+    if regressions:
+        print(f"{regressions} metric(s) regressed beyond their threshold", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+
+# Run the API tests against the in-memory MongoDB stand-in unless a real
+# server is configured explicitly
+os.environ.setdefault("MONGODB_URL", "memory://")
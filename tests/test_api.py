@@ -1,5 +1,8 @@
+import json
 from fastapi.testclient import TestClient
+from app.database import get_async_collection
 from app.main import app
+from app.routes import api
 
 client = TestClient(app)
 
@@ -11,4 +14,177 @@ def test_create_rule():
     assert response.status_code == 200
     assert "id" in response.json()
 
-# Add more API tests as needed
\ No newline at end of file
+def create(name, rule_string):
+    response = client.post("/api/rules/", json={"name": name, "description": "", "rule_string": rule_string})
+    assert response.status_code == 200, response.text
+    return response.json()["_id"]
+
+def rules_named(prefix):
+    return client.get("/api/rules/", params={"name": prefix}).json()
+
+def test_rules_the_registry_rejects_are_not_stored(monkeypatch):
+    deep = " AND ".join(f"age > {value}" for value in range(1500))
+    response = client.post("/api/rules/", json={"name": "too deep", "description": "", "rule_string": deep})
+    assert response.status_code == 400
+    assert "levels deep" in response.json()["detail"]
+    assert rules_named("too deep") == []
+
+    parts = [create("unregistrable part", "age > 30"), create("unregistrable part", "salary > 10")]
+    combined = len(rules_named("Combined Rule"))
+    def fail(*args):
+        raise RecursionError("maximum recursion depth exceeded")
+    monkeypatch.setattr(api.rule_registry, "register", fail)
+    response = client.post("/api/rules/", json={"name": "unregistrable", "description": "", "rule_string": "age > 1"})
+    assert response.status_code == 500
+    assert client.post("/api/rules/combine", json=parts).status_code == 500
+    monkeypatch.undo()
+    assert [rule["name"] for rule in rules_named("unregistrable")] == ["unregistrable part"] * 2
+    assert len(rules_named("Combined Rule")) == combined
+    assert client.post("/api/rules/evaluate", json={"data": {"age": 40, "salary": 5}}).status_code == 200
+
+def test_rule_crud_and_listing():
+    ids = [create(f"api-list {position}", f"age > {position}") for position in range(3)]
+    first = client.get("/api/rules/", params={"name": "api-list", "limit": 2, "fields": "name"})
+    assert first.status_code == 200
+    assert first.json() == [{"_id": ids[0], "name": "api-list 0"}, {"_id": ids[1], "name": "api-list 1"}]
+    rest = client.get("/api/rules/", params={"name": "api-list", "limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [rule["_id"] for rule in rest.json()] == [ids[2]] and "X-Next-Cursor" not in rest.headers
+    assert client.get("/api/rules/", params={"fields": "ast"}).status_code == 400
+
+    assert client.get(f"/api/rules/{ids[0]}").json()["rule_string"] == "age > 0"
+    assert client.get("/api/rules/0123456789abcdef01234567").status_code == 404
+    assert client.get("/api/rules/not-an-id").status_code == 400
+
+    updated = client.put(f"/api/rules/{ids[0]}", json={"rule_string": "age > 50"})
+    assert updated.status_code == 200 and updated.json()["version"] == 2
+    assert client.post(f"/api/rules/evaluate/{ids[0]}", json={"data": {"age": 40}}).json() == {"result": False}
+    assert client.put(f"/api/rules/{ids[0]}", json={"rule_string": "age >"}).status_code == 400
+    assert client.put("/api/rules/0123456789abcdef01234567", json={"name": "x"}).status_code == 404
+
+    assert client.delete(f"/api/rules/{ids[0]}").status_code == 200
+    assert client.delete(f"/api/rules/{ids[0]}").status_code == 404
+    assert client.post(f"/api/rules/evaluate/{ids[0]}", json={"data": {"age": 40}}).status_code == 404
+
+def test_bulk_import_and_export():
+    response = client.post("/api/rules/bulk", json=[
+        {"name": "api-bulk 1", "description": "", "rule_string": "salary > 100"},
+        {"name": "api-bulk bad", "description": "", "rule_string": "salary >"},
+    ])
+    assert response.status_code == 200
+    assert (response.json()["inserted"], response.json()["failed"]) == (1, 1)
+    assert response.json()["errors"][0]["index"] == 1
+
+    ndjson = '{"name": "api-bulk 2", "description": "", "rule_string": "age < 5"}\nnot json\n'
+    response = client.post("/api/rules/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert (response.json()["inserted"], response.json()["failed"]) == (1, 1)
+    assert client.post("/api/rules/bulk", json={"name": "not a list"}).status_code == 400
+
+    exported = client.get("/api/rules/export", params={"name": "api-bulk", "fields": "name,rule_string"})
+    assert [(rule["name"], rule["rule_string"]) for rule in exported.json()] == [("api-bulk 1", "salary > 100"),
+                                                                             ("api-bulk 2", "age < 5")]
+    lines = client.get("/api/rules/export", params={"name": "api-bulk", "format": "ndjson"}).text.splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["api-bulk 1", "api-bulk 2"]
+    assert client.get("/api/rules/export", params={"fields": "ast"}).status_code == 400
+
+def test_evaluating_all_active_rules():
+    rule_id = create("api-all", "spend > 1000 AND income > 10")
+    record = {"spend": 5000, "income": 20, "age": 1, "salary": 1, "department": "x", "experience": 1}
+    response = client.post("/api/rules/evaluate", json={"data": record})
+    assert response.status_code == 200 and rule_id in response.json()["matched"]
+    assert client.get("/api/ready").json()["ready"] is True
+
+    body = json.dumps(record) + "\n[1]\nnot json\n" + json.dumps({"spend": 5000}) + "\n"
+    response = client.post("/api/rules/evaluate/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert rule_id in results[0]["matched"]
+    assert results[1] == {"line": 2, "error": "Record must be a JSON object"}
+    assert results[2]["line"] == 3 and "error" in results[2]
+    assert results[3]["errors"][rule_id] == "Field income not found in data"
+
+    response = client.post("/api/rules/evaluate/batch", json={"records": [record, {"spend": 5000}]})
+    assert response.json()["count"] == 2 and rule_id in response.json()["results"][0]["matched"]
+    assert response.json()["results"][1]["errors"][rule_id] == "Field income not found in data"
+    response = client.post("/api/rules/evaluate/batch", content=json.dumps(record) + "\n",
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert rule_id in response.json()["results"][0]["matched"]
+    assert client.post("/api/rules/evaluate/batch", json={"records": {}}).status_code == 400
+    assert client.post("/api/rules/evaluate/batch", json={"records": [1]}).status_code == 400
+
+    typed = client.post("/api/rules/evaluate/batch", params={"typed": "true"},
+                        json={"records": [{**record, "spend": "5000", "income": "20"}, {"spend": "a lot"}]})
+    assert typed.json()["invalid"] == 1 and rule_id in typed.json()["results"][0]["matched"]
+    assert typed.json()["results"][1]["error"].startswith("Invalid value for spend")
+
+def test_evaluation_sessions():
+    rule_id = create("api-session", "spend > 100 AND income > 10")
+    record = {"spend": 500, "income": 5, "age": 1, "salary": 1, "department": "x", "experience": 1}
+    response = client.put("/api/sessions/api-key", json={"data": record})
+    assert response.status_code == 200 and rule_id not in response.json()["matched"]
+    response = client.patch("/api/sessions/api-key", json={"changes": {"income": 50}})
+    assert rule_id in response.json()["matched"] and rule_id in response.json()["changed"]
+    response = client.patch("/api/sessions/api-key", json={"removed": ["income"]})
+    assert response.json()["errors"][rule_id] == "Field income not found in data"
+    assert client.patch("/api/sessions/unknown-key", json={"changes": {}}).status_code == 404
+    assert client.delete("/api/sessions/api-key").status_code == 200
+    assert client.delete("/api/sessions/api-key").status_code == 404
+
+def test_single_rule_evaluation_endpoints():
+    rule_id = create("api-single", "age > 30 AND department = 'Sales'")
+    assert client.post(f"/api/rules/evaluate/{rule_id}", json={"data": {"age": 40, "department": "Sales"}}).json() == {"result": True}
+    response = client.post(f"/api/rules/evaluate/{rule_id}", json={"data": {"age": 40}})
+    assert response.status_code == 400 and response.json()["detail"] == "Field department not found in data"
+    assert client.post("/api/rules/evaluate/0123456789abcdef01234567", json={"data": {}}).status_code == 404
+
+    body = '{"age": 40, "department": "Sales"}\n{"age": 20}\n'
+    response = client.post(f"/api/rules/evaluate/{rule_id}/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"line": 1, "result": True}, {"line": 2, "result": False}]
+
+    response = client.post(f"/api/rules/evaluate/{rule_id}/batch",
+                           json={"columns": {"age": [40, 20], "department": ["Sales", "Sales"]}})
+    assert response.json() == {"results": [True, False], "count": 2, "matched": 1}
+    assert client.post(f"/api/rules/evaluate/{rule_id}/batch", json={"rows": []}).status_code == 400
+
+    analytics = client.get(f"/api/rules/{rule_id}/analytics").json()
+    assert analytics["performance"]["evaluation_count"] >= 2
+    assert client.get("/api/metrics").status_code == 200
+    assert "hits" in client.get("/api/rules/cache/stats").json()
+
+def test_profiling_and_optimizing_a_rule():
+    rule_id = create("api-profile", "age > 30 AND age > 30")
+    assert client.get(f"/api/rules/{rule_id}/profile").status_code == 404
+    assert client.post(f"/api/rules/{rule_id}/profile").json()["evaluations"] == 0
+    client.post(f"/api/rules/evaluate/{rule_id}", json={"data": {"age": 40}})
+    profile = client.get(f"/api/rules/{rule_id}/profile").json()
+    assert profile["evaluations"] == 1 and profile["rule_string"] == "age > 30 AND age > 30"
+
+    optimized = client.post(f"/api/rules/{rule_id}/optimize").json()
+    assert optimized["optimized_rule_string"] == "age > 30" and optimized["removed_duplicates"] == 1
+    assert client.delete(f"/api/rules/{rule_id}/profile").status_code == 200
+    assert client.delete(f"/api/rules/{rule_id}/profile").status_code == 404
+    assert client.post("/api/rules/0123456789abcdef01234567/optimize").status_code == 404
+
+def test_querying_records_matching_a_rule(monkeypatch):
+    monkeypatch.setattr(api, "RECORD_QUERY_COLLECTIONS", frozenset({"api_people"}))
+    get_async_collection("api_people").collection.insert_many([{"age": age} for age in (20, 40, 50)])
+    rule_id = create("api-records", "age > 30")
+    url = f"/api/rules/{rule_id}/records"
+    assert client.get(url, params={"collection": "api_people", "count": "true"}).json()["count"] == 2
+    assert [document["age"] for document in client.get(url, params={"collection": "api_people"}).json()] == [40, 50]
+    lines = client.get(url, params={"collection": "api_people", "format": "ndjson", "limit": 1}).text.splitlines()
+    assert [json.loads(line)["age"] for line in lines] == [40]
+    response = client.get(url, params={"collection": "rules"})
+    assert response.status_code == 400 and response.json()["detail"] == "Collection 'rules' is not queryable"
+    assert client.get("/api/rules/0123456789abcdef01234567/records", params={"collection": "api_people"}).status_code == 404
+
+def test_combining_rules():
+    ids = [create("api-combine", "age > 30 AND salary > 10"), create("api-combine", "age > 30 AND spend > 10")]
+    response = client.post("/api/rules/combine", json=ids)
+    assert response.status_code == 200
+    assert response.json()["rule_string"] == "age > 30 AND salary > 10 AND spend > 10"
+    response = client.post("/api/rules/combine", params={"operator": "OR"}, json=ids)
+    assert response.json()["rule_string"] == "age > 30 AND (salary > 10 OR spend > 10)"
+    assert client.post(f"/api/rules/evaluate/{response.json()['_id']}", json={"data": {"age": 40, "salary": 20}}).json() == {"result": True}
+    assert client.post("/api/rules/combine", params={"operator": "XOR"}, json=ids).status_code == 400
+    assert client.post("/api/rules/combine", json=["0123456789abcdef01234567"]).status_code == 404
+
@@ -0,0 +1,42 @@
+import pytest
+from app.rule_engine import create_rule, to_rule_string
+from app.ast_codec import AST_FORMAT_VERSION, serialize_ast, deserialize_ast, ast_from_document
+
+RULES = [
+    "age > 30",
+    "age > 30 AND department = 'Sales'",
+    "((age > 30 AND department = 'Sales') OR (age < 25 AND department = 'Marketing')) AND (salary > 50000 OR experience > 5)",
+    "age != 30 OR (salary <= 100 AND (experience >= 2 OR spend < 7))",
+]
+
+def test_postfix_encoding():
+    encoded = serialize_ast(create_rule("age > 30 AND department = 'Sales'"))
+    assert encoded == {
+        "format": AST_FORMAT_VERSION,
+        "postfix": [["age", ">", 30], ["department", "=", "Sales"], "AND"],
+    }
+
+@pytest.mark.parametrize("rule_string", RULES)
+def test_round_trip(rule_string):
+    ast = create_rule(rule_string)
+    assert deserialize_ast(serialize_ast(ast)) == ast
+
+@pytest.mark.parametrize("rule_string", RULES)
+def test_rule_string_parses_back(rule_string):
+    ast = create_rule(rule_string)
+    assert create_rule(to_rule_string(ast)) == ast
+
+def test_malformed_ast():
+    with pytest.raises(ValueError, match="Malformed serialized AST"):
+        deserialize_ast({"format": AST_FORMAT_VERSION, "postfix": [["age", ">", 30], "AND"]})
+    with pytest.raises(ValueError, match="Malformed serialized AST"):
+        deserialize_ast({"format": AST_FORMAT_VERSION, "postfix": [["age", "~", 30]]})
+    with pytest.raises(ValueError, match="Unsupported AST format"):
+        deserialize_ast({"format": AST_FORMAT_VERSION + 1, "postfix": []})
+
+def test_ast_from_document_falls_back_to_rule_string():
+    ast = create_rule("age > 30")
+    assert ast_from_document({"rule_string": "age > 30"}) == ast
+    assert ast_from_document({"rule_string": "age > 30", "ast": {"format": 0, "postfix": []}}) == ast
+    stored = serialize_ast(create_rule("age > 40"))
+    assert ast_from_document({"rule_string": "age > 30", "ast": stored}) == create_rule("age > 40")
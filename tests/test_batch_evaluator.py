@@ -0,0 +1,51 @@
+import random
+import numpy as np
+import pytest
+from app.rule_engine import create_rule, evaluate_rule
+from app.batch_evaluator import ColumnarBatch, evaluate_batch
+
+DEPARTMENTS = ["Sales", "Marketing", "Engineering", "HR"]
+
+def make_records(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "age": rng.randint(18, 65),
+            "salary": rng.randint(20000, 120000),
+            "experience": rng.randint(0, 30),
+            "department": rng.choice(DEPARTMENTS),
+        }
+        for _ in range(count)
+    ]
+
+def test_batch_matches_row_evaluation():
+    rule = "((age > 30 AND department = 'Sales') OR (age < 25 AND department != 'Marketing')) AND (salary > 50000 OR experience >= 5)"
+    ast = create_rule(rule)
+    records = make_records(500)
+    columns = {field: [r[field] for r in records] for field in records[0]}
+    mask = evaluate_batch(ast, columns)
+    assert mask.dtype == bool
+    assert mask.tolist() == [evaluate_rule(ast, r) for r in records]
+    assert evaluate_batch(ast, ColumnarBatch.from_records(records)).tolist() == mask.tolist()
+
+def test_numpy_columns_and_string_ordering():
+    ast = create_rule("department > 'HR' AND age <= 40")
+    columns = {"department": np.array(["Sales", "Engineering", "Marketing"]), "age": np.array([40, 20, 41])}
+    assert evaluate_batch(ast, columns).tolist() == [True, False, False]
+
+def test_missing_column_only_raises_when_reached():
+    ast = create_rule("age > 30 AND salary > 50000")
+    assert evaluate_batch(ast, {"age": [20, 25]}).tolist() == [False, False]
+    with pytest.raises(ValueError, match="Field salary not found in data"):
+        evaluate_batch(ast, {"age": [20, 35]})
+
+def test_from_records_missing_values():
+    ast = create_rule("age > 30 OR salary > 50000")
+    batch = ColumnarBatch.from_records([{"age": 35}, {"age": 20, "salary": 60000}])
+    assert evaluate_batch(ast, batch).tolist() == [True, True]
+    with pytest.raises(ValueError, match="Field salary not found in data"):
+        evaluate_batch(ast, ColumnarBatch.from_records([{"age": 20}, {"age": 20, "salary": 1}]))
+
+def test_mismatched_column_lengths():
+    with pytest.raises(ValueError, match="Column salary has 1 rows, expected 2"):
+        ColumnarBatch({"age": [1, 2], "salary": [3]})
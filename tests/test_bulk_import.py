@@ -0,0 +1,57 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from app.database import AsyncCollection
+from app.memory_db import InMemoryCollection
+from app.services.bulk_import import BulkRuleImporter
+from app.services.rule_repository import RuleRepository
+
+def make_repository():
+    collection = InMemoryCollection("rules")
+    return collection, RuleRepository(AsyncCollection(collection, ThreadPoolExecutor(max_workers=2)))
+
+async def as_stream(items):
+    for item in items:
+        yield item
+
+ITEMS = [
+    {"name": "ok", "description": "", "rule_string": "age > 30"},
+    {"name": "bad syntax", "description": "", "rule_string": "age >"},
+    {"description": "missing name", "rule_string": "age > 30"},
+    ValueError("Invalid JSON: Expecting value"),
+    {"name": "ok too", "description": "", "rule_string": "department = 'Sales' OR salary > 100"},
+]
+
+def test_import_reports_per_item_errors():
+    collection, repository = make_repository()
+    inserted = []
+    importer = BulkRuleImporter(repository, insert_batch_size=2, on_inserted=lambda doc, ast: inserted.append(doc["_id"]))
+    result = asyncio.run(importer.import_rules(as_stream(ITEMS)))
+    assert result.received == 5
+    assert result.inserted == 2
+    assert [error.index for error in result.errors] == [1, 2, 3]
+    assert "Unexpected end of expression" in result.errors[0].error
+    assert result.ids[0] is not None and result.ids[4] is not None
+    assert inserted == [result.ids[0], result.ids[4]]
+    assert collection.count_documents({}) == 2
+
+def test_import_parses_in_process_pool():
+    _, repository = make_repository()
+    items = [{"name": f"r{i}", "description": "", "rule_string": f"age > {i}"} for i in range(40)]
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        importer = BulkRuleImporter(repository, executor=pool, parse_chunk_size=10)
+        result = asyncio.run(importer.import_rules(as_stream(items)))
+    assert result.inserted == 40
+    assert result.failed == 0
+    assert result.rules_per_second > 0
+
+def test_rules_rejected_after_insert_are_removed():
+    collection, repository = make_repository()
+    def register(doc, ast):
+        if doc["name"] == "ok":
+            raise RecursionError("maximum recursion depth exceeded")
+    importer = BulkRuleImporter(repository, on_inserted=register)
+    result = asyncio.run(importer.import_rules(as_stream(ITEMS)))
+    assert result.inserted == 1 and result.ids[0] is None and result.ids[4] is not None
+    assert [(error.index, error.error) for error in result.errors][0] == (0, "maximum recursion depth exceeded")
+    assert [doc["name"] for doc in collection.find({})] == ["ok too"]
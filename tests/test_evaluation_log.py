@@ -0,0 +1,102 @@
+import asyncio
+import json
+from app.services.evaluation_log import EvaluationLog, EvaluationSink, JsonlSink, input_hash
+
+class ListSink(EvaluationSink):
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    async def write(self, documents):
+        if self.fail:
+            raise IOError("disk full")
+        self.batches.append(documents)
+
+async def wait_for_batches(sink, count):
+    for _ in range(200):
+        if len(sink.batches) >= count:
+            return
+        await asyncio.sleep(0.01)
+
+def test_flushes_in_batches_of_flush_size():
+    sink = ListSink()
+    log = EvaluationLog(sink, capacity=100, flush_size=4)
+
+    async def run():
+        for age in range(10):
+            await log.log("r1", 2, {"age": age}, age > 5, 1000)
+        assert len(log) == 10 and log.lag_seconds() > 0
+        await log.flush()
+
+    asyncio.run(run())
+    assert [len(batch) for batch in sink.batches] == [4, 4, 2]
+    document = sink.batches[0][0]
+    assert (document["rule_id"], document["version"], document["result"], document["latency_ns"]) == ("r1", 2, False, 1000)
+    assert document["input_hash"] == input_hash({"age": 0})
+    assert log.stats()["written"] == 10 and log.lag_seconds() == 0
+
+def test_background_flush_on_size_and_interval():
+    by_size, by_interval = ListSink(), ListSink()
+    size_log = EvaluationLog(by_size, flush_size=2, flush_interval=60)
+    interval_log = EvaluationLog(by_interval, flush_size=100, flush_interval=0.05)
+
+    async def run():
+        flushers = [asyncio.create_task(size_log.run()), asyncio.create_task(interval_log.run())]
+        for log in (size_log, interval_log):
+            await log.log("r1", 1, {"age": 1}, True, 10)
+            await log.log("r1", 1, {"age": 2}, True, 10)
+        await wait_for_batches(by_size, 1)
+        await wait_for_batches(by_interval, 1)
+        for flusher in flushers:
+            flusher.cancel()
+
+    asyncio.run(run())
+    assert [len(batch) for batch in by_size.batches] == [2]
+    assert [len(batch) for batch in by_interval.batches] == [2]
+
+def test_overflow_policies():
+    async def fill(log):
+        return [await log.log("r1", 1, {"age": 1}, True, 10) for _ in range(5)]
+
+    dropping = EvaluationLog(ListSink(), capacity=3, flush_size=3, overflow="drop")
+    assert asyncio.run(fill(dropping)) == [True, True, True, False, False]
+    assert dropping.stats()["dropped"] == 2
+
+    sink = ListSink()
+    blocking = EvaluationLog(sink, capacity=3, flush_size=3, flush_interval=60, overflow="block")
+
+    async def run():
+        flusher = asyncio.create_task(blocking.run())
+        # Producers wait for the flusher instead of losing entries
+        assert await fill(blocking) == [True] * 5
+        await blocking.close()
+        flusher.cancel()
+
+    asyncio.run(run())
+    assert sum(len(batch) for batch in sink.batches) == 5 and blocking.dropped == 0
+
+def test_sink_errors_are_counted():
+    log = EvaluationLog(ListSink(fail=True), flush_size=2)
+
+    async def run():
+        await log.log("r1", 1, {"age": 1}, None, 10, "Field department not found in data")
+        await log.flush()
+
+    asyncio.run(run())
+    assert log.failed == 1 and log.written == 0
+    assert "evaluation_log_failed_total 1" in log.prometheus_metrics()
+
+def test_jsonl_sink_appends(tmp_path):
+    path = tmp_path / "evaluations.jsonl"
+
+    async def run():
+        for _ in range(2):
+            log = EvaluationLog(JsonlSink(str(path)), flush_size=10)
+            await log.log("r1", 1, {"b": 1, "a": 2}, True, 10)
+            await log.close()
+
+    asyncio.run(run())
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["input_hash"] == input_hash({"a": 2, "b": 1})
+    assert lines[0]["result"] is True and lines[0]["timestamp"].endswith("+00:00")
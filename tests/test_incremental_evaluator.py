@@ -0,0 +1,82 @@
+import random
+from app.rule_engine import create_rule, evaluate_rule
+from app.incremental_evaluator import EvaluationSession
+
+RULES = {
+    "senior_sales": "age > 30 AND department = 'Sales'",
+    "rich": "salary > 50000",
+    "experienced": "(age > 30 AND experience > 5) OR salary > 80000",
+}
+
+def expected(rules, record):
+    matched, errors = [], {}
+    for rule_id, ast in sorted(rules.items()):
+        try:
+            if evaluate_rule(ast, record):
+                matched.append(rule_id)
+        except ValueError as e:
+            errors[rule_id] = str(e)
+    return matched, errors
+
+def test_delta_recomputes_only_affected_paths():
+    rules = {rule_id: create_rule(rule) for rule_id, rule in RULES.items()}
+    session = EvaluationSession(rules)
+    first = session.evaluate("k1", {"age": 40, "department": "Sales", "salary": 60000, "experience": 2})
+    assert first.matched == ["rich", "senior_sales"]
+    assert first.changed == {"senior_sales": True, "rich": True, "experienced": False}
+
+    result = session.apply_delta("k1", {"department": "Marketing"})
+    assert result.changed == {"senior_sales": False}
+    # Only department = 'Sales' and its AND parent
+    assert result.evaluated_nodes == 2
+
+    result = session.apply_delta("k1", {"experience": 9})
+    assert result.changed == {"experienced": True}
+    assert result.matched == ["experienced", "rich"]
+
+    # Unchanged values and unreferenced fields cost nothing
+    assert session.evaluate("k1", {"age": 40, "department": "Marketing", "salary": 60000,
+                                   "experience": 9, "city": "Pune"}).evaluated_nodes == 0
+
+def test_missing_fields_report_errors_like_the_evaluator():
+    session = EvaluationSession({"senior_sales": create_rule(RULES["senior_sales"])})
+    assert session.evaluate("k1", {"age": 20}).errors == {}
+    result = session.apply_delta("k1", {"age": 40})
+    assert result.errors == {"senior_sales": "Field department not found in data"}
+    assert result.changed == {"senior_sales": None}
+    result = session.apply_delta("k1", {"department": "Sales"})
+    assert result.changed == {"senior_sales": True}
+    assert session.apply_delta("k1", {}, removed=["department"]).changed == {"senior_sales": None}
+
+def test_random_deltas_match_full_evaluation():
+    rules = {rule_id: create_rule(rule) for rule_id, rule in RULES.items()}
+    session = EvaluationSession(rules)
+    rng = random.Random(5)
+    records = {}
+    for step in range(500):
+        key = f"k{rng.randint(0, 9)}"
+        if key not in records:
+            records[key] = {"age": 30, "department": "Sales", "salary": 50000, "experience": 5}
+            session.evaluate(key, records[key])
+        name = rng.choice(["age", "department", "salary", "experience"])
+        if rng.random() < 0.1:
+            records[key].pop(name, None)
+            result = session.apply_delta(key, {}, removed=[name])
+        else:
+            value = rng.choice(["Sales", "HR"]) if name == "department" else rng.randint(0, 100000 if name == "salary" else 60)
+            records[key][name] = value
+            result = session.apply_delta(key, {name: value})
+        assert (result.matched, result.errors) == expected(rules, records[key])
+
+def test_rule_changes_and_eviction():
+    session = EvaluationSession({"rich": create_rule(RULES["rich"])}, max_keys=2)
+    session.evaluate("k1", {"salary": 60000, "age": 40})
+    session.sync_rules({"old": create_rule("age > 30")})
+    # Rules added since the key's last update are evaluated in full
+    result = session.apply_delta("k1", {"salary": 10})
+    assert result.matched == ["old"] and result.changed == {"old": True}
+
+    session.evaluate("k2", {"age": 1})
+    session.evaluate("k3", {"age": 1})
+    assert "k1" not in session and len(session) == 2
+    assert session.forget("k2") and not session.forget("k2")
@@ -0,0 +1,64 @@
+import pytest
+from pymongo.errors import BulkWriteError
+from app.memory_db import InMemoryCollection
+
+def make_collection():
+    collection = InMemoryCollection("records")
+    collection.insert_many([
+        {"_id": 1, "age": 35, "department": "Sales"},
+        {"_id": 2, "age": 25, "department": "Marketing"},
+        {"_id": 3, "age": "40", "department": "Sales"},
+        {"_id": 4, "department": "HR"},
+    ])
+    return collection
+
+def ids(cursor):
+    return [document["_id"] for document in cursor]
+
+def test_query_operators():
+    collection = make_collection()
+    assert ids(collection.find({"age": {"$gt": 30}})) == [1]
+    assert ids(collection.find({"age": {"$ne": 35, "$exists": True}})) == [2, 3]
+    assert ids(collection.find({"$or": [{"department": "HR"}, {"age": {"$lte": 25}}]})) == [2, 4]
+    assert ids(collection.find({"department": {"$regex": "^s", "$options": "i"}})) == [1, 3]
+    assert collection.count_documents({"department": "Sales"}) == 2
+
+def test_sort_limit_projection():
+    collection = make_collection()
+    documents = list(collection.find({}, {"department": 1, "_id": 0}).sort("_id", -1).limit(2))
+    assert documents == [{"department": "HR"}, {"department": "Sales"}]
+
+def test_unordered_insert_many_reports_duplicates():
+    collection = make_collection()
+    with pytest.raises(BulkWriteError) as error:
+        collection.insert_many([{"_id": 1}, {"_id": 5}], ordered=False)
+    assert error.value.details["nInserted"] == 1
+    assert error.value.details["writeErrors"][0]["index"] == 0
+    assert collection.count_documents({}) == 5
+
+def test_change_stream_reports_writes_and_resumes():
+    collection = InMemoryCollection("rules")
+    stream = collection.watch(full_document="updateLookup")
+    assert stream.try_next() is None
+
+    result = collection.insert_one({"name": "a", "version": 1})
+    collection.update_one({"_id": result.inserted_id}, {"$inc": {"version": 1}, "$unset": {"name": ""}})
+    event = stream.try_next()
+    assert event["operationType"] == "insert"
+    assert event["documentKey"] == {"_id": result.inserted_id}
+    token = stream.resume_token
+
+    collection.delete_one({"_id": result.inserted_id})
+    update = stream.try_next()
+    assert update["updateDescription"] == {"updatedFields": {"version": 2}, "removedFields": ["name"]}
+    # updateLookup happens on read, after the delete
+    assert update["fullDocument"] is None
+    assert stream.try_next()["operationType"] == "delete"
+
+    resumed = collection.watch(resume_after=token)
+    assert resumed.try_next()["operationType"] == "update"
+    assert "fullDocument" not in collection.watch(resume_after=token).try_next()
+
+    collection.drop()
+    assert [stream.try_next()["operationType"] for _ in range(2)] == ["drop", "invalidate"]
+    assert not stream.alive
@@ -0,0 +1,81 @@
+import asyncio
+import random
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app.database import AsyncCollection
+from app.memory_db import InMemoryCollection, matches
+from app.mongo_query import matches_residual, to_mongo_query
+from app.rule_engine import ComparisonOperator, Node, NodeType, Operator, create_rule, evaluate_rule
+from app.services.record_query import RecordQuery, validate_collection_name
+
+def test_translation():
+    query = to_mongo_query(create_rule("(age > 30 AND department = 'Sales') OR salary != 5000"))
+    assert query.residual is None
+    assert query.filter == {"$or": [
+        {"$and": [{"age": {"$gt": 30}}, {"department": {"$eq": "Sales"}}]},
+        # $ne alone would also match records without a salary
+        {"salary": {"$ne": 5000, "$exists": True}},
+    ]}
+    # Same-operator chains are flattened
+    query = to_mongo_query(create_rule("age > 1 AND age < 9 AND experience >= 2"))
+    assert query.filter == {"$and": [{"age": {"$gt": 1}}, {"age": {"$lt": 9}}, {"experience": {"$gte": 2}}]}
+
+def test_untranslatable_conjuncts_become_residual():
+    dotted = Node(NodeType.COMPARISON, 3, "address.floor", ComparisonOperator.GT)
+    rule = Node(NodeType.OPERATOR, operator=Operator.AND, left=create_rule("age > 30"), right=dotted)
+    query = to_mongo_query(rule)
+    assert query.filter == {"age": {"$gt": 30}}
+    assert query.residual is dotted
+    assert matches_residual(dotted, {"address.floor": 4})
+    assert not matches_residual(dotted, {"address": {"floor": 4}})
+
+    # An OR can only be pushed down as a whole
+    either = Node(NodeType.OPERATOR, operator=Operator.OR, left=create_rule("age > 30"), right=dotted)
+    query = to_mongo_query(either)
+    assert query.filter == {} and query.residual is either
+
+def test_filter_agrees_with_python_evaluation():
+    rng = random.Random(11)
+    comparisons = ["age > {}", "age <= {}", "salary >= {}", "experience != {}", "department = 'Sales'",
+                   "department != 'HR'"]
+
+    def build(depth):
+        if depth == 0:
+            return rng.choice(comparisons).format(rng.randint(0, 60))
+        return f"({build(depth - 1)} {rng.choice(['AND', 'OR'])} {build(depth - 1)})"
+
+    records = [{name: value for name, value in (
+        ("age", rng.randint(0, 60)), ("salary", rng.randint(0, 60)), ("experience", rng.randint(0, 60)),
+        ("department", rng.choice(["Sales", "HR", "Marketing"]))) if rng.random() < 0.9}
+        for _ in range(200)]
+    for _ in range(50):
+        rule = create_rule(build(3))
+        query = to_mongo_query(rule)
+        for record in records:
+            expected = matches_residual(rule, record)
+            assert matches(record, query.filter) == expected
+            if len(record) == 4:
+                assert evaluate_rule(rule, record) == expected
+
+def test_record_query_applies_residual_after_the_filter():
+    collection = InMemoryCollection("people")
+    collection.insert_many([{"age": age, "address.floor": age % 3} for age in range(20, 40)])
+    records = RecordQuery(AsyncCollection(collection, ThreadPoolExecutor(max_workers=1)), batch_size=4)
+    dotted = Node(NodeType.COMPARISON, 0, "address.floor", ComparisonOperator.EQ)
+    rule = Node(NodeType.OPERATOR, operator=Operator.AND, left=create_rule("age >= 30"), right=dotted)
+
+    async def scenario():
+        assert await records.count(create_rule("age >= 30")) == 10
+        assert await records.count(rule) == 4
+        found = [document async for batch in records.find(rule, limit=2) for document in batch]
+        assert [document["age"] for document in found] == [30, 33]
+
+    asyncio.run(scenario())
+
+def test_only_allowed_collections_are_queryable():
+    assert validate_collection_name("customers", frozenset({"customers"})) == "customers"
+    for name in ("rules", "evaluations"):
+        with pytest.raises(ValueError, match="is not queryable"):
+            validate_collection_name(name, frozenset({"customers"}))
+    with pytest.raises(ValueError, match="Invalid collection name"):
+        validate_collection_name("system.users", frozenset({"system.users"}))
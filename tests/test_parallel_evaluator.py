@@ -0,0 +1,73 @@
+import asyncio
+import random
+import pytest
+from app.rule_engine import create_rule, evaluate_rule
+from app.parallel_evaluator import ParallelRuleEvaluator, evaluate_rule_parallel
+
+RULES = {
+    "senior_sales": "age > 30 AND department = 'Sales'",
+    "rich": "salary > 50000",
+    "experienced": "(age > 30 AND experience > 5) OR salary > 80000",
+}
+
+def build_records(count):
+    rng = random.Random(3)
+    return [{
+        "age": rng.randint(18, 65),
+        "department": rng.choice(["Sales", "Marketing"]),
+        "salary": rng.randint(10000, 100000),
+        "experience": rng.randint(0, 10),
+    } for _ in range(count)]
+
+def test_worker_pool_matches_in_process_evaluation():
+    rules = {rule_id: create_rule(rule) for rule_id, rule in RULES.items()}
+    records = build_records(200)
+    records[7] = {"age": 40, "department": "Sales"}
+    with ParallelRuleEvaluator(rules, workers=2, chunk_size=25) as evaluator:
+        results = evaluator.evaluate(records)
+        assert asyncio.run(evaluator.evaluate_async(records)) == results
+
+    assert len(results) == len(records)
+    for record, (matched, errors) in zip(records[8:], results[8:]):
+        assert matched == [rule_id for rule_id in sorted(rules) if evaluate_rule(rules[rule_id], record)]
+        assert errors == {}
+    assert results[7] == (["senior_sales"], {"rich": "Field salary not found in data",
+                                              "experienced": "Field experience not found in data"})
+
+def test_small_batches_stay_in_process():
+    evaluator = ParallelRuleEvaluator({"rich": create_rule(RULES["rich"])}, workers=4, chunk_size=100)
+    assert evaluator.evaluate([{"salary": 60000}, {"salary": 10}]) == [(["rich"], {}), ([], {})]
+    assert evaluator._pool is None
+
+def test_evaluate_rule_parallel():
+    ast = create_rule(RULES["senior_sales"])
+    records = build_records(60)
+    assert evaluate_rule_parallel(ast, records, workers=2, chunk_size=10) == [evaluate_rule(ast, r) for r in records]
+    with pytest.raises(ValueError, match="Record 1: Field department not found in data"):
+        evaluate_rule_parallel(ast, [{"age": 10, "department": "Sales"}, {"age": 40}], workers=1)
+
+def test_rule_changes_reach_the_running_workers():
+    rules = {rule_id: create_rule(rule) for rule_id, rule in RULES.items()}
+    records = build_records(100)
+    with ParallelRuleEvaluator(rules, workers=2, chunk_size=10) as evaluator:
+        evaluator.evaluate(records)
+        pool = evaluator._pool
+        rules["rich"] = create_rule("salary > 90000")
+        del rules["senior_sales"]
+        rules["young"] = create_rule("age < 25")
+        evaluator.update(rules)
+        assert evaluator.evaluate(records) == ParallelRuleEvaluator(rules, workers=1).evaluate(records)
+        assert asyncio.run(evaluator.evaluate_async(records[:5])) == ParallelRuleEvaluator(rules, workers=1).evaluate(records[:5])
+        assert evaluator._pool is pool
+
+def test_replacing_the_pool_lets_running_batches_finish():
+    rules = {rule_id: create_rule(rule) for rule_id, rule in RULES.items()}
+    records = build_records(100)
+    with ParallelRuleEvaluator(rules, workers=2, chunk_size=10, max_pending_changes=0) as evaluator:
+        async def run():
+            batch = asyncio.ensure_future(evaluator.evaluate_async(records))
+            await asyncio.sleep(0)
+            evaluator.update({"rich": create_rule("salary > 90000")})
+            assert evaluator._pool is None
+            return await batch
+        assert asyncio.run(run()) == ParallelRuleEvaluator(rules, workers=1).evaluate(records)
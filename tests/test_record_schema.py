@@ -0,0 +1,62 @@
+import pytest
+from app.record_schema import Missing, RecordSchema, TypedRuleSet, record_schema
+from app.rule_engine import compile_rule, create_rule
+
+def test_decode_coerces_to_declared_types():
+    row = record_schema.decode({"age": "30", "salary": 5000, "department": "Sales", "experience": 4.0,
+                                "income": None, "unknown": 1})
+    assert row[record_schema.slots["age"]] == 30
+    assert type(row[record_schema.slots["salary"]]) is float
+    assert row[record_schema.slots["experience"]] == 4
+    assert isinstance(row[record_schema.slots["income"]], Missing)
+    assert record_schema.as_dict(row) == {"age": 30, "salary": 5000.0, "department": "Sales", "experience": 4}
+
+    rows, errors = record_schema.decode_many([{"age": 1}, {"age": "old"}, {"age": 2.5}, {"department": 3}])
+    assert rows[0] is not None and rows[1:] == [None, None, None]
+    assert errors[1] == "Invalid value for age: could not convert string to float: 'old'"
+    assert errors[2] == "Invalid value for age: expected int, got 2.5"
+    assert errors[3] == "Invalid value for department: expected str, got 3"
+    with pytest.raises(ValueError, match="Unsupported attribute types: tags"):
+        RecordSchema({"tags": list})
+
+def test_slot_rules_match_compiled_rules():
+    rule = create_rule("(age > 30 AND department = 'Sales') OR (salary >= 50000 AND experience != 2)")
+    compiled, slot_rule = compile_rule(rule), record_schema.compile(rule)
+    records = [
+        {"age": age, "department": department, "salary": salary, "experience": experience}
+        for age in (25, 35) for department in ("Sales", "HR") for salary in (40000, 60000) for experience in (2, 3)
+    ]
+    assert [slot_rule(record_schema.decode(record)) for record in records] == [compiled(record) for record in records]
+    assert record_schema.compile(rule) is slot_rule
+
+    # Short-circuiting past a missing attribute, and the same error when it is reached
+    assert slot_rule(record_schema.decode({"age": 35, "department": "Sales"}))
+    with pytest.raises(ValueError, match="Field salary not found in data"):
+        slot_rule(record_schema.decode({"age": 35, "department": "HR"}))
+
+def test_rule_values_are_coerced_to_attribute_types():
+    # Compared as text on the raw record, as a number on the decoded one
+    rule = create_rule("age > '30'")
+    with pytest.raises(TypeError):
+        compile_rule(rule)({"age": 35})
+    assert record_schema.evaluate_rows(rule, [record_schema.decode({"age": 35}), record_schema.decode({"age": "4"})]) == [True, False]
+    assert record_schema.evaluate_rows(create_rule("age < 30.5"), [record_schema.decode({"age": 30})]) == [True]
+    with pytest.raises(ValueError, match="not in the schema"):
+        RecordSchema({"age": int}).compile(create_rule("salary > 1"))
+
+def test_typed_rule_set_matches_coerced_rule_values():
+    rules = {rule_id: create_rule(rule) for rule_id, rule in {
+        "older": "age > '30'", "exact": "age = '30'", "sales": "department = 'Sales' AND salary > 1000",
+    }.items()}
+    typed = TypedRuleSet(record_schema, rules)
+    rows = [record_schema.decode(record) for record in ({"age": 30, "department": "Sales"}, {"age": "31"})]
+    assert typed.evaluate(rows) == [
+        (["exact"], {"sales": "Field salary not found in data"}),
+        (["older"], {"sales": "Field department not found in data"}),
+    ]
+    assert TypedRuleSet(RecordSchema({"age": int}), rules).failed == {"sales": "Attribute department is not in the schema"}
+
+def test_digit_separators_are_rejected():
+    rows, errors = record_schema.decode_many([{"age": "1_000"}, {"salary": "2_5.0"}, {"salary": " 25.5 "}])
+    assert rows[:2] == [None, None] and rows[2] is not None
+    assert errors == {0: "Invalid value for age: invalid number '1_000'", 1: "Invalid value for salary: invalid number '2_5.0'"}
@@ -0,0 +1,61 @@
+import pytest
+from app.rule_engine import create_rule, evaluate_rule
+from app.services.result_cache import ResultCache
+
+class CountingEvaluator:
+    def __init__(self, ast):
+        self.ast = ast
+        self.calls = 0
+
+    def __call__(self, data):
+        self.calls += 1
+        return evaluate_rule(self.ast, data)
+
+def test_key_covers_only_referenced_attributes():
+    cache = ResultCache(max_size=8)
+    ast = create_rule("age > 30 AND department = 'Sales'")
+    evaluator = CountingEvaluator(ast)
+    assert cache.evaluate("r1", 1, ast, {"age": 35, "department": "Sales", "salary": 1}, evaluator)
+    assert cache.evaluate("r1", 1, ast, {"department": "Sales", "age": 35, "salary": 2}, evaluator)
+    assert evaluator.calls == 1
+    # A different referenced value, type or version is a different entry
+    assert not cache.evaluate("r1", 1, ast, {"age": 25, "department": "Sales"}, evaluator)
+    assert cache.evaluate("r1", 1, ast, {"age": 35.0, "department": "Sales"}, evaluator)
+    assert cache.evaluate("r1", 2, ast, {"age": 35, "department": "Sales"}, evaluator)
+    assert evaluator.calls == 4
+    assert cache.stats()["hits"] == 1
+
+def test_errors_are_not_cached():
+    cache = ResultCache(max_size=8)
+    ast = create_rule("age > 30 AND salary > 10")
+    evaluator = CountingEvaluator(ast)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.evaluate("r1", 1, ast, {"age": 40}, evaluator)
+    assert evaluator.calls == 2 and len(cache) == 0
+
+def test_lru_eviction_and_invalidation():
+    cache = ResultCache(max_size=2)
+    ast = create_rule("age > 30")
+    evaluator = CountingEvaluator(ast)
+    for age in (10, 20, 10, 40):
+        cache.evaluate("r1", 1, ast, {"age": age}, evaluator)
+    # 20 was least recently used when 40 arrived
+    assert cache.stats()["evictions"] == 1
+    cache.evaluate("r1", 1, ast, {"age": 10}, evaluator)
+    assert evaluator.calls == 3
+
+    cache.evaluate("r2", 1, ast, {"age": 10}, evaluator)
+    cache.invalidate("r1")
+    assert len(cache) == 1
+    cache.evaluate("r1", 1, ast, {"age": 10}, evaluator)
+    assert evaluator.calls == 5
+    assert "rule_result_cache_hit_ratio" in cache.prometheus_metrics()
+
+def test_unhashable_values_share_a_canonical_key():
+    cache = ResultCache(max_size=8)
+    ast = create_rule("department = 'Sales'")
+    evaluator = CountingEvaluator(ast)
+    cache.evaluate("r1", 1, ast, {"department": {"b": 1, "a": 2}}, evaluator)
+    cache.evaluate("r1", 1, ast, {"department": {"a": 2, "b": 1}}, evaluator)
+    assert evaluator.calls == 1
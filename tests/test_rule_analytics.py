@@ -0,0 +1,74 @@
+import threading
+from app.services.rule_analytics import RuleAnalyticsService
+
+def test_counters_and_percentiles():
+    analytics = RuleAnalyticsService()
+    for _ in range(90):
+        analytics.track_evaluation("r1", 3_000, True)
+    for _ in range(9):
+        analytics.track_evaluation("r1", 400_000, False)
+    analytics.track_evaluation("r1", 20_000_000, None)
+
+    stats = analytics.get_usage_stats("r1")
+    assert stats.total_evaluations == 100
+    assert (stats.true_results, stats.false_results, stats.errors) == (90, 9, 1)
+    assert 0.0025 <= stats.percentile(0.50) <= 0.005
+    assert 0.25 <= stats.percentile(0.95) <= 0.5
+    assert 0.25 <= stats.percentile(0.99) <= 0.5
+    assert 10 <= stats.percentile(0.999) <= 20
+
+    performance = analytics.get_rule_analytics("r1")["performance"]
+    assert performance["evaluation_count"] == 100
+    assert performance["success_rate"] == 0.9
+    assert performance["latency_ms"]["max"] == 20.0
+
+def test_unknown_rule_has_empty_stats():
+    analytics = RuleAnalyticsService()
+    assert analytics.get_rule_analytics("missing")["performance"]["evaluation_count"] == 0
+    assert analytics.get_usage_stats("missing").percentile(0.99) == 0
+
+def test_thread_shards_are_merged():
+    analytics = RuleAnalyticsService()
+
+    def work():
+        for _ in range(1000):
+            analytics.track_evaluation("r1", 1_500, True)
+        analytics.track_batch("r1", 50_000, 10, 4, errors=1)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = analytics.get_usage_stats("r1")
+    assert stats.total_evaluations == 4 * 1010
+    assert stats.true_results == 4 * 1004
+    assert stats.errors == 4
+    assert sum(stats.latency_buckets) == stats.total_evaluations
+    assert len(analytics._shards) == 4
+
+def test_prometheus_exposition():
+    analytics = RuleAnalyticsService()
+    analytics.track_evaluation("r1", 2_000, True)
+    analytics.track_evaluation("r1", 2_000_000_000, False)
+    text = analytics.prometheus_metrics()
+    assert 'rule_evaluations_total{rule_id="r1",result="true"} 1' in text
+    assert 'rule_evaluation_duration_seconds_bucket{rule_id="r1",le="2.5e-06"} 1' in text
+    assert 'rule_evaluation_duration_seconds_bucket{rule_id="r1",le="+Inf"} 2' in text
+    assert 'rule_evaluation_duration_seconds_count{rule_id="r1"} 2' in text
+
+def test_evaluate_samples_timing_but_counts_everything():
+    analytics = RuleAnalyticsService(sample_every=4)
+    for age in range(10):
+        analytics.evaluate("r1", lambda data: data["age"] > 4, {"age": age})
+    try:
+        analytics.evaluate("r1", lambda data: data["missing"], {})
+    except KeyError:
+        pass
+
+    stats = analytics.get_usage_stats("r1")
+    assert stats.total_evaluations == 11
+    assert stats.true_results == 5
+    assert stats.errors == 1
+    assert stats.timed_evaluations == 3
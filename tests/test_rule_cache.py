@@ -0,0 +1,54 @@
+import pytest
+from app.rule_engine import create_rule
+from app.services.rule_cache import RuleCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_get_latest_hit_and_miss():
+    cache = RuleCache(max_size=4)
+    ast = create_rule("age > 30")
+    assert cache.get_latest("r1") is None
+    cache.put("r1", 1, ast)
+    assert cache.get_latest("r1") == (1, ast)
+    assert cache.get("r1", 2) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+def test_lru_eviction():
+    cache = RuleCache(max_size=2)
+    cache.put("r1", 1, create_rule("age > 30"))
+    cache.put("r2", 1, create_rule("age > 40"))
+    cache.get("r1", 1)
+    cache.put("r3", 1, create_rule("age > 50"))
+    assert cache.get("r2", 1) is None
+    assert cache.get("r1", 1) is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = RuleCache(max_size=4, ttl_seconds=10, clock=clock)
+    cache.put("r1", 1, create_rule("age > 30"))
+    clock.now = 9
+    assert cache.get_latest("r1") is not None
+    clock.now = 10
+    assert cache.get_latest("r1") is None
+    assert cache.stats()["size"] == 0
+
+def test_invalidate_drops_all_versions():
+    cache = RuleCache(max_size=4)
+    cache.put("r1", 1, create_rule("age > 30"))
+    cache.put("r1", 2, create_rule("age > 40"))
+    assert cache.get_latest("r1")[0] == 2
+    cache.invalidate("r1")
+    assert cache.get_latest("r1") is None
+    assert cache.get("r1", 1) is None
+
+def test_invalid_size():
+    with pytest.raises(ValueError, match="Cache size must be at least 1"):
+        RuleCache(max_size=0)
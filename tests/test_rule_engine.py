@@ -2,8 +2,15 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import pickle
+import threading
 import pytest
-from app.rule_engine import create_rule, evaluate_rule, combine_rules, NodeType, Operator, ComparisonOperator
+from concurrent.futures import ThreadPoolExecutor
+from app.parallel_evaluator import evaluate_rule_parallel
+from app.record_schema import record_schema
+from app.rule_index import RuleIndex
+from app.rule_network import RuleNetwork
+from app.rule_engine import MAX_RULE_DEPTH, Node, interned_node_count, combine_asts, to_rule_string, create_rule, evaluate_rule, combine_rules, compile_rule, RuleEvaluator, RuleParser, TokenType, NodeType, Operator, ComparisonOperator
 
 def test_create_rule():
     rule_string = "age > 30 AND department = 'Sales'"
@@ -94,6 +101,19 @@ def test_error_handling():
     with pytest.raises(ValueError, match="Unexpected end of expression"):
         create_rule("age")
 
+def test_combine_rules_factors_shared_terms():
+    combined = combine_rules(["age > 30 AND salary > 10", "age > 30 AND department = 'HR'"], Operator.OR)
+    assert to_rule_string(combined) == "age > 30 AND (salary > 10 OR department = 'HR')"
+    assert to_rule_string(combine_rules(["age > 30", "age > 30 AND salary > 10"], Operator.OR)) == "age > 30"
+    assert to_rule_string(combine_rules(["age > 30", "salary > 10", "age > 30"])) == "age > 30 AND salary > 10"
+
+    # OR is the more frequent operator here; the parsed trees are grafted as they are
+    first, second = create_rule("age > 30 OR salary > 10"), create_rule("department = 'HR' OR (age < 20 AND salary < 5)")
+    combined = combine_asts([first, second])
+    assert to_rule_string(combined) == "age > 30 OR salary > 10 OR department = 'HR' OR (age < 20 AND salary < 5)"
+    assert combined.left.left.left is first.left
+    assert create_rule(to_rule_string(combined)) is combined
+
 def test_combine_rules_edge_cases():
     with pytest.raises(ValueError, match="No rules provided to combine"):
         combine_rules([])
@@ -113,4 +133,122 @@ def test_complex_rules():
     
     assert evaluate_rule(ast, {"age": 35, "department": "Sales", "experience": 3, "salary": 45000}) == True
     assert evaluate_rule(ast, {"age": 28, "department": "Marketing", "experience": 7, "salary": 55000}) == True
-    assert evaluate_rule(ast, {"age": 28, "department": "Sales", "experience": 3, "salary": 45000}) == False
\ No newline at end of file
+    assert evaluate_rule(ast, {"age": 28, "department": "Sales", "experience": 3, "salary": 45000}) == False
+
+def test_compiled_rule_matches_evaluator():
+    rule = "((age > 30 AND department = 'Sales') OR (age < 25 AND department = 'Marketing')) AND (salary > 50000 OR experience > 5)"
+    ast = create_rule(rule)
+    compiled = compile_rule(ast)
+    evaluator = RuleEvaluator()
+    for data in [
+        {"age": 35, "department": "Sales", "salary": 60000, "experience": 3},
+        {"age": 23, "department": "Marketing", "salary": 45000, "experience": 6},
+        {"age": 28, "department": "Sales", "salary": 45000, "experience": 3},
+    ]:
+        assert compiled(data) == evaluator.evaluate(ast, data)
+    assert compile_rule(ast) is compiled
+
+def test_compiled_rule_short_circuit_and_missing_field():
+    compiled = compile_rule(create_rule("age > 30 AND salary > 50000"))
+    assert compiled({"age": 25}) == False
+    with pytest.raises(ValueError, match="Field salary not found in data"):
+        compiled({"age": 35})
+    assert compile_rule(create_rule("age > 30 OR salary > 50000"))({"age": 35}) == True
+
+def test_and_binds_tighter_than_or():
+    ast = create_rule("age > 30 OR salary > 50000 AND experience > 5")
+    assert ast.operator == Operator.OR
+    assert ast.right.operator == Operator.AND
+    assert evaluate_rule(ast, {"age": 35, "salary": 0, "experience": 0}) == True
+    # Chains of one operator stay left-deep
+    chain = create_rule("age > 1 AND age > 2 AND age > 3")
+    assert chain.left.operator == Operator.AND and chain.right.value == 3
+
+def test_scanner_values_and_positions():
+    assert create_rule("salary > 1.5").value == 1.5
+    assert create_rule("salary > -5").value == -5
+    assert create_rule("department = '123'").value == "123"
+    assert create_rule("department = Sales").value == "Sales"
+    tokens = RuleParser().tokenize("(age >= 30) OR department = 'Sales'")
+    assert [(token.type, token.position) for token in tokens] == [
+        (TokenType.LPAREN, 0), (TokenType.IDENTIFIER, 1), (TokenType.COMPARATOR, 5), (TokenType.NUMBER, 8),
+        (TokenType.RPAREN, 10), (TokenType.OR, 12), (TokenType.IDENTIFIER, 15), (TokenType.COMPARATOR, 26),
+        (TokenType.STRING, 28),
+    ]
+
+def test_parser_reports_positions():
+    with pytest.raises(ValueError, match="Unexpected '\\)' at position 8"):
+        create_rule("age > 30)")
+    with pytest.raises(ValueError, match="Expected AND, OR or '\\)' at position 9, got 'salary'"):
+        create_rule("age > 30 salary > 5")
+    with pytest.raises(ValueError, match="Unexpected character ';' at position 8"):
+        create_rule("age > 30;")
+    with pytest.raises(ValueError, match="Unterminated string at position 13"):
+        create_rule("department = 'Sales")
+
+def test_deep_rules_evaluate_up_to_the_depth_limit():
+    depth = 20000
+    assert create_rule("(" * depth + "age > 30" + ")" * depth).value == 30
+    rule = "age > 0"
+    for value in range(1, MAX_RULE_DEPTH):
+        rule = f"age > {value} {'AND' if value % 2 else 'OR'} ({rule})"
+    ast = create_rule(rule)
+    chain = create_rule(" AND ".join(f"age > {value}" for value in range(MAX_RULE_DEPTH)))
+    for node in (ast, chain):
+        assert evaluate_rule(node, {"age": 1000})
+        assert RuleEvaluator().evaluate(node, {"age": 1000})
+        assert pickle.loads(pickle.dumps(node)) is node
+        assert create_rule(to_rule_string(node)) is node
+        assert evaluate_rule_parallel(node, [{"age": 1000}, {"age": -1}], workers=1) == [True, False]
+        network, index = RuleNetwork(), RuleIndex()
+        network.add_rule("deep", node)
+        index.add_rule("deep", node)
+        assert network.evaluate({"age": 1000}, rule_ids=sorted(index.candidates({"age": 1000}))).matched == ["deep"]
+        assert record_schema.evaluate_rows(node, [record_schema.decode({"age": 1000})]) == [True]
+    with pytest.raises(ValueError, match=f"more than {MAX_RULE_DEPTH} levels deep"):
+        create_rule(f"salary > 1 AND ({rule})")
+    with pytest.raises(ValueError, match=f"more than {MAX_RULE_DEPTH} levels deep"):
+        create_rule(" AND ".join(f"age > {value}" for value in range(1500)))
+    with pytest.raises(ValueError, match=f"more than {MAX_RULE_DEPTH} levels deep"):
+        combine_asts([chain, create_rule("salary > 1")], Operator.AND)
+
+def test_nodes_are_hash_consed_and_immutable():
+    first = create_rule("age > 30 AND department = 'Sales'")
+    second = create_rule("(department = 'Sales' OR salary > 1) AND age > 30")
+    assert create_rule("age > 30 AND department = 'Sales'") is first
+    assert second.right is first.left
+    assert second.left.left is first.right
+    assert create_rule("age > 1") is not create_rule("age > 1.0")
+    assert create_rule("age > 1") != create_rule("age > 1.0")
+    with pytest.raises(AttributeError, match="immutable"):
+        first.value = 1
+    assert pickle.loads(pickle.dumps(first)) is first
+    assert Node(NodeType.LITERAL, value=[1, 2]) is Node(NodeType.LITERAL, value=[1, 2])
+
+    count = interned_node_count()
+    unused = Node(NodeType.COMPARISON, value=-12345, field="age", operator=ComparisonOperator.LT)
+    assert interned_node_count() == count + 1
+    del unused
+    assert interned_node_count() == count
+
+def test_nodes_built_concurrently_are_interned_once():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for round in range(20):
+            barrier = threading.Barrier(4)
+            def build(start=-1000 * (round + 1)):
+                barrier.wait()
+                return [Node(NodeType.COMPARISON, value=start - value, field="age", operator=ComparisonOperator.GT)
+                        for value in range(200)]
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                first, *others = [future.result() for future in [pool.submit(build) for _ in range(4)]]
+            assert all(node is other[position] for other in others for position, node in enumerate(first))
+    finally:
+        sys.setswitchinterval(interval)
+
+def test_rule_string_round_trips_floats():
+    for rule_string in ("salary > 0.00001", "salary > 12345678901234567890.5", "salary < -0.5", "salary = 100.0"):
+        rule = create_rule(rule_string)
+        assert create_rule(to_rule_string(rule)) is rule
+    assert to_rule_string(create_rule("salary > 0.00001")) == "salary > 0.00001"
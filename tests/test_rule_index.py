@@ -0,0 +1,80 @@
+import random
+from app.rule_engine import create_rule, evaluate_rule
+from app.rule_index import RuleIndex
+from app.rule_network import RuleNetwork
+
+DEPARTMENTS = ["Sales", "Marketing", "Engineering", "HR"]
+
+def random_rule(rng, depth=2):
+    if depth == 0 or rng.random() < 0.3:
+        if rng.random() < 0.3:
+            return f"department {rng.choice(['=', '!='])} '{rng.choice(DEPARTMENTS)}'"
+        field = rng.choice(["age", "salary", "experience"])
+        return f"{field} {rng.choice(['>', '<', '>=', '<=', '=', '!='])} {rng.randint(0, 60)}"
+    operator = rng.choice(["AND", "OR"])
+    return f"({random_rule(rng, depth - 1)} {operator} {random_rule(rng, depth - 1)})"
+
+def test_candidates_include_every_matching_rule():
+    rng = random.Random(3)
+    index = RuleIndex()
+    rules = {}
+    for i in range(200):
+        rules[f"r{i}"] = create_rule(random_rule(rng))
+        index.add_rule(f"r{i}", rules[f"r{i}"])
+    for _ in range(200):
+        data = {
+            "age": rng.randint(0, 60),
+            "salary": rng.randint(0, 60),
+            "experience": rng.randint(0, 60),
+            "department": rng.choice(DEPARTMENTS),
+        }
+        candidates = index.candidates(data)
+        matched = {rule_id for rule_id, ast in rules.items() if evaluate_rule(ast, data)}
+        assert matched <= candidates
+
+def test_candidates_prune_by_threshold_and_equality():
+    index = RuleIndex()
+    index.add_rule("adult", create_rule("age >= 18"))
+    index.add_rule("senior", create_rule("age > 60"))
+    index.add_rule("young", create_rule("age < 25"))
+    index.add_rule("sales", create_rule("department = 'Sales' AND age > 10"))
+    index.add_rule("not_hr", create_rule("department != 'HR'"))
+    assert index.candidates({"age": 30, "department": "HR"}) == {"adult"}
+    assert index.candidates({"age": 20, "department": "Sales"}) == {"adult", "young", "sales", "not_hr"}
+
+def test_missing_field_and_type_mismatch_keep_rules_as_candidates():
+    index = RuleIndex()
+    index.add_rule("senior", create_rule("age > 60"))
+    index.add_rule("sales", create_rule("department = 'Sales'"))
+    assert index.candidates({}) == {"senior", "sales"}
+    assert index.candidates({"age": "70", "department": "HR"}) == {"senior"}
+
+def test_pruned_evaluation_reports_the_same_errors():
+    index, network = RuleIndex(), RuleNetwork()
+    index.add_rule("sales", create_rule("age > 30 AND department = 'Sales'"))
+    network.add_rule("sales", create_rule("age > 30 AND department = 'Sales'"))
+    rng = random.Random(5)
+    for i in range(200):
+        rule = create_rule(random_rule(rng))
+        index.add_rule(f"r{i}", rule)
+        network.add_rule(f"r{i}", rule)
+    records = [{"department": "HR"}, {"age": None, "department": "Sales"}, {"age": 40, "department": 3}]
+    for _ in range(200):
+        record = {"age": rng.randint(0, 60), "salary": rng.choice([rng.randint(0, 60), "high", None]),
+                  "experience": rng.randint(0, 60), "department": rng.choice(DEPARTMENTS)}
+        records.append({field: value for field, value in record.items() if rng.random() < 0.8})
+    for record in records:
+        full = network.evaluate(record)
+        pruned = network.evaluate(record, rule_ids=sorted(index.candidates(record)))
+        assert (sorted(pruned.matched), pruned.errors) == (sorted(full.matched), full.errors), record
+
+def test_remove_rule():
+    index = RuleIndex()
+    index.add_rule("a", create_rule("age > 30 OR age > 30"))
+    index.add_rule("b", create_rule("department = 'Sales'"))
+    assert index.remove_rule("a")
+    assert not index.remove_rule("a")
+    assert index.candidates({"age": 40, "department": "Sales"}) == {"b"}
+    index.remove_rule("b")
+    assert len(index) == 0
+    assert index.candidates({"age": 40, "department": "Sales"}) == set()
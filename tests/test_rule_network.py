@@ -0,0 +1,48 @@
+from app.rule_engine import create_rule, evaluate_rule
+from app.rule_network import RuleNetwork
+
+RULES = {
+    "senior_sales": "age > 30 AND department = 'Sales'",
+    "sales_or_rich": "department = 'Sales' OR salary > 50000",
+    "experienced": "(age > 30 AND experience > 5) OR salary > 50000",
+}
+
+def build_network():
+    network = RuleNetwork()
+    for rule_id, rule_string in RULES.items():
+        network.add_rule(rule_id, create_rule(rule_string))
+    return network
+
+def test_network_matches_individual_rules():
+    network = build_network()
+    for data in [
+        {"age": 35, "department": "Sales", "salary": 40000, "experience": 3},
+        {"age": 25, "department": "Marketing", "salary": 60000, "experience": 1},
+        {"age": 45, "department": "Marketing", "salary": 30000, "experience": 10},
+    ]:
+        expected = [rule_id for rule_id, rule in RULES.items() if evaluate_rule(create_rule(rule), data)]
+        assert network.evaluate(data).matched == expected
+
+def test_shared_predicates_evaluated_once():
+    network = build_network()
+    assert network.predicate_count == 4
+    result = network.evaluate({"age": 35, "department": "Sales", "salary": 40000, "experience": 3})
+    assert result.evaluated_rules == 3
+    assert result.evaluated_predicates == 4
+
+def test_remove_rule_releases_predicates():
+    network = build_network()
+    network.remove_rule("experienced")
+    assert network.predicate_count == 3
+    network.remove_rule("sales_or_rich")
+    assert network.predicate_count == 2
+    assert network.evaluate({"age": 35, "department": "Sales"}).matched == ["senior_sales"]
+
+def test_errors_are_reported_per_rule():
+    network = build_network()
+    result = network.evaluate({"age": 35, "department": "Marketing"})
+    assert result.matched == []
+    assert result.errors == {
+        "sales_or_rich": "Field salary not found in data",
+        "experienced": "Field experience not found in data",
+    }
@@ -0,0 +1,76 @@
+import random
+from app.batch_evaluator import ColumnarBatch, evaluate_batch
+from app.rule_engine import Node, NodeType, compile_rule, create_rule, evaluate_rule, to_rule_string
+from app.rule_index import RuleIndex
+from app.rule_network import RuleNetwork
+from app.rule_optimizer import RuleOptimizer, SelectivityStats
+from app.rule_profiler import ProfilingRuleEvaluator
+
+def test_flattens_and_removes_duplicates():
+    result = RuleOptimizer().optimize_with_stats(create_rule("(age > 30 AND salary > 10) AND (age > 30 AND age > 30)"))
+    assert result.removed_duplicates == 2
+    assert to_rule_string(result.node) == "age > 30 AND salary > 10"
+
+def test_folds_contradictions_and_tautologies():
+    optimizer = RuleOptimizer()
+    result = optimizer.optimize_with_stats(create_rule("age > 30 AND age < 20"))
+    assert result.node.type == NodeType.LITERAL and result.node.value is False
+    assert result.folded == 1 and result.cost_after == 0
+
+    assert optimizer.optimize(create_rule("age > 30 OR age <= 30")).value is True
+    # The folded literal propagates into the enclosing chain
+    propagated = optimizer.optimize(create_rule("(age > 30 OR age <= 30) AND department = 'Sales'"))
+    assert to_rule_string(propagated) == "department = 'Sales'"
+    # Different fields or mixed types are left alone
+    assert optimizer.optimize(create_rule("age > 30 AND salary < 20")).type == NodeType.OPERATOR
+    assert optimizer.optimize(create_rule("age > 30 AND age < 'x'")).type == NodeType.OPERATOR
+
+def test_observed_selectivity_drives_ordering():
+    ast = create_rule("department = 'Sales' AND age > 30")
+    profiler = ProfilingRuleEvaluator(ast)
+    for age in range(100):
+        profiler.evaluate(ast, {"department": "Sales", "age": age})
+
+    stats = SelectivityStats()
+    stats.record_profile(profiler)
+    assert len(stats) == 2
+    result = RuleOptimizer(stats).optimize_with_stats(ast)
+    # Everyone is in Sales, so the age check decides the rule far more often
+    assert to_rule_string(result.node) == "age > 30 AND department = 'Sales'"
+    assert result.cost_after < result.cost_before
+
+def test_optimized_rules_evaluate_identically():
+    rules = [
+        "(age > 30 AND department = 'Sales') OR (salary > 50000 AND age > 30) OR age > 30",
+        "(age > 30 OR age < 40) AND (salary >= 10 AND salary <= 10) AND department != 'HR'",
+        "((age = 25 AND age > 20) OR experience < 3) AND (salary > 100 OR salary > 100)",
+    ]
+    generator = random.Random(7)
+    records = [{
+        "age": generator.randint(18, 65),
+        "department": generator.choice(["Sales", "HR", "Marketing"]),
+        "salary": generator.choice([10, 50, 100, 60000]),
+        "experience": generator.randint(0, 10),
+    } for _ in range(300)]
+    optimizer = RuleOptimizer()
+    for rule in rules:
+        ast = create_rule(rule)
+        optimized = optimizer.optimize(ast)
+        compiled = compile_rule(optimized)
+        assert [compiled(record) for record in records] == [evaluate_rule(ast, record) for record in records]
+
+def test_literal_rules_supported_by_evaluators():
+    always, never = Node(type=NodeType.LITERAL, value=True), Node(type=NodeType.LITERAL, value=False)
+    record = {"age": 40}
+    assert evaluate_rule(always, record) and not evaluate_rule(never, record)
+    assert compile_rule(always)(record) and not compile_rule(never)(record)
+    assert list(evaluate_batch(always, ColumnarBatch.from_records([record, record]))) == [True, True]
+
+    network, index = RuleNetwork(), RuleIndex()
+    for rule_id, ast in (("always", always), ("never", never), ("age", create_rule("age > 30"))):
+        network.add_rule(rule_id, ast)
+        index.add_rule(rule_id, ast)
+    assert index.candidates({"age": 10}) == {"always"}
+    assert network.evaluate(record).matched == ["always", "age"]
+    index.remove_rule("always")
+    assert index.candidates({"age": 10}) == set()
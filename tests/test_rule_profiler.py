@@ -0,0 +1,55 @@
+import pytest
+from app.rule_engine import RuleEvaluator, create_rule
+from app.rule_profiler import ProfilingRuleEvaluator, RuleProfiles
+
+RULE = "(age > 30 AND department = 'Sales') OR salary > 50000"
+RECORDS = [
+    {"age": 35, "department": "Sales", "salary": 10},
+    {"age": 25, "department": "Sales", "salary": 60000},
+    {"age": 40, "department": "Marketing", "salary": 10},
+    {"age": 20, "department": "Sales", "salary": 10},
+]
+
+def test_profiling_matches_evaluator_and_counts_nodes():
+    ast = create_rule(RULE)
+    profiler = ProfilingRuleEvaluator(ast)
+    for record in RECORDS:
+        assert profiler.evaluate(ast, record) == RuleEvaluator().evaluate(ast, record)
+
+    tree = profiler.annotated_tree()
+    assert tree["operator"] == "OR"
+    assert (tree["evaluations"], tree["true_results"], tree["short_circuits"]) == (4, 2, 1)
+    conjunction = tree["left"]
+    assert (conjunction["evaluations"], conjunction["true_results"], conjunction["short_circuits"]) == (4, 1, 2)
+    assert conjunction["left"]["expression"] == "age > 30"
+    assert conjunction["left"]["true_rate"] == 0.5
+    assert conjunction["right"]["evaluations"] == 2
+    assert tree["right"]["evaluations"] == 3
+    assert tree["total_time_ms"] >= tree["left"]["total_time_ms"]
+
+def test_errors_are_attributed_to_the_failing_node():
+    ast = create_rule("age > 30 AND salary > 10")
+    profiler = ProfilingRuleEvaluator(ast)
+    with pytest.raises(ValueError):
+        profiler.evaluate(ast, {"age": 40})
+    tree = profiler.annotated_tree()
+    assert tree["errors"] == 1
+    assert tree["right"]["errors"] == 1
+    assert tree["left"]["errors"] == 0
+
+def test_rule_profiles_follow_rule_changes():
+    profiles = RuleProfiles()
+    assert not profiles
+    first = create_rule("age > 30")
+    profiler = profiles.enable("r1", first)
+    profiler.evaluate(first, {"age": 40})
+    # An equal AST (e.g. re-read from the database) keeps the counts
+    reparsed = create_rule("age > 30")
+    assert profiles.profiler("r1", reparsed) is profiler
+    assert profiler.evaluate(reparsed, {"age": 20}) is False
+    assert profiler.profiles[0].evaluations == 2
+    changed = profiles.profiler("r1", create_rule("age < 30"))
+    assert changed is not profiler
+    assert changed.profiles[0].evaluations == 0
+    assert profiles.profiler("other", first) is None
+    assert profiles.disable("r1") and not profiles
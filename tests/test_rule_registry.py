@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app.database import AsyncCollection
+from app.memory_db import InMemoryCollection
+from app.rule_engine import RuleParser, create_rule
+from app.ast_codec import serialize_ast
+from app.services.rule_registry import RuleRegistry
+from app.services.rule_repository import RuleRepository
+
+def make_repository(rules):
+    collection = InMemoryCollection("rules")
+    for rule_string, active, with_ast in rules:
+        document = {"name": rule_string, "rule_string": rule_string, "version": 1, "active": active}
+        if with_ast:
+            document["ast"] = serialize_ast(create_rule(rule_string))
+        collection.insert_one(document)
+    return collection, RuleRepository(AsyncCollection(collection, ThreadPoolExecutor(max_workers=2)))
+
+def test_warm_up_loads_active_rules_and_counts_failures():
+    collection, repository = make_repository([
+        ("age > 30", True, True),
+        ("department = 'Sales'", True, False),
+        ("age >", True, False),
+        ("salary > 100", False, True),
+    ])
+    registry = RuleRegistry(batch_size=2)
+    assert not registry.ready
+
+    asyncio.run(registry.ensure_loaded(repository))
+    assert registry.ready
+    assert registry.status.loaded == 2
+    assert registry.status.failed == 1
+    assert len(registry) == 2
+    assert list(registry.status.errors.values()) == ["Unexpected end of expression"]
+
+    result = registry.network.evaluate({"age": 40, "department": "Sales"})
+    assert len(result.matched) == 2
+
+def test_register_keeps_newer_version():
+    registry = RuleRegistry()
+    registry.register("r1", 2, create_rule("age > 30"))
+    registry.register("r1", 1, create_rule("age < 30"))
+    entry = registry.get("r1")
+    assert entry.version == 2
+    assert entry.compiled({"age": 40}) is True
+    assert registry.index.candidates({"age": 40}) == {"r1"}
+
+    assert registry.unregister("r1")
+    assert "r1" not in registry
+    assert registry.index.candidates({"age": 40}) == set()
+
+def test_ensure_loaded_warms_up_once():
+    collection, repository = make_repository([("age > 30", True, True)])
+    registry = RuleRegistry()
+
+    async def run():
+        await asyncio.gather(*(registry.ensure_loaded(repository) for _ in range(5)))
+        collection.insert_one({"name": "late", "rule_string": "age < 10", "version": 1, "active": True})
+        await registry.ensure_loaded(repository)
+
+    asyncio.run(run())
+    assert registry.status.loaded == 1
+    assert len(registry) == 1
+
+def test_rule_deleted_during_warm_up_is_not_registered():
+    collection, repository = make_repository([("age > 30", True, True), ("salary > 100", True, True)])
+    registry = RuleRegistry(batch_size=1)
+    deleted = str(collection.find_one({"name": "salary > 100"})["_id"])
+    parse = registry._parse
+
+    async def parse_then_delete(rules):
+        # The delete endpoint runs while the first batch is being parsed
+        registry.unregister(deleted)
+        return await parse(rules)
+
+    registry._parse = parse_then_delete
+    asyncio.run(registry.ensure_loaded(repository))
+    assert registry.rule_ids() != [] and deleted not in registry
+    registry.register(deleted, 2, create_rule("salary > 100"))
+    assert deleted in registry
+
+def test_rules_that_fail_to_register_do_not_stop_the_warm_up():
+    collection, repository = make_repository([("age > 30", True, True), ("salary > 100", True, True)])
+    deep = RuleParser().parse(" AND ".join(f"age > {value}" for value in range(1500)))
+    collection.insert_one({"name": "deep", "rule_string": "", "ast": serialize_ast(deep), "version": 1, "active": True})
+    failing = create_rule("salary > 100")
+
+    class FailingOptimizer:
+        def optimize(self, node):
+            if node is failing:
+                raise RecursionError("maximum recursion depth exceeded")
+            return node
+
+    registry = RuleRegistry(optimizer=FailingOptimizer())
+    asyncio.run(registry.ensure_loaded(repository))
+    assert registry.ready and registry.status.loaded == 1 and registry.status.failed == 2
+    assert sorted(registry.status.errors.values()) == ["Rule is nested more than 200 levels deep",
+                                                       "maximum recursion depth exceeded"]
+    assert registry.network.evaluate({"age": 40, "salary": 200}).matched == registry.rule_ids()
+
+    # A failed update leaves nothing of the rule registered
+    [rule_id] = registry.rule_ids()
+    with pytest.raises(RecursionError):
+        registry.register(rule_id, 2, failing)
+    assert rule_id not in registry and registry.network.evaluate({"age": 40}).matched == []
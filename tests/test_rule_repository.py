@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from bson.errors import InvalidId
+from app.database import AsyncCollection
+from app.memory_db import InMemoryCollection
+from app.services.rule_repository import RuleRepository, rule_filter
+
+def make_repository():
+    return RuleRepository(AsyncCollection(InMemoryCollection("rules"), ThreadPoolExecutor(max_workers=2)))
+
+def rule_doc(name, active=True):
+    return {"name": name, "description": "", "rule_string": "age > 30", "version": 1, "active": active}
+
+def test_insert_get_update_delete():
+    async def scenario():
+        repository = make_repository()
+        created = await repository.insert(rule_doc("first"))
+        assert isinstance(created["_id"], str)
+        assert (await repository.get(created["_id"]))["name"] == "first"
+
+        updated = await repository.update(created["_id"], {"rule_string": "age > 40"})
+        assert updated["version"] == 2
+        assert updated["rule_string"] == "age > 40"
+
+        assert await repository.delete(created["_id"])
+        assert not await repository.delete(created["_id"])
+        assert await repository.get(created["_id"]) is None
+        assert await repository.update(created["_id"], {"name": "gone"}) is None
+    asyncio.run(scenario())
+
+def test_get_many_preserves_order_and_skips_missing():
+    async def scenario():
+        repository = make_repository()
+        first = await repository.insert(rule_doc("first"))
+        second = await repository.insert(rule_doc("second"))
+        await repository.delete(first["_id"])
+        third = await repository.insert(rule_doc("third"))
+        rules = await repository.get_many([third["_id"], first["_id"], second["_id"]])
+        assert [rule["name"] for rule in rules] == ["third", "second"]
+    asyncio.run(scenario())
+
+def test_iter_active_batches():
+    async def scenario():
+        repository = make_repository()
+        for i in range(5):
+            await repository.insert(rule_doc(f"rule{i}", active=i != 2))
+        batches = [batch async for batch in repository.iter_active({"name": 1}, batch_size=2)]
+        assert [len(batch) for batch in batches] == [2, 2]
+        assert set(batches[0][0]) == {"_id", "name"}
+    asyncio.run(scenario())
+
+def test_keyset_pages_with_filters_and_projection():
+    async def scenario():
+        repository = make_repository()
+        for i in range(7):
+            await repository.insert(rule_doc(f"{'alpha' if i % 2 else 'beta'}{i}", active=i != 3))
+        names, cursor = [], None
+        while True:
+            page, cursor = await repository.list_page({}, {"name": 1}, limit=3, cursor=cursor)
+            names.append([rule["name"] for rule in page])
+            if cursor is None:
+                break
+        assert names == [["beta0", "alpha1", "beta2"], ["alpha3", "beta4", "alpha5"], ["beta6"]]
+        assert set(page[0]) == {"_id", "name"}
+
+        query = rule_filter(active=True, name_prefix="alpha")
+        page, cursor = await repository.list_page(query, limit=5)
+        assert [rule["name"] for rule in page] == ["alpha1", "alpha5"] and cursor is None
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            await repository.list_page({}, cursor="garbage")
+    asyncio.run(scenario())
+
+def test_updated_at_cursor_breaks_ties_by_id():
+    async def scenario():
+        repository = make_repository()
+        same_time = datetime(2024, 1, 1)
+        for i in range(4):
+            await repository.insert({**rule_doc(f"rule{i}"), "updated_at": datetime(2025, 1, 1) if i == 0 else same_time})
+        first, cursor = await repository.list_page({}, limit=2, sort="updated_at")
+        second, last = await repository.list_page({}, limit=2, sort="updated_at", cursor=cursor)
+        assert [rule["name"] for rule in first + second] == ["rule1", "rule2", "rule3", "rule0"]
+        assert last is None
+        with pytest.raises(ValueError, match="different sort order"):
+            await repository.list_page({}, sort="id", cursor=cursor)
+        exported = [rule["name"] async for batch in repository.iter_rules({}, {"name": 1}, batch_size=3) for rule in batch]
+        assert exported == ["rule0", "rule1", "rule2", "rule3"]
+    asyncio.run(scenario())
+
+def test_invalid_id():
+    with pytest.raises(InvalidId):
+        asyncio.run(make_repository().get("not-an-id"))
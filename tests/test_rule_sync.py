@@ -0,0 +1,156 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pytest
+from pymongo.errors import OperationFailure
+from app.database import AsyncCollection
+from app.memory_db import InMemoryCollection
+from app.rule_engine import create_rule
+from app.ast_codec import serialize_ast
+from app.services.rule_registry import RuleRegistry
+from app.services.rule_repository import RuleRepository
+from app.services.rule_sync import RuleSync
+
+class StandaloneCollection(InMemoryCollection):
+    # Behaves like a standalone server, which has no change streams
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+def rule_doc(rule_string, active=True):
+    now = datetime.utcnow()
+    return {"name": rule_string, "rule_string": rule_string, "ast": serialize_ast(create_rule(rule_string)),
+            "created_at": now, "updated_at": now, "version": 1, "active": active}
+
+def make_sync(collection, **kwargs):
+    repository = RuleRepository(AsyncCollection(collection, ThreadPoolExecutor(max_workers=4)))
+    changed = []
+    sync = RuleSync(RuleRegistry(), repository, on_change=changed.append, idle_interval=0.001, **kwargs)
+    return sync, repository, changed
+
+async def until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.005)
+
+def test_change_stream_applies_other_workers_writes():
+    collection = InMemoryCollection("rules")
+    existing = collection.insert_one(rule_doc("age > 30")).inserted_id
+    sync, writer, changed = make_sync(collection)
+
+    async def run():
+        task = asyncio.create_task(sync.run())
+        await until(lambda: sync.registry.ready)
+        assert sync.active_mode == "change_stream"
+        assert str(existing) in sync.registry
+
+        created = await writer.insert(rule_doc("salary > 100"))
+        await until(lambda: created["_id"] in sync.registry)
+
+        await writer.update(str(existing), {"rule_string": "age < 30", "ast": serialize_ast(create_rule("age < 30"))})
+        await until(lambda: sync.registry.get(str(existing)).version == 2)
+        assert sync.registry.get(str(existing)).compiled({"age": 20}) is True
+
+        await writer.update(created["_id"], {"active": False})
+        await until(lambda: created["_id"] not in sync.registry)
+
+        await writer.delete(str(existing))
+        await until(lambda: len(sync.registry) == 0)
+        task.cancel()
+
+    asyncio.run(run())
+    assert changed.count(str(existing)) == 2
+    assert sync.stats()["applied"] == 4
+
+def test_rule_that_fails_to_register_does_not_stop_the_sync():
+    collection = InMemoryCollection("rules")
+    sync, writer, changed = make_sync(collection)
+    failing = create_rule("salary > 100")
+
+    class FailingOptimizer:
+        def optimize(self, node):
+            if node is failing:
+                raise RecursionError("maximum recursion depth exceeded")
+            return node
+
+    sync.registry.optimizer = FailingOptimizer()
+
+    async def run():
+        task = asyncio.create_task(sync.run())
+        await until(lambda: sync.registry.ready)
+        bad = await writer.insert(rule_doc("salary > 100"))
+        good = await writer.insert(rule_doc("age > 30"))
+        await until(lambda: good["_id"] in sync.registry)
+        assert bad["_id"] not in sync.registry and not task.done()
+        task.cancel()
+
+    asyncio.run(run())
+    assert sync.stats()["failed"] == 1
+
+def test_own_writes_are_not_reparsed():
+    collection = InMemoryCollection("rules")
+    sync, repository, changed = make_sync(collection)
+
+    async def run():
+        task = asyncio.create_task(sync.run())
+        await until(lambda: sync.registry.ready)
+        created = await repository.insert(rule_doc("age > 30"))
+        # The writing worker registers its own rule right away
+        sync.registry.register(created["_id"], 1, create_rule("age > 30"))
+        await until(lambda: sync.skipped == 1)
+        task.cancel()
+
+    asyncio.run(run())
+    assert changed == []
+
+def test_lost_history_triggers_resync(monkeypatch):
+    monkeypatch.setattr("app.memory_db.CHANGE_LOG_SIZE", 4)
+    collection = InMemoryCollection("rules")
+    kept = collection.insert_one(rule_doc("age > 30")).inserted_id
+    removed = collection.insert_one(rule_doc("age > 40")).inserted_id
+    sync, _, _ = make_sync(collection)
+
+    async def run():
+        sync.registry.register(str(removed), 1, create_rule("age > 40"))
+        await sync.registry.ensure_loaded(sync.repository)
+        stream = await sync.repository.watch()
+        collection.delete_one({"_id": removed})
+        for i in range(10):
+            collection.insert_one(rule_doc(f"salary > {i}"))
+        task = asyncio.create_task(sync._follow(stream))
+        await until(lambda: sync.resyncs == 1)
+        task.cancel()
+
+    asyncio.run(run())
+    assert str(kept) in sync.registry
+    assert str(removed) not in sync.registry
+    assert len(sync.registry) == 11
+
+def test_polling_fallback_without_change_streams():
+    collection = StandaloneCollection("rules")
+    existing = collection.insert_one(rule_doc("age > 30")).inserted_id
+    sync, writer, changed = make_sync(collection, poll_interval=0.01, reconcile_every=1)
+
+    async def run():
+        task = asyncio.create_task(sync.run())
+        await until(lambda: sync.registry.ready)
+        assert sync.active_mode == "poll"
+
+        created = await writer.insert(rule_doc("salary > 100"))
+        await until(lambda: created["_id"] in sync.registry)
+        await writer.update(created["_id"], {"rule_string": "salary > 5", "updated_at": datetime.utcnow()})
+        await until(lambda: sync.registry.get(created["_id"]).version == 2)
+
+        # Deletes leave nothing to poll for; reconciliation catches them
+        await writer.delete(str(existing))
+        await until(lambda: str(existing) not in sync.registry)
+        task.cancel()
+
+    asyncio.run(run())
+    assert "updated_at_1__id_1" in collection.index_information()
+    assert str(existing) in changed
+
+def test_forced_change_stream_mode_fails_without_support():
+    sync, _, _ = make_sync(StandaloneCollection("rules"), mode="change_stream")
+    with pytest.raises(OperationFailure):
+        asyncio.run(sync.run())
@@ -0,0 +1,34 @@
+import asyncio
+from app.routes.streaming import iter_ndjson_batches
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+def collect(*parts, max_line_bytes=1 << 20):
+    async def run():
+        return [batch async for batch in iter_ndjson_batches(chunks(*parts), max_line_bytes)]
+    return asyncio.run(run())
+
+def test_lines_split_across_chunks():
+    batches = collect(b'{"age": 3', b'5}\n{"age"', b': 40}\n\n{"age": 1}')
+    assert batches == [[(1, {"age": 35})], [(2, {"age": 40})], [(4, {"age": 1})]]
+
+def test_invalid_lines_are_reported_in_place():
+    [batch] = collect(b'{"age": 1}\nnot json\n{"age": 2}\n')
+    assert batch[0] == (1, {"age": 1})
+    assert batch[1][0] == 2 and isinstance(batch[1][1], ValueError)
+    assert batch[2] == (3, {"age": 2})
+
+def test_oversized_line_is_skipped():
+    batches = collect(b'{"age": 1}\n{"department": "', b"x" * 50, b"x" * 50, b'"}\n{"age": 2}\n', max_line_bytes=32)
+    records = [item for batch in batches for item in batch]
+    assert records[0] == (1, {"age": 1})
+    assert records[1][0] == 2 and str(records[1][1]) == "Line exceeds 32 bytes"
+    assert records[2:] == [(3, {"age": 2})]
+
+def test_complete_oversized_line_in_one_chunk_is_rejected():
+    [batch] = collect(b'{"age": 1}\n\n{"department": "' + b"x" * 50 + b'"}\n{"age": 2}\n', max_line_bytes=32)
+    assert batch[0] == (1, {"age": 1})
+    assert batch[1][0] == 3 and str(batch[1][1]) == "Line exceeds 32 bytes"
+    assert batch[2] == (4, {"age": 2})